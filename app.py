@@ -13,21 +13,45 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import ccxt
 import time
 import random
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
-import requests
 import json
 import os
 from dotenv import load_dotenv
+from provider_race import race_providers, gather_providers
+from bulk_fetch import bulk_get_crypto_data
+from single_flight import crypto_flight
+from negative_cache import KnownMiss, negative_cache
+from dex_pairs import dex_pair_index
+from exchange_pool import get_exchange
+from history_loader import load_history
+from kline_stream import kline_stream, KLINE_STREAM_ENABLED
+from rate_limiter import rate_limiter, request_priority, BACKGROUND
+from consensus import (merge_consensus, consensus_tracker, CONSENSUS_MODE, CONSENSUS_PROVIDERS,
+                       CONSENSUS_MIN_PROVIDERS)
+from deadline import (Deadline, set_deadline, deadline_scope, has_budget, cap_timeout,
+                      ANALYSIS_DEADLINE_SECONDS, LLM_MIN_BUDGET_SECONDS, HISTORY_MIN_BUDGET_SECONDS)
+from ohlcv_decode import loads, decode_candle_records
+from prefetcher import ensure_prefetcher
+from http_client import http_get, http_post, connection_stats
+from provider_health import provider_health, CircuitOpenError
+from data_cache import shared_cache, load_window, save_window
+from candle_store import candle_store, filter_since, TIMEFRAME_SECONDS
+from cryptoapis_rates import rate_candles, rate_candles_ready, rate_poller
+from provider_api import (
+    DEFAULT_CRYPTOAPIS_KEY, DEXSCREENER_BASE_URL, COINGECKO_BASE_URL,
+    smithery_request, parse_smithery_candles,
+    coincap_request, parse_coincap_history, coingecko_request, parse_coingecko_market_chart,
+    check_miss
+)
 
 # 加載環境變數
 load_dotenv()
 
 # 從環境變數獲取API密鑰
-CRYPTOAPIS_KEY = os.getenv('CRYPTOAPIS_KEY', '56af1c06ebd5a7602a660516e0d044489c307860')
+CRYPTOAPIS_KEY = os.getenv('CRYPTOAPIS_KEY', DEFAULT_CRYPTOAPIS_KEY)
 
 # 設置頁面配置
 st.set_page_config(
@@ -37,6 +61,9 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Streamlit在同一線程中重新運行腳本，每次運行開始時清除上一次分析的截止時間
+set_deadline(None)
+
 # 添加自定義 CSS 來優化界面
 st.markdown("""
 <style>
@@ -232,7 +259,7 @@ OPENAI_API_KEY = get_api_key("OPENAI_API_KEY", "")
 BITGET_MCP_SERVER = "http://localhost:3000"
 
 # DexScreener API函數，獲取加密貨幣數據
-def get_dexscreener_data(symbol, timeframe, limit=100):
+def get_dexscreener_data(symbol, timeframe, limit=100, since=None):
     """
     從DexScreener API獲取加密貨幣OHLCV數據
     
@@ -240,6 +267,7 @@ def get_dexscreener_data(symbol, timeframe, limit=100):
     symbol (str): 交易對符號，如 'BTC/USDT'
     timeframe (str): 時間框架，如 '1d', '4h', '1h'
     limit (int): 要獲取的數據點數量
+    since (int): 毫秒時間戳，只返回不早於此時間的新K線或更新的K線
     
     返回:
     pandas.DataFrame: 包含OHLCV數據的DataFrame，如果獲取失敗則返回None
@@ -249,95 +277,51 @@ def get_dexscreener_data(symbol, timeframe, limit=100):
         base, quote = symbol.split('/')
         base_id = base.lower()  # 用於API查詢
         
-        # 將時間框架轉換為秒數
-        timeframe_seconds = {
-            '1m': 60,
-            '5m': 300,
-            '15m': 900,
-            '30m': 1800,
-            '1h': 3600,
-            '4h': 14400,
-            '12h': 43200,
-            '1d': 86400,
-            '1w': 604800
-        }
-        
         # 根據timeframe和limit計算時間範圍
-        seconds = timeframe_seconds.get(timeframe, 86400)  # 默認為1天
+        seconds = TIMEFRAME_SECONDS.get(timeframe, 86400)  # 默認為1天
+        if since is not None:
+            from_time = int(since // 1000)
+        else:
+            from_time = int(time.time()) - seconds * limit
         
         # 嘗試使用DexScreener API獲取數據
         try:
-            print(f"正在使用DexScreener API獲取{symbol}數據...")
+            # 熔斷打開或最近找不到該交易對時直接跳過DexScreener
+            if negative_cache.is_blocked('dexscreener', symbol, timeframe):
+                raise CircuitOpenError(f"DexScreener最近未找到{symbol}交易對")
+            if not provider_health.allow('dexscreener'):
+                raise CircuitOpenError("DexScreener處於熔斷狀態")
+            dex_start = time.time()
             
-            # 首先獲取配對信息
-            pair_url = f"https://api.dexscreener.com/latest/dex/search?q={base}"
-            pair_response = requests.get(pair_url)
+            print(f"正在使用DexScreener API獲取{symbol}數據...")
             
-            if pair_response.status_code != 200:
-                print(f"DexScreener API請求失敗: {pair_response.status_code}")
-                raise Exception(f"DexScreener API請求失敗: {pair_response.status_code}")
-                
-            pair_data = pair_response.json()
+            # 從交易對索引讀取配對信息，索引中沒有或已過期時才調用搜索端點(見 dex_pairs.py)
+            pair_entry = dex_pair_index.lookup(base, quote)
             
-            if not pair_data.get('pairs') or len(pair_data['pairs']) == 0:
+            if not pair_entry:
                 print(f"DexScreener未找到{symbol}交易對")
+                negative_cache.add('dexscreener', symbol, timeframe, 'no_pair')
                 raise Exception(f"DexScreener未找到{symbol}交易對")
             
-            # 找出與USDT配對的流動性最高的交易對
-            best_pair = None
-            max_liquidity = 0
-            
-            for pair in pair_data['pairs']:
-                if (pair['quoteToken']['symbol'].lower() == quote.lower() and 
-                    pair['baseToken']['symbol'].lower() == base.lower()):
-                    
-                    # 將流動性值轉換為數字
-                    liquidity = float(pair.get('liquidity', {}).get('usd', 0))
-                    
-                    if liquidity > max_liquidity:
-                        max_liquidity = liquidity
-                        best_pair = pair
-            
-            if not best_pair:
-                # 如果沒有找到完全匹配的，嘗試找到最佳匹配
-                for pair in pair_data['pairs']:
-                    if pair['quoteToken']['symbol'].lower() == quote.lower():
-                        # 將流動性值轉換為數字
-                        liquidity = float(pair.get('liquidity', {}).get('usd', 0))
-                        
-                        if liquidity > max_liquidity:
-                            max_liquidity = liquidity
-                            best_pair = pair
-            
-            # 如果仍然沒有找到，使用第一個對
-            if not best_pair and pair_data['pairs']:
-                best_pair = pair_data['pairs'][0]
-            
-            if not best_pair:
-                print(f"無法在DexScreener找到合適的{symbol}交易對")
-                raise Exception(f"無法在DexScreener找到合適的{symbol}交易對")
-            
             # 獲取交易對ID
-            pair_address = best_pair['pairAddress']
-            chain_id = best_pair['chainId']
+            pair_address = pair_entry['pairAddress']
+            chain_id = pair_entry['chainId']
             
             # 獲取K線數據
-            candles_url = f"https://api.dexscreener.com/latest/dex/candles?chainId={chain_id}&pairAddress={pair_address}&from=0"
-            candles_response = requests.get(candles_url)
+            candles_url = f"{DEXSCREENER_BASE_URL}/latest/dex/candles?chainId={chain_id}&pairAddress={pair_address}&from={from_time}"
+            candles_response = http_get(candles_url)
             
             if candles_response.status_code != 200:
                 print(f"DexScreener K線數據請求失敗: {candles_response.status_code}")
                 raise Exception(f"DexScreener K線數據請求失敗: {candles_response.status_code}")
                 
-            candles_data = candles_response.json()
+            candles_data = loads(candles_response.content)
             
             if not candles_data.get('candles') or len(candles_data['candles']) == 0:
                 print(f"DexScreener未返回{symbol}的K線數據")
+                negative_cache.add('dexscreener', symbol, timeframe, 'no_candles')
                 raise Exception(f"DexScreener未返回{symbol}的K線數據")
             
-            # 將K線數據轉換為DataFrame
-            df_data = []
-            
             # 根據所選時間框架過濾所需的K線
             filtered_candles = []
             target_timeframe = {
@@ -371,57 +355,49 @@ def get_dexscreener_data(symbol, timeframe, limit=100):
                 
                 print(f"使用{target_timeframe}時間框架的數據代替")
             
-            # 排序K線數據，確保時間順序
-            filtered_candles.sort(key=lambda x: x.get('timestamp', 0))
-            
-            # 取最近的limit個數據點
-            if len(filtered_candles) > limit:
-                filtered_candles = filtered_candles[-limit:]
-            
-            # 轉換為DataFrame格式
-            for candle in filtered_candles:
-                timestamp = candle.get('timestamp', 0)
-                open_price = float(candle.get('open', 0))
-                high_price = float(candle.get('high', 0))
-                low_price = float(candle.get('low', 0))
-                close_price = float(candle.get('close', 0))
-                volume = float(candle.get('volume', {}).get('base', 0))
-                
-                df_data.append([
-                    timestamp,
-                    open_price,
-                    high_price,
-                    low_price,
-                    close_price,
-                    volume
-                ])
+            # 以NumPy數組解碼K線並按時間排序(見 ohlcv_decode.py)
+            df = decode_candle_records(filtered_candles, volume_key='base', unit='ms')
+            if df is None:
+                raise Exception(f"DexScreener返回的{symbol}K線數據格式不正確")
             
-            # 創建DataFrame
-            df = pd.DataFrame(df_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
+            # 增量獲取時只保留新的或更新的K線
+            df = filter_since(df, since)
             
-            # 將timestamp轉換為datetime格式
-            df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+            # 取最近的limit個數據點
+            if len(df) > limit:
+                df = df.tail(limit)
             
             print(f"成功從DexScreener獲取{symbol}的{len(df)}個數據點")
+            provider_health.record_success('dexscreener', time.time() - dex_start)
             return df
             
         except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                provider_health.record_failure('dexscreener', time.time() - dex_start)
             print(f"DexScreener API請求失敗: {str(e)}，嘗試使用ccxt...")
             
             # 如果DexScreener失敗，嘗試使用ccxt
             try:
-                # 嘗試使用ccxt從主流交易所獲取數據
-                exchange = ccxt.binance()
-                ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
+                # 熔斷打開時直接跳過ccxt
+                if not provider_health.allow('ccxt'):
+                    raise CircuitOpenError("ccxt處於熔斷狀態")
+                ccxt_start = time.time()
+                
+                # 使用共享的交易所實例從主流交易所獲取數據(見 exchange_pool.py)
+                exchange = get_exchange('binance')
+                ohlcv = exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
                 
                 # 將數據轉換為DataFrame
                 df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
                 df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
                 
                 print(f"成功從ccxt獲取{symbol}的{len(df)}個數據點")
+                provider_health.record_success('ccxt', time.time() - ccxt_start)
                 return df
                 
             except Exception as ccxt_error:
+                if not isinstance(ccxt_error, CircuitOpenError):
+                    provider_health.record_failure('ccxt', time.time() - ccxt_start)
                 # 如果ccxt也失敗，使用CoinGecko API
                 print(f"CCXT獲取失敗: {ccxt_error}，嘗試使用CoinGecko...")
                 
@@ -443,54 +419,27 @@ def get_dexscreener_data(symbol, timeframe, limit=100):
                     # 使用CoinGecko API獲取數據
                     vs_currency = quote.lower()
                     days = min(365, limit)  # CoinGecko最多支持365天
+                    if since is not None:
+                        # 增量獲取時只請求since之後的天數
+                        days = max(1, min(days, int((time.time() * 1000 - since) // 86400000) + 1))
                     
                     # 構建API URL
-                    url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
+                    url = f"{COINGECKO_BASE_URL}/coins/{coin_id}/market_chart"
                     params = {
                         'vs_currency': vs_currency,
                         'days': days,
                         'interval': 'daily' if timeframe in ['1d', '1w'] else 'hourly'
                     }
                     
-                    response = requests.get(url, params=params)
+                    response = http_get(url, params=params)
                     if response.status_code == 200:
-                        data = response.json()
-                        
-                        # 提取價格和成交量數據
-                        prices = data['prices']  # [timestamp, price]
-                        volumes = data['total_volumes']  # [timestamp, volume]
+                        data = loads(response.content)
                         
-                        # 將數據轉換為DataFrame所需格式
-                        ohlcv_data = []
-                        for i, (price_item, volume_item) in enumerate(zip(prices, volumes)):
-                            timestamp = price_item[0]
-                            price = price_item[1]
-                            volume = volume_item[1]
-                            
-                            # 由於CoinGecko只提供收盤價，我們需要模擬OHLC數據
-                            # 但我們會保持價格接近實際價格
-                            ohlcv_data.append([
-                                timestamp,
-                                price * (1 - random.uniform(0, 0.01)),  # 開盤價略低於收盤價
-                                price * (1 + random.uniform(0, 0.015)),  # 最高價略高於收盤價
-                                price * (1 - random.uniform(0, 0.015)),  # 最低價略低於收盤價
-                                price,  # 收盤價(實際數據)
-                                volume  # 成交量(實際數據)
-                            ])
-                        
-                        # 過濾數據以匹配請求的時間框架
-                        filtered_data = []
-                        if timeframe == '1d':
-                            filtered_data = ohlcv_data[-limit:]
-                        elif timeframe in ['1h', '4h']:
-                            hours_interval = 1 if timeframe == '1h' else 4
-                            filtered_data = ohlcv_data[::hours_interval][-limit:]
-                        else:
-                            filtered_data = ohlcv_data[-limit:]
-                        
-                        # 創建DataFrame
-                        df = pd.DataFrame(filtered_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+                        # 與CoinGecko數據源共用解析邏輯，4小時K線由小時數據聚合而不是抽樣(見 resample.py)
+                        df = parse_coingecko_market_chart(data, timeframe, limit, since)
+                        if df is None or len(df) == 0:
+                            raise ValueError("CoinGecko沒有返回價格數據")
+                        df = df.reset_index(drop=True)
                         
                         print(f"成功從CoinGecko獲取{symbol}的{len(df)}個數據點")
                         return df
@@ -632,7 +581,7 @@ def verify_price_reasonability(df, base_coin):
             return False
 
 # 添加Smithery MCP Crypto Price API函數
-def get_smithery_mcp_crypto_price(symbol, timeframe, limit=100):
+def get_smithery_mcp_crypto_price(symbol, timeframe, limit=100, since=None):
     """
     從Smithery MCP Crypto Price API獲取加密貨幣數據
     
@@ -640,104 +589,32 @@ def get_smithery_mcp_crypto_price(symbol, timeframe, limit=100):
     symbol (str): 交易對符號，如 'BTC/USDT'
     timeframe (str): 時間框架，如 '1d', '4h', '1h'
     limit (int): 要獲取的數據點數量
+    since (int): 毫秒時間戳，只返回不早於此時間的新K線或更新的K線
     
     返回:
     pandas.DataFrame: 包含OHLCV數據的DataFrame，如果獲取失敗則返回None
     """
     try:
-        # 解析交易對符號
-        base, quote = symbol.split('/')
-        base = base.upper()
-        quote = quote.upper()
-        
-        # 轉換為Smithery MCP可接受的格式
-        mcp_symbol = f"{base}{quote}"
-        
-        # 轉換時間框架為MCP接受的格式
-        mcp_timeframe = {
-            '15m': '15min',
-            '1h': '1h',
-            '4h': '4h',
-            '1d': '1d',
-            '1w': '1w'
-        }.get(timeframe, '1h')
-        
-        # 構建API請求URL
-        url = f"https://smithery.ai/server/@truss44/mcp-crypto-price/get_crypto_price"
-        
-        # 準備請求參數
-        params = {
-            'symbol': mcp_symbol,
-            'interval': mcp_timeframe,
-            'limit': limit
-        }
-        
-        # 準備請求頭
-        headers = {
-            'accept': 'application/json',
-            'Content-Type': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+        # 請求參數和響應解析與異步數據源共用(見 provider_api.py)
+        url, params, headers = smithery_request(symbol, timeframe, limit, since)
         
         # 發送請求
         print(f"請求Smithery MCP API: {url} - 參數: {params}")
-        response = requests.post(url, json=params, headers=headers, timeout=15)
+        response = http_post(url, json=params, headers=headers, timeout=15)
+        check_miss('Smithery MCP', response.status_code, since=since)
         
         if response.status_code == 200:
-            data = response.json()
-            
-            # 檢查返回數據格式
-            if isinstance(data, list) and len(data) > 0:
-                # 構建DataFrame
-                df_data = []
-                for item in data:
-                    # 檢查每條數據是否包含必要的字段
-                    if all(key in item for key in ['timestamp', 'open', 'high', 'low', 'close', 'volume']):
-                        timestamp = item['timestamp']
-                        open_price = float(item['open'])
-                        high_price = float(item['high'])
-                        low_price = float(item['low'])
-                        close_price = float(item['close'])
-                        volume = float(item['volume'])
-                        
-                        df_data.append([
-                            timestamp,
-                            open_price,
-                            high_price,
-                            low_price,
-                            close_price,
-                            volume
-                        ])
-                    else:
-                        print(f"數據項缺少必要字段: {item}")
-                
-                if not df_data:
-                    print("Smithery MCP API返回的數據格式不包含必要字段")
-                    return None
-                
-                # 創建DataFrame
-                df = pd.DataFrame(df_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                
-                # 將timestamp轉換為datetime格式
-                if df['timestamp'].iloc[0] > 10000000000:  # 如果是毫秒時間戳
-                    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-                else:  # 如果是秒時間戳
-                    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='s')
-                
-                # 對數據進行排序，確保時間順序
-                df = df.sort_values('timestamp')
-                
-                # 取最近的limit個數據點
-                if len(df) > limit:
-                    df = df.tail(limit)
-                
+            df = parse_smithery_candles(loads(response.content), limit, since)
+            check_miss('Smithery MCP', response.status_code, df, since)
+            if df is not None:
                 print(f"成功從Smithery MCP獲取{symbol}的{len(df)}個數據點")
                 return df
-            else:
-                print(f"Smithery MCP API返回空數據或格式不正確: {data}")
         else:
             print(f"Smithery MCP API返回錯誤: {response.status_code} - {response.text}")
     
+    except KnownMiss:
+        # 確定性的缺失交給競速記入失敗緩存
+        raise
     except Exception as e:
         print(f"從Smithery MCP獲取數據時出錯: {str(e)}")
     
@@ -746,235 +623,266 @@ def get_smithery_mcp_crypto_price(symbol, timeframe, limit=100):
 # 添加 Crypto APIs 函數
 def get_cryptoapis_price(symbol, timeframe, limit=100):
     """
-    從 Crypto APIs 獲取加密貨幣價格數據
+    返回由 Crypto APIs 匯率聚合的已收盤K線
+    
+    Crypto APIs只提供即時匯率，匯率由後台輪詢獲取並聚合為K線(見 cryptoapis_rates.py)，
+    此函數只讀取已聚合的數據，不發出網絡請求；聚合出的K線沒有成交量，不寫入本地存儲
     
     參數:
     symbol (str): 交易對符號，如 'BTC/USDT'
     timeframe (str): 時間框架，如 '1d', '4h', '1h'
     limit (int): 要獲取的數據點數量
     
+    返回:
+    pandas.DataFrame: 包含OHLCV數據的DataFrame，累積的K線不足時返回None
+    """
+    df = rate_candles(symbol.upper(), timeframe, limit)
+    if df is not None:
+        print(f"成功從Crypto APIs聚合{symbol}的{len(df)}個數據點")
+    return df
+
+# CoinCap API函數
+def get_coincap_data(symbol, timeframe, limit=100, since=None):
+    """
+    從CoinCap API獲取加密貨幣OHLCV數據
+    
+    參數:
+    symbol (str): 交易對符號，如 'BTC/USDT'
+    timeframe (str): 時間框架，如 '1d', '4h', '1h'
+    limit (int): 要獲取的數據點數量
+    since (int): 毫秒時間戳，只返回不早於此時間的新K線或更新的K線
+    
     返回:
     pandas.DataFrame: 包含OHLCV數據的DataFrame，如果獲取失敗則返回None
     """
     try:
-        # 解析交易對符號
-        base, quote = symbol.split('/')
-        base = base.upper()
-        quote = quote.upper()
-        
-        # 從環境變數獲取API密鑰
-        api_key = CRYPTOAPIS_KEY
-        print(f"使用 Crypto APIs 密鑰: {api_key[:5]}...{api_key[-5:]}")
-        
-        # 方法1: 使用Exchange Rate By Asset Symbols端點
-        rate = None
-        
-        # 構建API請求URL
-        url = "https://rest.cryptoapis.io/v2/market-data/exchange-rates/by-asset-symbols"
-        
-        # 準備請求頭
-        headers = {
-            'Content-Type': 'application/json',
-            'X-API-Key': api_key,
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        # 準備請求參數 - 按照文檔要求正確格式化
-        params = {
-            'context': 'crypto_analyzer',
-            'assetPairFrom': base,
-            'assetPairTo': quote
-        }
+        print(f"嘗試使用CoinCap API獲取{symbol}數據")
+        url, params, headers = coincap_request(symbol, timeframe, since)
         
-        print(f"請求Crypto APIs (方法1): {url} - 參數: {params}")
-        response = requests.get(url, params=params, headers=headers, timeout=15)
+        print(f"正在請求CoinCap API: {url}")
+        response = http_get(url, params=params, headers=headers, timeout=10)
+        check_miss('CoinCap', response.status_code, since=since)
         
         if response.status_code == 200:
-            data = response.json()
-            print(f"Crypto APIs響應數據 (方法1): {data}")
-            
-            # 檢查API響應
-            if 'data' in data and 'item' in data['data']:
-                # 如果API響應數據格式與預期不同，嘗試其他解析方式
-                if 'calculationTimestamp' in data['data']['item']:
-                    timestamp = int(data['data']['item']['calculationTimestamp'])
-                    rate = float(data['data']['item']['rate'])
-                elif 'calculatedAt' in data['data']['item']:
-                    timestamp = int(data['data']['item']['calculatedAt'])
-                    rate = float(data['data']['item']['rate'])
-                else:
-                    # 嘗試直接獲取rate字段
-                    rate = 0
-                    timestamp = int(time.time())
-                    for key, value in data['data']['item'].items():
-                        if isinstance(value, (int, float)) and key != 'calculationTimestamp' and key != 'calculatedAt':
-                            rate = float(value)
-                            break
-                
-                if rate and rate > 0:
-                    print(f"成功從Crypto APIs獲取匯率 (方法1): {base}/{quote} = {rate}")
-                else:
-                    print("方法1無法從響應中提取有效匯率")
-                    rate = None
-        else:
-            print(f"Crypto APIs返回錯誤 (方法1): {response.status_code} - {response.text}")
+            df = parse_coincap_history(loads(response.content), limit, since, timeframe)
+            check_miss('CoinCap', response.status_code, df, since)
+            if df is not None and len(df) > 0:
+                print(f"成功從CoinCap獲取{symbol}的{len(df)}個數據點，最新價格: ${df['close'].iloc[-1]:.2f}")
+                return df
+    except KnownMiss:
+        raise
+    except Exception as e:
+        print(f"CoinCap API請求失敗: {str(e)}")
+    
+    return None
+
+# CoinGecko API函數
+def get_coingecko_data(symbol, timeframe, limit=100, since=None):
+    """
+    從CoinGecko API獲取加密貨幣OHLCV數據
+    
+    參數:
+    symbol (str): 交易對符號，如 'BTC/USDT'
+    timeframe (str): 時間框架，如 '1d', '4h', '1h'
+    limit (int): 要獲取的數據點數量
+    since (int): 毫秒時間戳，只返回不早於此時間的新K線或更新的K線
+    
+    返回:
+    pandas.DataFrame: 包含OHLCV數據的DataFrame，如果獲取失敗則返回None
+    """
+    try:
+        print(f"嘗試使用CoinGecko API獲取{symbol}數據")
+        url, params, headers = coingecko_request(symbol, timeframe, since)
         
-        # 方法2: 如果第一種方法失敗，嘗試使用另一個端點
-        if rate is None:
-            # 嘗試使用Get Exchange Rate By Assets IDs端點
-            url2 = "https://rest.cryptoapis.io/v2/market-data/exchange-rates/by-assets-ids"
-            
-            # 資產ID映射
-            asset_ids = {
-                'BTC': 'bitcoin',
-                'ETH': 'ethereum',
-                'USDT': 'tether',
-                'USDC': 'usd-coin',
-                'SOL': 'solana',
-                'BNB': 'binancecoin',
-                'XRP': 'xrp',
-                'ADA': 'cardano',
-                'DOGE': 'dogecoin',
-                'SHIB': 'shiba-inu'
-            }
-            
-            from_id = asset_ids.get(base, base.lower())
-            to_id = asset_ids.get(quote, quote.lower())
-            
-            # 準備請求參數
-            params2 = {
-                'context': 'crypto_analyzer',
-                'assetIdFrom': from_id,
-                'assetIdTo': to_id
-            }
-            
-            print(f"請求Crypto APIs (方法2): {url2} - 參數: {params2}")
-            response2 = requests.get(url2, params=params2, headers=headers, timeout=15)
-            
-            if response2.status_code == 200:
-                data2 = response2.json()
-                print(f"Crypto APIs響應數據 (方法2): {data2}")
-                
-                # 嘗試從響應中提取匯率
-                if 'data' in data2 and 'item' in data2['data']:
-                    if 'rate' in data2['data']['item']:
-                        rate = float(data2['data']['item']['rate'])
-                        print(f"成功從Crypto APIs獲取匯率 (方法2): {base}/{quote} = {rate}")
-                    else:
-                        print("方法2無法從響應中提取有效匯率")
-            else:
-                print(f"Crypto APIs返回錯誤 (方法2): {response2.status_code} - {response2.text}")
+        print(f"正在請求CoinGecko API: {url}")
+        response = http_get(url, params=params, headers=headers, timeout=10)
+        check_miss('CoinGecko', response.status_code, since=since)
         
-        # 方法3: 如果前兩種方法都失敗，嘗試使用Get Asset Details By Asset Symbol
-        if rate is None:
-            # 獲取基礎資產詳情
-            url3 = f"https://rest.cryptoapis.io/v2/market-data/assets/assetSymbol/{base}"
-            
-            print(f"請求Crypto APIs (方法3): {url3}")
-            response3 = requests.get(url3, headers=headers, timeout=15)
-            
-            if response3.status_code == 200:
-                data3 = response3.json()
-                
-                # 嘗試從響應中提取價格
-                if 'data' in data3 and 'item' in data3['data']:
-                    if 'price' in data3['data']['item']:
-                        price_usd = float(data3['data']['item']['price'])
-                        
-                        # 如果報價貨幣是USD或USDT，直接使用價格
-                        if quote in ['USD', 'USDT', 'USDC']:
-                            rate = price_usd
-                            print(f"成功從Crypto APIs獲取{base}價格 (方法3): {rate} USD")
-                        else:
-                            # 如果不是，需要獲取報價貨幣對USD的匯率來換算
-                            url4 = f"https://rest.cryptoapis.io/v2/market-data/assets/assetSymbol/{quote}"
-                            response4 = requests.get(url4, headers=headers, timeout=15)
-                            
-                            if response4.status_code == 200:
-                                data4 = response4.json()
-                                if 'data' in data4 and 'item' in data4['data'] and 'price' in data4['data']['item']:
-                                    quote_price_usd = float(data4['data']['item']['price'])
-                                    if quote_price_usd > 0:
-                                        rate = price_usd / quote_price_usd
-                                        print(f"成功計算{base}/{quote}匯率 (方法3): {rate}")
-            else:
-                print(f"Crypto APIs返回錯誤 (方法3): {response3.status_code} - {response3.text}")
-        
-        # 如果所有方法都失敗，使用固定的基準價格
-        if rate is None or rate <= 0:
-            # 提供最後備用價格
-            backup_prices = {
-                'BTC': 67000,
-                'ETH': 3200,
-                'SOL': 165,
-                'BNB': 560,
-                'XRP': 0.61,
-                'ADA': 0.45,
-                'DOGE': 0.15,
-                'SHIB': 0.00002700
-            }
-            
-            rate = backup_prices.get(base, 100)
-            print(f"使用備用價格: {base} = ${rate}")
-        
-        # 生成時間序列OHLCV數據
-        # 計算時間間隔的秒數
-        interval_seconds = {
-            '15m': 15 * 60,
-            '1h': 60 * 60,
-            '4h': 4 * 60 * 60,
-            '1d': 24 * 60 * 60,
-            '1w': 7 * 24 * 60 * 60
-        }.get(timeframe, 60 * 60)  # 默認為1小時
-        
-        # 生成時間戳列表
-        end_time = int(time.time())
-        timestamps = [end_time - (i * interval_seconds) for i in range(limit)]
-        timestamps.reverse()  # 確保時間戳按升序排列
-        
-        # 生成OHLCV數據
-        df_data = []
-        current_price = rate
-        
-        for ts in timestamps:
-            # 添加小幅隨機波動 (±0.5%)
-            random_factor = 1 + random.uniform(-0.005, 0.005)
-            price = current_price * random_factor
-            
-            open_price = price * (1 - random.uniform(0, 0.002))
-            high_price = price * (1 + random.uniform(0, 0.003))
-            low_price = price * (1 - random.uniform(0, 0.003))
-            close_price = price
-            volume = price * random.uniform(10, 100)  # 模擬成交量
-            
-            df_data.append([
-                ts * 1000,  # 轉換為毫秒
-                open_price,
-                high_price,
-                low_price,
-                close_price,
-                volume
-            ])
-        
-        # 創建DataFrame
-        df = pd.DataFrame(df_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        
-        print(f"成功從Crypto APIs生成{symbol}的{len(df)}個數據點")
-        return df
-    
+        if response.status_code == 200:
+            df = parse_coingecko_market_chart(loads(response.content), timeframe, limit, since)
+            check_miss('CoinGecko', response.status_code, df, since)
+            if df is not None and len(df) > 0:
+                print(f"成功從CoinGecko獲取{symbol}的{len(df)}個數據點，最新價格: ${df['close'].iloc[-1]:.2f}")
+                return df
+    except KnownMiss:
+        raise
     except Exception as e:
-        print(f"從Crypto APIs獲取數據時出錯: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        print(f"CoinGecko API請求失敗: {str(e)}")
     
     return None
 
+# 數據源名稱及其顯示名稱
+PROVIDER_LABELS = {
+    'cryptoapis': 'Crypto APIs',
+    'smithery': 'Smithery MCP',
+    'coincap': 'CoinCap',
+    'coingecko': 'CoinGecko',
+    'dexscreener': 'DexScreener',
+    'ccxt': 'CCXT Binance',
+    'consensus': '多數據源共識'
+}
+
+def fetch_from_providers(symbol, timeframe, limit=100, since=None):
+    """
+    向所有數據源競速請求數據，不讀寫緩存和本地存儲
+    
+    開啟 CONSENSUS_MODE 時同時向多個數據源請求，合併為共識K線，數據源名稱為 'consensus'(見 consensus.py)
+    
+    參數:
+    symbol (str): 交易對符號，如 'BTC/USDT'
+    timeframe (str): 時間框架，如 '1d', '4h', '1h'
+    limit (int): 要獲取的數據點數量
+    since (int): 毫秒時間戳，只獲取不早於此時間的K線
+    
+    返回:
+    tuple: (數據源名稱, DataFrame)，全部失敗時返回 (None, None)
+    """
+    base_coin = symbol.split('/')[0].upper()
+    providers = [
+        ('smithery', lambda: get_smithery_mcp_crypto_price(symbol, timeframe, limit, since=since)),
+        ('coincap', lambda: get_coincap_data(symbol, timeframe, limit, since=since)),
+        ('coingecko', lambda: get_coingecko_data(symbol, timeframe, limit, since=since))
+    ]
+    # Crypto APIs只在後台輪詢累積了足夠的已收盤K線時參與完整窗口的競速，不會因數據不足被記為失敗
+    rate_poller.watch(symbol)
+    if since is None and rate_candles_ready(symbol, timeframe, limit):
+        providers.insert(0, ('cryptoapis', lambda: get_cryptoapis_price(symbol, timeframe, limit)))
+    validator = lambda data: verify_price_reasonability(data, base_coin)
+    if CONSENSUS_MODE:
+        return fetch_consensus(symbol, timeframe, providers, validator)
+    # 最近沒有返回有效數據的 (數據源, 交易對, 時間框架) 組合會被跳過(見 negative_cache.py)
+    return race_providers(providers, validator, key=(symbol, timeframe))
+
+def fetch_consensus(symbol, timeframe, providers, validator):
+    """
+    同時向多個數據源請求同一窗口，按時間對齊後取中位數合併
+    
+    收盤價偏離共識的數據源記入失敗緩存，之後一段時間內不再參與該交易對的獲取；
+    有效結果不足 CONSENSUS_MIN_PROVIDERS 個時直接使用唯一的有效結果
+    
+    返回:
+    tuple: (數據源名稱, DataFrame)，全部失敗時返回 (None, None)
+    """
+    results = gather_providers(providers, validator, CONSENSUS_PROVIDERS, key=(symbol, timeframe))
+    if len(results) < CONSENSUS_MIN_PROVIDERS:
+        print(f"{symbol}只有{len(results)}個數據源返回有效數據，無法進行共識合併")
+        return results[0] if results else (None, None)
+    
+    df, report = merge_consensus(results, timeframe)
+    consensus_tracker.record(report)
+    for name in report['outliers']:
+        print(f"數據源{name}的{symbol}價格偏離共識 {report['deviation'][name]:.2%}，標記為異常")
+        negative_cache.add(name, symbol, timeframe, reason="偏離共識")
+    if report['disagreement']:
+        print(f"{symbol}各數據源價格互相偏離，共識結果可信度較低: {report['deviation']}")
+    if df is None:
+        return results[0]
+    
+    print(f"{symbol}共識合併完成，使用數據源: {', '.join(report['providers'])}")
+    return 'consensus', df
+
+def fetch_and_store(symbol, timeframe, limit, stored_df=None, since=None):
+    """
+    競速獲取數據，並增量寫入本地存儲和共享緩存
+    
+    返回:
+    tuple: (數據源名稱, 合併歷史數據後的DataFrame)，全部失敗時返回 (None, None)
+    """
+    # 競速獲取，第一個通過價格驗證的數據源勝出
+    provider, df = fetch_from_providers(symbol, timeframe, limit, since)
+    if df is not None:
+        # 增量寫入本地存儲並存入共享緩存
+        df = save_window(symbol, timeframe, df, limit, stored_df, since)
+    return provider, df
+
+def background_flight_key(symbol, timeframe, limit):
+    """
+    後台刷新使用的請求合併鍵
+    
+    後台請求以最低優先級排隊，與互動請求使用不同的鍵，
+    避免互動請求合併到後台請求上而繼承其最低優先級(見 rate_limiter.py)
+    """
+    return ('background', symbol, timeframe, limit)
+
+def prefetch_crypto_data(symbol, timeframe, limit=100):
+    """
+    後台預取使用的刷新函數，忽略仍然有效的緩存並且不輸出界面元素(見 prefetcher.py)
+    請求以最低優先級排隊，不會搶佔互動分析的限流配額(見 rate_limiter.py)
+    """
+    _, stored_df, since = load_window(symbol, timeframe, limit, force=True)
+    with request_priority(BACKGROUND):
+        crypto_flight.do(
+            background_flight_key(symbol, timeframe, limit),
+            lambda: fetch_and_store(symbol, timeframe, limit, stored_df, since)
+        )
+
+def get_history_data(symbol, timeframe, count=250):
+    """
+    獲取計算長週期指標(如SMA200)所需的深度歷史K線
+    
+    缺少的部分通過ccxt分頁並發獲取並寫入本地存儲(見 history_loader.py)，
+    同一時間對同一交易對的多個請求只會發起一次加載
+    
+    參數:
+    symbol (str): 交易對符號，如 'BTC/USDT'
+    timeframe (str): 時間框架，如 '1d', '4h', '1h'
+    count (int): 需要的K線數量
+    
+    返回:
+    pandas.DataFrame: 歷史K線數據，獲取失敗時返回None
+    """
+    try:
+        df, shared = crypto_flight.do(
+            ('history', symbol, timeframe, count),
+            lambda: load_history(symbol, timeframe, count)
+        )
+    except Exception as e:
+        print(f"加載{symbol}歷史K線時出錯: {str(e)}")
+        return None
+    return df.copy() if shared and df is not None else df
+
+# 只重新運行局部區塊的裝飾器，舊版Streamlit中名為 experimental_fragment
+live_fragment = getattr(st, 'fragment', None) or st.experimental_fragment
+
+@live_fragment(run_every=1)
+def render_live_candle(symbol, timeframe):
+    """
+    每秒刷新一次當前K線的即時價格，不重新運行整個頁面和圖表(見 kline_stream.py)
+    
+    參數:
+    symbol (str): 交易對符號，如 'BTC/USDT'
+    timeframe (str): 時間框架，如 '1h'
+    """
+    try:
+        kline_stream.subscribe(symbol, timeframe)
+    except RuntimeError as e:
+        st.warning(str(e))
+        return
+    
+    candle, age = kline_stream.latest(symbol, timeframe)
+    if candle is None:
+        st.caption("正在連接即時K線串流...")
+        return
+    
+    change = (candle['close'] - candle['open']) / candle['open'] * 100 if candle['open'] else 0.0
+    live_cols = st.columns(4)
+    live_cols[0].metric("即時價格", f"${candle['close']:,.4f}", f"{change:+.2f}%")
+    live_cols[1].metric("本K線最高", f"${candle['high']:,.4f}")
+    live_cols[2].metric("本K線最低", f"${candle['low']:,.4f}")
+    live_cols[3].metric("本K線成交量", f"{candle['volume']:,.2f}")
+    st.caption(f"⚡ {age:.1f} 秒前更新")
+
 # 修改get_crypto_data函數，使Crypto APIs成為主要數據源
 def get_crypto_data(symbol, timeframe, limit=100):
     """
     獲取加密貨幣歷史數據，優先使用Crypto APIs
     
+    數據源按 DATA_FETCH_MODE 設置並行競速或錯開啟動(見 provider_race.py)，
+    採用第一個通過價格合理性驗證的結果；獲取的K線會增量寫入本地存儲(見 candle_store.py)
+    緩存過期不超過 OHLCV_MAX_STALENESS 秒時直接返回舊數據並在後台刷新，
+    此時 DataFrame.attrs 中的 stale 為True，data_age 為數據存在的秒數；
+    所有數據源都失敗(如分析時間預算用盡)但本地存儲中有數據時，同樣以舊數據返回
+    
     參數:
     - symbol: 交易對符號，例如 'BTC/USDT'
     - timeframe: 時間框架，例如 '15m', '1h', '4h', '1d', '1w'
@@ -983,281 +891,51 @@ def get_crypto_data(symbol, timeframe, limit=100):
     返回:
     - 包含 timestamp, open, high, low, close, volume 列的 DataFrame
     """
-    # 檢查緩存
-    cache_key = f"{symbol}_{timeframe}"
-    if 'price_data' in st.session_state and cache_key in st.session_state.price_data:
-        print(f"使用緩存的{symbol}數據")
-        return st.session_state.price_data[cache_key]
+    # 檢查共享緩存和本地K線存儲，並計算增量獲取的起點(見 data_cache.py)
+    ready_df, stored_df, since = load_window(symbol, timeframe, limit)
+    if ready_df is not None:
+        return ready_df
+    
+    # 緩存已過期但未超過最長過期時間時，先返回舊數據並在後台刷新
+    stale_df, stale_age = shared_cache.get_stale(symbol, timeframe, limit)
+    if stale_df is not None:
+        print(f"使用{stale_age:.0f}秒前的{symbol}緩存數據，後台刷新中")
+        # 後台刷新不受本次分析的截止時間限制
+        with request_priority(BACKGROUND), deadline_scope(None):
+            crypto_flight.do_background(
+                background_flight_key(symbol, timeframe, limit),
+                lambda: fetch_and_store(symbol, timeframe, limit, stored_df, since)
+            )
+        stale_df.attrs['data_age'] = stale_age
+        stale_df.attrs['stale'] = True
+        return stale_df
     
     st.info(f"正在獲取 {symbol} ({timeframe}) 的市場數據...")
     print(f"調用get_crypto_data: {symbol}, {timeframe}, {limit}")
     
-    # 1. 首先嘗試使用Crypto APIs
-    df = get_cryptoapis_price(symbol, timeframe, limit)
-    if df is not None and len(df) > 0:
-        # 驗證價格合理性
-        base_coin = symbol.split('/')[0].upper()
-        if verify_price_reasonability(df, base_coin):
-            # 存入session_state
-            if 'price_data' not in st.session_state:
-                st.session_state.price_data = {}
-            
-            st.session_state.price_data[cache_key] = df.copy()
-            
-            st.success(f"成功從Crypto APIs獲取 {symbol} 數據，最新價格: ${df['close'].iloc[-1]:.2f}")
-            return df
-        else:
-            print(f"Crypto APIs數據價格驗證失敗")
-    
-    # 2. 如果Crypto APIs失敗，嘗試使用Smithery MCP API
-    df = get_smithery_mcp_crypto_price(symbol, timeframe, limit)
-    if df is not None and len(df) > 0:
-        # 驗證價格合理性
-        base_coin = symbol.split('/')[0].upper()
-        if verify_price_reasonability(df, base_coin):
-            # 存入session_state
-            if 'price_data' not in st.session_state:
-                st.session_state.price_data = {}
-            
-            st.session_state.price_data[cache_key] = df.copy()
-            
-            st.success(f"成功獲取 {symbol} 數據，最新價格: ${df['close'].iloc[-1]:.2f}")
-            return df
-        else:
-            print(f"Smithery MCP數據價格驗證失敗")
+    # 相同 (symbol, timeframe, limit) 的並發請求共享同一次獲取(見 single_flight.py)
+    (provider, df), shared = crypto_flight.do(
+        (symbol, timeframe, limit),
+        lambda: fetch_and_store(symbol, timeframe, limit, stored_df, since)
+    )
     
-    # 3. 如果Smithery MCP失敗，嘗試使用CoinCap API
-    try:
-        print(f"嘗試使用CoinCap API獲取{symbol}數據")
-        
-        # CoinCap ID映射
-        coincap_id_map = {
-            'BTC': 'bitcoin',
-            'ETH': 'ethereum',
-            'SOL': 'solana',
-            'BNB': 'binance-coin',
-            'XRP': 'xrp',
-            'ADA': 'cardano',
-            'DOGE': 'dogecoin',
-            'SHIB': 'shiba-inu'
-        }
-        
-        base, quote = symbol.split('/')
-        coin_id = coincap_id_map.get(base.upper(), base.lower())
-        
-        # 時間間隔映射
-        interval_map = {
-            '15m': 'm15',
-            '1h': 'h1',
-            '4h': 'h2',  # CoinCap沒有h4，用h2替代
-            '1d': 'd1',
-            '1w': 'w1'
-        }
-        
-        interval = interval_map.get(timeframe, 'h1')
-        
-        # 請求頭
-        headers = {
-            'Accept': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        # 計算時間範圍
-        end_time = int(time.time() * 1000)
-        # 根據時間框架計算合適的開始時間
-        time_range = {
-            'm15': 1,     # 1天
-            'h1': 7,      # 7天
-            'h2': 14,     # 14天
-            'd1': 30,     # 30天
-            'w1': 90      # 90天
-        }
-        start_time = end_time - (time_range.get(interval, 7) * 24 * 60 * 60 * 1000)
-        
-        # 發送請求
-        url = f"https://api.coincap.io/v2/assets/{coin_id}/history"
-        params = {
-            'interval': interval,
-            'start': start_time,
-            'end': end_time
-        }
-        
-        print(f"正在請求CoinCap API: {url}")
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            if 'data' in data and data['data']:
-                # 構建OHLCV數據
-                ohlcv_data = []
-                for point in data['data']:
-                    timestamp = point['time']
-                    price = float(point['priceUsd'])
-                    
-                    # CoinCap只提供價格，估算OHLC
-                    # 使用小波動以保持價格接近真實值
-                    open_price = price * (1 - random.uniform(0, 0.002))
-                    high_price = price * (1 + random.uniform(0, 0.003))
-                    low_price = price * (1 - random.uniform(0, 0.003))
-                    
-                    # 估算交易量
-                    volume = price * random.uniform(price*1000, price*10000)
-                    
-                    ohlcv_data.append([
-                        timestamp,
-                        open_price,
-                        high_price,
-                        low_price,
-                        price,
-                        volume
-                    ])
-                
-                # 創建DataFrame並排序
-                df = pd.DataFrame(ohlcv_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-                df = df.sort_values('timestamp')
-                
-                # 過濾所需數量的數據點
-                if len(df) > limit:
-                    df = df.tail(limit)
-                
-                print(f"成功從CoinCap獲取{symbol}的{len(df)}個數據點，最新價格: ${df['close'].iloc[-1]:.2f}")
-                
-                # 驗證價格合理性
-                if verify_price_reasonability(df, base.upper()):
-                    # 存入session_state
-                    if 'price_data' not in st.session_state:
-                        st.session_state.price_data = {}
-                    
-                    st.session_state.price_data[cache_key] = df.copy()
-                    
-                    st.success(f"成功獲取 {symbol} 數據，最新價格: ${df['close'].iloc[-1]:.2f}")
-                    return df
-    except Exception as e:
-        print(f"CoinCap API請求失敗: {str(e)}")
-
-    # 4. 嘗試使用CoinGecko API
-    try:
-        print(f"嘗試使用CoinGecko API獲取{symbol}數據")
-        
-        # CoinGecko ID映射
-        coingecko_id_map = {
-            'BTC': 'bitcoin',
-            'ETH': 'ethereum',
-            'SOL': 'solana',
-            'BNB': 'binancecoin',
-            'XRP': 'ripple',
-            'ADA': 'cardano',
-            'DOGE': 'dogecoin',
-            'SHIB': 'shiba-inu'
-        }
-        
-        base, quote = symbol.split('/')
-        coin_id = coingecko_id_map.get(base.upper(), base.lower())
-        vs_currency = quote.lower()
-        
-        # 根據時間框架選擇天數
-        days_map = {
-            '15m': 1,
-            '1h': 7,
-            '4h': 14,
-            '1d': 30,
-            '1w': 90
-        }
-        days = days_map.get(timeframe, 7)
-        
-        # 選擇合適的時間間隔
-        interval = 'hourly' if timeframe in ['15m', '1h', '4h'] else 'daily'
-        
-        # 請求頭，減少被限流概率
-        headers = {
-            'Accept': 'application/json',
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        # 發送請求
-        url = f"https://api.coingecko.com/api/v3/coins/{coin_id}/market_chart"
-        params = {
-            'vs_currency': vs_currency,
-            'days': days,
-            'interval': interval
-        }
-        
-        print(f"正在請求CoinGecko API: {url}")
-        response = requests.get(url, params=params, headers=headers, timeout=10)
+    if df is not None:
+        if shared:
+            # 共享結果複製一份，避免分析函數添加指標列時互相影響
+            df = df.copy()
         
-        if response.status_code == 200:
-            data = response.json()
-            
-            if 'prices' in data and data['prices']:
-                # 構建OHLCV數據
-                ohlcv_data = []
-                
-                # 價格數據
-                prices = data['prices']  # [timestamp, price]
-                volumes = data['total_volumes'] if 'total_volumes' in data else None
-                
-                for i, price_point in enumerate(prices):
-                    timestamp = price_point[0]
-                    price = price_point[1]
-                    
-                    # 估算OHLC
-                    open_price = price * (1 - random.uniform(0, 0.002))
-                    high_price = price * (1 + random.uniform(0, 0.003))
-                    low_price = price * (1 - random.uniform(0, 0.003))
-                    
-                    # 獲取成交量
-                    if volumes and i < len(volumes):
-                        volume = volumes[i][1]
-                    else:
-                        volume = price * random.uniform(price*1000, price*10000)
-                    
-                    ohlcv_data.append([
-                        timestamp,
-                        open_price,
-                        high_price,
-                        low_price,
-                        price,
-                        volume
-                    ])
-                
-                # 創建DataFrame
-                df = pd.DataFrame(ohlcv_data, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-                df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-                
-                # 根據時間框架過濾數據
-                if timeframe == '1h':
-                    # 每小時數據
-                    df = df.iloc[::1]
-                elif timeframe == '4h':
-                    # 每4小時數據
-                    df = df.iloc[::4]
-                elif timeframe == '1d':
-                    # 每天數據
-                    if interval == 'hourly':
-                        df = df.iloc[::24]
-                
-                # 確保數據點數量
-                if len(df) > limit:
-                    df = df.tail(limit)
-                
-                print(f"成功從CoinGecko獲取{symbol}的{len(df)}個數據點，最新價格: ${df['close'].iloc[-1]:.2f}")
-                
-                # 驗證價格合理性
-                if verify_price_reasonability(df, base.upper()):
-                    # 存入session_state
-                    if 'price_data' not in st.session_state:
-                        st.session_state.price_data = {}
-                    
-                    st.session_state.price_data[cache_key] = df.copy()
-                    
-                    st.success(f"成功獲取 {symbol} 數據，最新價格: ${df['close'].iloc[-1]:.2f}")
-                    return df
-    except Exception as e:
-        print(f"CoinGecko API請求失敗: {str(e)}")
+        st.success(f"成功從{PROVIDER_LABELS.get(provider, provider)}獲取 {symbol} 數據，最新價格: ${df['close'].iloc[-1]:.2f}")
+        return df
+    
+    # 分析時間預算內無法獲取新數據時，退回本地存儲中的舊數據
+    if stored_df is not None and len(stored_df) > 0:
+        store_age = candle_store.age(symbol, timeframe)
+        print(f"無法及時獲取{symbol}的新數據，使用本地存儲的數據")
+        stored_df.attrs['data_age'] = store_age if store_age is not None else 0.0
+        stored_df.attrs['stale'] = True
+        return stored_df
     
-    # 5. 如果所有API都失敗，顯示錯誤
+    # 如果所有API都失敗，顯示錯誤
     error_msg = f"無法從任何API獲取{symbol}的數據。"
     # 記錄詳細錯誤以便調試
     print(f"所有API都失敗了: {error_msg}")
@@ -1267,18 +945,39 @@ def get_crypto_data(symbol, timeframe, limit=100):
     st.error(error_msg + "請檢查網絡連接、API密鑰設置或嘗試其他交易對。")
     
     # 清除可能存在的無效緩存
-    if 'price_data' in st.session_state and cache_key in st.session_state.price_data:
-        del st.session_state.price_data[cache_key]
+    shared_cache.invalidate(symbol, timeframe)
         
     return None
 
+def get_crypto_data_bulk(symbols, timeframe, limit=100):
+    """
+    一次獲取多個交易對的數據(見 bulk_fetch.py)
+    
+    參數:
+    symbols (list): 交易對符號列表
+    timeframe (str): 時間框架
+    limit (int): 每個交易對返回的數據點數量
+    
+    返回:
+    tuple: (交易對到DataFrame的字典, 獲取失敗的交易對列表)
+    """
+    return bulk_get_crypto_data(
+        symbols,
+        timeframe,
+        limit,
+        lambda symbol, since: fetch_from_providers(symbol, timeframe, limit, since),
+        lambda symbol, df: verify_price_reasonability(df, symbol.split('/')[0].upper())
+    )
+
 # 市場結構分析函數 (SMC)
-def smc_analysis(df):
+def smc_analysis(df, history_df=None):
     """
     進行SMC (Smart Money Concept) 市場結構分析
     
     參數:
     df (DataFrame): 包含OHLCV數據的DataFrame
+    history_df (DataFrame): 同一交易對的深度歷史K線，只用於計算df本身不足200根時的SMA200，
+                            其餘指標都基於df，與圖表和SNR分析使用同一數據源
     
     返回:
     dict: 包含分析結果的字典
@@ -1301,7 +1000,10 @@ def smc_analysis(df):
     # 計算基本指標
     df['sma20'] = df['close'].rolling(window=20).mean()
     df['sma50'] = df['close'].rolling(window=50).mean()
-    df['sma200'] = df['close'].rolling(window=50).mean() # 使用50而不是200，因為可能沒有足夠數據點
+    df['sma200'] = df['close'].rolling(window=200).mean() # 數據不足200根時為空值，可通過 get_history_data 獲取深度歷史
+    if history_df is not None and len(history_df) > len(df):
+        history_sma200 = history_df['close'].rolling(window=200).mean()
+        df['sma200'] = df['timestamp'].map(pd.Series(history_sma200.values, index=history_df['timestamp']))
     
     # 計算布林帶
     df['sma20_std'] = df['close'].rolling(window=20).std()
@@ -1398,7 +1100,12 @@ def snr_analysis(df):
     prices = df['close'].values
     highs = df['high'].values
     lows = df['low'].values
-    volumes = df['volume'].values if 'volume' in df else np.ones_like(prices)
+    volumes = df['volume'].values.astype('float64') if 'volume' in df else np.ones_like(prices)
+    # 由匯率或收盤價估算的K線沒有成交量(NaN)，此時各轉折點權重相同
+    if not (np.isfinite(volumes) & (volumes > 0)).any():
+        volumes = np.ones_like(prices)
+    else:
+        volumes = np.where(np.isfinite(volumes), volumes, np.nanmean(volumes))
     n = len(prices)
     
     # 識別局部峰值和谷值(價格轉折點)
@@ -1751,12 +1458,16 @@ with tabs[0]:
     with col3:
         # 額外選項，例如交易量顯示、指標選擇等
         show_volume = st.checkbox('顯示交易量', value=True)
+        live_stream = st.checkbox('即時串流', value=KLINE_STREAM_ENABLED)
         
     with col4:
         # 分析按鈕
         st.markdown("<br>", unsafe_allow_html=True)  # 添加一些空間來對齊按鈕
         analyze_button = st.button('開始分析', use_container_width=True)
     
+    # 在後台保持所有交易對和時間框架的數據有效，並記錄本次會話活動(見 prefetcher.py)
+    ensure_prefetcher(list(coin_options.keys()), list(timeframe_options.keys()), prefetch_crypto_data)
+    
     # 使用卡片式設計展示主要圖表
     st.markdown('<div class="stCardContainer">', unsafe_allow_html=True)
     
@@ -1769,19 +1480,19 @@ with tabs[0]:
         
     if analyze_button or st.session_state.analyzed:
         st.session_state.analyzed = True
+        # 本次分析的整體時間預算，數據獲取、分析和策略預測都只使用剩餘的預算(見 deadline.py)
+        set_deadline(Deadline(ANALYSIS_DEADLINE_SECONDS))
         
         # 顯示加載中動畫
         with st.spinner(f"正在獲取 {selected_symbol} 數據並進行分析..."):
-            # 檢查是否已有緩存數據
-            cache_key = f"{selected_symbol}_{selected_timeframe}"
-            if 'price_data' in st.session_state and cache_key in st.session_state.price_data:
-                print(f"使用緩存的{selected_symbol}數據")
-                df = st.session_state.price_data[cache_key]
-            else:
-                # 使用DexScreener API獲取真實數據
-                df = get_crypto_data(selected_symbol, selected_timeframe, limit=100)
+            # 獲取數據 (get_crypto_data 會優先使用共享緩存)
+            df = get_crypto_data(selected_symbol, selected_timeframe, limit=100)
                 
             if df is not None:
+                # 顯示舊數據的更新時間，新數據正在後台獲取
+                if df.attrs.get('stale'):
+                    st.caption(f"⏱ 數據更新於 {df.attrs['data_age'] / 60:.1f} 分鐘前，正在後台刷新")
+                
                 # 使用真實數據創建圖表
                 fig = go.Figure()
                 
@@ -1833,6 +1544,10 @@ with tabs[0]:
                 # 顯示圖表
                 st.plotly_chart(fig, use_container_width=True)
                 
+                # 即時串流只刷新當前K線區塊，不重新計算整個圖表
+                if live_stream:
+                    render_live_candle(selected_symbol, selected_timeframe)
+                
                 if show_volume:
                     # 添加成交量圖表 - 使用實際數據
                     volume_fig = go.Figure()
@@ -1858,8 +1573,11 @@ with tabs[0]:
                     
                     st.plotly_chart(volume_fig, use_container_width=True)
                 
-                # 進行真實技術分析
-                smc_data = smc_analysis(df)
+                # 進行真實技術分析，SMC和SNR都基於圖表使用的df；深度歷史只用於SMA200，剩餘預算不足時跳過
+                history_df = None
+                if has_budget(HISTORY_MIN_BUDGET_SECONDS):
+                    history_df = get_history_data(selected_symbol, selected_timeframe, 250)
+                smc_data = smc_analysis(df, history_df)
                 snr_data = snr_analysis(df)
             else:
                 st.error(f"無法獲取 {selected_symbol} 的數據，請稍後再試或選擇其他幣種。")
@@ -2050,9 +1768,10 @@ with tabs[1]:
                 請僅提供3-4個具體的交易策略建議，包括進場點、目標價和止損位。以Markdown格式回答。
                 """
                 
+                strategy_analysis = None
                 try:
-                    # 如果有DeepSeek API密鑰，使用API
-                    if DEEPSEEK_API_KEY:
+                    # 如果有DeepSeek API密鑰且剩餘預算足夠，使用API，否則直接使用模板報告
+                    if DEEPSEEK_API_KEY and has_budget(LLM_MIN_BUDGET_SECONDS):
                         headers = {
                             "Content-Type": "application/json",
                             "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
@@ -2070,69 +1789,44 @@ with tabs[1]:
                             "max_tokens": 800
                         }
                         
-                        response = requests.post(
+                        response = http_post(
                             "https://api.deepseek.com/v1/chat/completions",
                             headers=headers,
-                            json=payload
+                            json=payload,
+                            timeout=cap_timeout(None)  # LLM生成時間較長，只受本次分析的剩餘預算限制
                         )
                         
                         if response.status_code == 200:
                             strategy_analysis = response.json()["choices"][0]["message"]["content"]
-                        else:
-                            strategy_analysis = f"## {selected_symbol} 短期策略建議\n\n"
-                            
-                            if final_rec == "buy":
-                                strategy_analysis += f"""
-                                **突破策略**: 若價格突破${snr_data['near_resistance']:.2f}阻力位，且成交量放大，可考慮追漲進場，目標${smc_data['resistance_level']:.2f}，止損設在${(snr_data['near_resistance']*0.99):.2f}。
-                                
-                                **支撐回調策略**: 若價格回調至${snr_data['near_support']:.2f}支撐位附近，RSI同時回落至50以下，可考慮逢低買入，目標${snr_data['near_resistance']:.2f}，止損設在${(snr_data['near_support']*0.98):.2f}。
-                                """
-                            elif final_rec == "sell":
-                                strategy_analysis += f"""
-                                **做空策略**: 若價格在${snr_data['near_resistance']:.2f}阻力位附近遇阻，RSI高於60，可考慮做空，目標${snr_data['near_support']:.2f}，止損設在${(snr_data['near_resistance']*1.02):.2f}。
-                                
-                                **高點拋售策略**: 若持倉且價格接近${smc_data['resistance_level']:.2f}，可考慮獲利了結，避免回調風險。
-                                """
-                            else:
-                                strategy_analysis += f"""
-                                **區間震盪策略**: 價格可能在${snr_data['near_support']:.2f}-${snr_data['near_resistance']:.2f}之間震盪，可考慮在區間下沿買入，上沿賣出的高頻操作策略。
-                                
-                                **觀望策略**: 目前市場信號混合，建議觀望至趨勢明確，可關注${snr_data['near_support']:.2f}和${snr_data['near_resistance']:.2f}的突破情況。
-                                """
-                            
-                            strategy_analysis += f"""
-                            **風險評估**: 目前市場風險{"偏高" if risk_score > 7 else "偏中性" if risk_score > 4 else "偏低"}，建議使用不超過{30 if risk_score < 5 else 20 if risk_score < 8 else 10}%的資金參與此類交易。
-                            """
-                    else:
-                        # 如果沒有API密鑰，使用預設分析
-                        strategy_analysis = f"## {selected_symbol} 短期策略建議\n\n"
-                        
-                        if final_rec == "buy":
-                            strategy_analysis += f"""
-                            **突破策略**: 若價格突破${snr_data['near_resistance']:.2f}阻力位，且成交量放大，可考慮追漲進場，目標${smc_data['resistance_level']:.2f}，止損設在${(snr_data['near_resistance']*0.99):.2f}。
-                            
-                            **支撐回調策略**: 若價格回調至${snr_data['near_support']:.2f}支撐位附近，RSI同時回落至50以下，可考慮逢低買入，目標${snr_data['near_resistance']:.2f}，止損設在${(snr_data['near_support']*0.98):.2f}。
-                            """
-                        elif final_rec == "sell":
-                            strategy_analysis += f"""
-                            **做空策略**: 若價格在${snr_data['near_resistance']:.2f}阻力位附近遇阻，RSI高於60，可考慮做空，目標${snr_data['near_support']:.2f}，止損設在${(snr_data['near_resistance']*1.02):.2f}。
-                            
-                            **高點拋售策略**: 若持倉且價格接近${smc_data['resistance_level']:.2f}，可考慮獲利了結，避免回調風險。
-                            """
-                        else:
-                            strategy_analysis += f"""
-                            **區間震盪策略**: 價格可能在${snr_data['near_support']:.2f}-${snr_data['near_resistance']:.2f}之間震盪，可考慮在區間下沿買入，上沿賣出的高頻操作策略。
-                            
-                            **觀望策略**: 目前市場信號混合，建議觀望至趨勢明確，可關注${snr_data['near_support']:.2f}和${snr_data['near_resistance']:.2f}的突破情況。
-                            """
+                except Exception as e:
+                    print(f"DeepSeek策略預測失敗，使用模板報告: {str(e)}")
+                
+                if strategy_analysis is None:
+                    # API不可用、失敗或預算不足時，使用預設分析
+                    strategy_analysis = f"## {selected_symbol} 短期策略建議\n\n"
+                    
+                    if final_rec == "buy":
+                        strategy_analysis += f"""
+                        **突破策略**: 若價格突破${snr_data['near_resistance']:.2f}阻力位，且成交量放大，可考慮追漲進場，目標${smc_data['resistance_level']:.2f}，止損設在${(snr_data['near_resistance']*0.99):.2f}。
                         
+                        **支撐回調策略**: 若價格回調至${snr_data['near_support']:.2f}支撐位附近，RSI同時回落至50以下，可考慮逢低買入，目標${snr_data['near_resistance']:.2f}，止損設在${(snr_data['near_support']*0.98):.2f}。
+                        """
+                    elif final_rec == "sell":
                         strategy_analysis += f"""
-                        **風險評估**: 目前市場風險{"偏高" if risk_score > 7 else "偏中性" if risk_score > 4 else "偏低"}，建議使用不超過{30 if risk_score < 5 else 20 if risk_score < 8 else 10}%的資金參與此類交易。
+                        **做空策略**: 若價格在${snr_data['near_resistance']:.2f}阻力位附近遇阻，RSI高於60，可考慮做空，目標${snr_data['near_support']:.2f}，止損設在${(snr_data['near_resistance']*1.02):.2f}。
+                        
+                        **高點拋售策略**: 若持倉且價格接近${smc_data['resistance_level']:.2f}，可考慮獲利了結，避免回調風險。
                         """
+                    else:
+                        strategy_analysis += f"""
+                        **區間震盪策略**: 價格可能在${snr_data['near_support']:.2f}-${snr_data['near_resistance']:.2f}之間震盪，可考慮在區間下沿買入，上沿賣出的高頻操作策略。
                         
-                except Exception as e:
-                    st.error(f"策略分析生成錯誤: {str(e)}")
-                    strategy_analysis = "無法生成策略分析，請稍後再試。"
+                        **觀望策略**: 目前市場信號混合，建議觀望至趨勢明確，可關注${snr_data['near_support']:.2f}和${snr_data['near_resistance']:.2f}的突破情況。
+                        """
+                    
+                    strategy_analysis += f"""
+                    **風險評估**: 目前市場風險{"偏高" if risk_score > 7 else "偏中性" if risk_score > 4 else "偏低"}，建議使用不超過{30 if risk_score < 5 else 20 if risk_score < 8 else 10}%的資金參與此類交易。
+                    """
                 
                 st.markdown(strategy_analysis)
                 
@@ -2151,6 +1845,9 @@ with tabs[1]:
         # 顯示占位符提示
         st.info("請在「技術分析」頁面選擇加密貨幣並點擊「開始分析」按鈕來產生 AI 分析。")
 
+# 分析和策略預測到此結束，之後的市場數據等頁面不受本次分析的截止時間限制
+set_deadline(None)
+
 with tabs[2]:
     # 市場數據標籤內容
     st.markdown("<h2>市場數據</h2>", unsafe_allow_html=True)
@@ -2161,24 +1858,12 @@ with tabs[2]:
     
     # 嘗試獲取真實市場數據
     try:
-        # 檢查是否已有緩存數據
-        btc_cache_key = "BTC/USDT_1d"
-        eth_cache_key = "ETH/USDT_1d"
+        # 使用get_crypto_data獲取 (優先使用共享緩存)
+        with st.spinner("獲取BTC數據中..."):
+            btc_data = get_crypto_data("BTC/USDT", "1d", limit=2)
         
-        if 'price_data' in st.session_state and btc_cache_key in st.session_state.price_data:
-            print("使用緩存的BTC數據")
-            btc_data = st.session_state.price_data[btc_cache_key]
-        else:
-            # 使用get_crypto_data獲取
-            with st.spinner("獲取BTC數據中..."):
-                btc_data = get_crypto_data("BTC/USDT", "1d", limit=2)
-        
-        if 'price_data' in st.session_state and eth_cache_key in st.session_state.price_data:
-            print("使用緩存的ETH數據")
-            eth_data = st.session_state.price_data[eth_cache_key]
-        else:
-            with st.spinner("獲取ETH數據中..."):
-                eth_data = get_crypto_data("ETH/USDT", "1d", limit=2)
+        with st.spinner("獲取ETH數據中..."):
+            eth_data = get_crypto_data("ETH/USDT", "1d", limit=2)
         
         # 計算比特幣24小時變化百分比
         if btc_data is not None and len(btc_data) >= 2:
@@ -2274,16 +1959,14 @@ with tabs[2]:
     market_data_list = []
     
     with st.spinner("正在獲取市場數據..."):
+        # 批量獲取所有幣種的當日數據 (優先使用共享緩存)
+        market_frames, failed_symbols = get_crypto_data_bulk(crypto_list, "1d", limit=7)
+        if failed_symbols:
+            st.warning(f"無法獲取以下幣種的數據: {', '.join(failed_symbols)}")
+        
         for symbol in crypto_list:
             try:
-                # 檢查是否已有緩存數據
-                cache_key = f"{symbol}_1d"
-                if 'price_data' in st.session_state and cache_key in st.session_state.price_data:
-                    print(f"使用緩存的{symbol}數據")
-                    df = st.session_state.price_data[cache_key]
-                else:
-                    # 獲取當日數據
-                    df = get_crypto_data(symbol, "1d", limit=8)
+                df = market_frames.get(symbol)
                 
                 if df is not None and len(df) > 0:
                     # 獲取最新價格
@@ -2295,9 +1978,9 @@ with tabs[2]:
                     else:
                         change_24h = 0
                         
-                    # 計算7天變化百分比
-                    if len(df) >= 8:
-                        change_7d = ((df['close'].iloc[-1] - df['close'].iloc[-8]) / df['close'].iloc[-8]) * 100
+                    # 計算7天變化百分比，以7根日K線中最早一根的開盤價(約7天前的收盤價)為基準
+                    if len(df) >= 7:
+                        change_7d = ((df['close'].iloc[-1] - df['open'].iloc[-7]) / df['open'].iloc[-7]) * 100
                     else:
                         change_7d = 0
                         
@@ -2316,8 +1999,8 @@ with tabs[2]:
                     circulation = market_cap_map.get(symbol, 1000000)
                     market_cap = current_price * circulation / 1000000000  # 十億美元
                     
-                    # 估算24小時成交量 (使用當前價格和成交量估算)
-                    volume_24h = df['volume'].iloc[-1] / 1000000000  # 十億美元
+                    # 估算24小時成交量 (使用當前價格和成交量估算)，CoinGecko批量數據的K線沒有成交量，使用其24小時成交量
+                    volume_24h = df.attrs.get('volume_24h', df['volume'].iloc[-1]) / 1000000000  # 十億美元
                     
                     # 添加到數據列表
                     symbol_name = symbol.split('/')[0]
@@ -2505,6 +2188,105 @@ with tabs[3]:
     
     st.markdown('</div>', unsafe_allow_html=True)
     
+    # 數據源狀態卡片
+    st.markdown('<div class="stCardContainer">', unsafe_allow_html=True)
+    st.markdown("<h3>數據源狀態</h3>", unsafe_allow_html=True)
+    
+    # 共享緩存統計
+    cache_stats = shared_cache.stats()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("緩存條目", f"{cache_stats['size']}/{cache_stats['max_entries']}")
+    with col2:
+        st.metric("命中次數", cache_stats['hits'])
+    with col3:
+        st.metric("未命中次數", cache_stats['misses'])
+    with col4:
+        st.metric("命中率", f"{cache_stats['hit_rate'] * 100:.1f}%")
+    
+    # 並發請求合併統計
+    flight_stats = crypto_flight.stats()
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("數據請求", flight_stats['calls'])
+    with col2:
+        st.metric("實際獲取", flight_stats['executions'])
+    with col3:
+        st.metric("合併請求", flight_stats['coalesced'])
+    
+    # 失敗結果緩存統計
+    negative_stats = negative_cache.stats()
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("已知失敗組合", negative_stats['entries'])
+    with col2:
+        st.metric("跳過的失敗請求", negative_stats['skipped'])
+    
+    # HTTP連接複用統計
+    http_stats = connection_stats()
+    if http_stats:
+        st.dataframe(pd.DataFrame([
+            {
+                '主機': host,
+                '請求數': item['requests'],
+                '新建連接': item['connections'],
+                '複用連接': item['reused'],
+                '複用率': f"{item['reuse_rate'] * 100:.1f}%"
+            }
+            for host, item in http_stats.items()
+        ]), use_container_width=True)
+    
+    # 限流排隊統計
+    limiter_stats = rate_limiter.stats()
+    if limiter_stats:
+        st.dataframe(pd.DataFrame([
+            {
+                '主機': host,
+                '排隊中': item['depth'],
+                '最大隊列': item['max_depth'],
+                '已放行': item['granted'],
+                '排隊次數': item['queued'],
+                '平均等待(秒)': item['avg_wait'],
+                '最長等待(秒)': item['max_wait'],
+                '429次數': item['throttled'],
+                '等待超時': item['timeouts'],
+                '已撤回': item['cancelled']
+            }
+            for host, item in limiter_stats.items()
+        ]), use_container_width=True)
+    
+    # 多數據源共識統計
+    consensus_stats = consensus_tracker.stats()
+    if consensus_stats['merges']:
+        st.caption(f"共識合併 {consensus_stats['merges']} 次，其中數據源互相偏離 {consensus_stats['disagreements']} 次")
+        st.dataframe(pd.DataFrame([
+            {
+                '數據源': PROVIDER_LABELS.get(name, name),
+                '參與合併': item['used'],
+                '標記異常': item['outlier'],
+                '最近偏離': f"{item['last_deviation']:.3%}" if item['last_deviation'] is not None else '-'
+            }
+            for name, item in consensus_stats['providers'].items()
+        ]), use_container_width=True)
+    
+    # 數據源健康與熔斷狀態
+    health_stats = provider_health.stats()
+    if health_stats:
+        st.dataframe(pd.DataFrame([
+            {
+                '數據源': PROVIDER_LABELS.get(name, name),
+                '熔斷狀態': {'closed': '正常', 'open': '熔斷', 'half_open': '探測中'}.get(item['state'], item['state']),
+                '成功率': f"{item['success_rate'] * 100:.1f}%",
+                '平均延遲(秒)': item['latency'],
+                '成功': item['successes'],
+                '失敗': item['failures'],
+                '已跳過': item['rejected']
+            }
+            for name, item in health_stats.items()
+        ]), use_container_width=True)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    
     # 關於應用卡片
     st.markdown('<div class="stCardContainer">', unsafe_allow_html=True)
     st.markdown("<h3>關於</h3>", unsafe_allow_html=True)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+異步運行支持
+提供可選的 ccxt.async_support 模塊，以及在同步代碼(Streamlit頁面)中運行協程的 run_sync。
+分頁加載深度歷史K線時使用(見 history_loader.py)；K線數據源的回退、緩存和本地存儲
+只在 app.py 的 get_crypto_data 和 bulk_fetch.py 中實現一次。
+"""
+
+import asyncio
+import threading
+
+try:
+    import ccxt.async_support as ccxt_async
+except ImportError:
+    ccxt_async = None
+
+
+def run_sync(coro):
+    """
+    在同步代碼中運行協程並返回結果
+
+    當前線程已有運行中的事件循環時(如在其他異步框架中調用)，改在獨立線程中運行
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result = {}
+
+    def runner():
+        try:
+            result['value'] = asyncio.run(coro)
+        except BaseException as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=runner, name='async-providers')
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result.get('value')
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+批量數據獲取
+一次調用獲取多個交易對的K線：先讀取共享緩存和本地存儲，
+數據源有批量端點時(CoinGecko /coins/markets)用一個請求覆蓋所有剩餘交易對，
+其餘交易對交給有上限的線程池逐個競速獲取。
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from data_cache import load_window, save_window
+from http_client import http_get
+from ohlcv_decode import loads
+from provider_api import coingecko_markets_request, parse_coingecko_markets_daily
+from provider_health import provider_health
+from rate_limiter import request_priority, BULK
+
+# 逐個獲取時的最大並發數，可通過環境變數 BULK_FETCH_WORKERS 設置
+BULK_FETCH_WORKERS = int(os.getenv('BULK_FETCH_WORKERS', '4'))
+
+# CoinGecko批量端點只提供7天小時級走勢，丟棄不完整的第一天後可覆蓋的日K線數量上限
+BATCH_DAILY_MAX_LIMIT = 7
+
+
+def _fetch_coingecko_batch(symbols, limit):
+    """
+    通過CoinGecko批量端點獲取多個交易對的日K線
+
+    返回:
+    dict: 交易對到DataFrame的映射，請求失敗時返回空字典
+    """
+    if not provider_health.allow('coingecko'):
+        print("數據源coingecko處於熔斷狀態，跳過批量請求")
+        return {}
+
+    bases = [symbol.split('/')[0].upper() for symbol in symbols]
+    quote = symbols[0].split('/')[1]
+    url, params, headers = coingecko_markets_request(bases, quote)
+
+    start_time = time.time()
+    try:
+        print(f"正在批量請求CoinGecko: {len(symbols)}個交易對")
+        response = http_get(url, params=params, headers=headers, timeout=10)
+        if response.status_code != 200:
+            raise ValueError(f"HTTP {response.status_code}")
+        frames = parse_coingecko_markets_daily(loads(response.content), limit)
+    except Exception as e:
+        print(f"CoinGecko批量請求失敗: {str(e)}")
+        provider_health.record_failure('coingecko', time.time() - start_time)
+        return {}
+
+    provider_health.record_success('coingecko', time.time() - start_time)
+    return {symbol: frames[base] for symbol, base in zip(symbols, bases) if base in frames}
+
+
+def bulk_get_crypto_data(symbols, timeframe, limit, fetch_one, validator=None, max_workers=None):
+    """
+    批量獲取多個交易對的K線
+
+    參數:
+    symbols (list): 交易對列表，如 ['BTC/USDT', 'ETH/USDT']
+    timeframe (str): 時間框架，如 '1d'
+    limit (int): 每個交易對需要的數據點數量
+    fetch_one (callable): fetch_one(symbol, since) 返回 (數據源名稱, DataFrame)，用於逐個獲取
+    validator (callable): validator(symbol, DataFrame) 返回是否可用，用於檢查批量結果
+    max_workers (int): 逐個獲取的最大並發數，默認使用 BULK_FETCH_WORKERS
+
+    返回:
+    tuple: (交易對到DataFrame的字典, 獲取失敗的交易對列表)
+    """
+    frames = {}
+    pending = {}
+
+    # 先讀取緩存和本地存儲
+    for symbol in symbols:
+        ready_df, stored_df, since = load_window(symbol, timeframe, limit)
+        if ready_df is not None:
+            frames[symbol] = ready_df
+        else:
+            pending[symbol] = (stored_df, since)
+
+    # 日K線且數量在批量端點覆蓋範圍內時，用一個請求獲取所有剩餘交易對
+    quotes = {symbol.split('/')[1].upper() for symbol in pending}
+    if timeframe == '1d' and limit <= BATCH_DAILY_MAX_LIMIT and len(pending) > 1 and len(quotes) == 1:
+        with request_priority(BULK):
+            batch = _fetch_coingecko_batch(list(pending), limit)
+        for symbol, df in batch.items():
+            if len(df) < limit or (validator is not None and not validator(symbol, df)):
+                continue
+            stored_df, since = pending.pop(symbol)
+            frames[symbol] = save_window(symbol, timeframe, df, limit, stored_df, since)
+        print(f"批量請求後剩餘{len(pending)}個交易對需要逐個獲取")
+
+    # 其餘交易對交給有上限的線程池
+    def fetch(symbol):
+        stored_df, since = pending[symbol]
+        try:
+            # 批量請求的優先級低於互動分析(見 rate_limiter.py)
+            with request_priority(BULK):
+                _, df = fetch_one(symbol, since)
+        except Exception as e:
+            print(f"獲取{symbol}數據時出錯: {str(e)}")
+            return None
+        if df is None:
+            return None
+        return save_window(symbol, timeframe, df, limit, stored_df, since)
+
+    if pending:
+        workers = max(1, min(max_workers or BULK_FETCH_WORKERS, len(pending)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bulk-fetch') as executor:
+            for symbol, df in zip(list(pending), executor.map(fetch, list(pending))):
+                if df is not None:
+                    frames[symbol] = df
+
+    failed = [symbol for symbol in symbols if symbol not in frames]
+    if failed:
+        print(f"批量獲取失敗的交易對: {', '.join(failed)}")
+    return frames, failed
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+本地K線存儲
+每個交易對和時間框架對應一個定長記錄的二進制文件，以NumPy內存映射方式讀取。
+寫入時只追加比最後存儲時間戳更新的K線，最後一根(可能尚未收盤的)K線則原地覆蓋，
+使容器重啟後無需重新下載完整歷史。
+寫入前時間戳取整到K線開始時間，不同數據源的同一根K線只保留一條；
+以收盤價估算開高低價的近似K線(DataFrame.attrs 中 approximate 為True)不寫入存儲。
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# 存儲目錄，可通過環境變數 CANDLE_STORE_DIR 指向持久化磁盤
+CANDLE_STORE_DIR = os.getenv(
+    'CANDLE_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'candles')
+)
+
+# 每條K線記錄的格式，timestamp 為毫秒時間戳
+CANDLE_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8')
+])
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# 各時間框架的秒數
+TIMEFRAME_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '30m': 1800,
+    '1h': 3600,
+    '4h': 14400,
+    '12h': 43200,
+    '1d': 86400,
+    '1w': 604800
+}
+
+# 週K線與交易所一致從週一00:00(UTC)開始，Unix紀元(1970-01-01)是週四，相差4天
+WEEK_OFFSET_MS = 4 * 86400 * 1000
+
+
+def floor_timestamp(timestamp_ms, timeframe):
+    """
+    將毫秒時間戳向下取整到所屬K線的開始時間，週K線以週一為起點(與 resample.py 的 W-MON 一致)
+
+    參數:
+    timestamp_ms (int | numpy.ndarray): 毫秒時間戳
+    timeframe (str): 時間框架，如 '1h'
+
+    返回:
+    int | numpy.ndarray: K線開始時間的毫秒時間戳
+    """
+    step = TIMEFRAME_SECONDS.get(timeframe, 3600) * 1000
+    offset = WEEK_OFFSET_MS if timeframe == '1w' else 0
+    return (timestamp_ms - offset) // step * step + offset
+
+
+def window_is_current(df, timeframe, now_ms=None):
+    """
+    判斷K線窗口是否包含當前尚未收盤的K線且中間沒有缺口
+
+    文件修改時間只說明最近寫入過，不能說明寫入的K線是最新的
+    (如分頁加載的歷史數據或增量獲取失敗後的舊窗口)
+
+    參數:
+    df (DataFrame): 按時間排序的OHLCV數據
+    timeframe (str): 時間框架，如 '1h'
+    now_ms (int): 當前毫秒時間戳，默認使用系統時間
+
+    返回:
+    bool: 最後一根K線是當前K線且相鄰K線間隔都等於時間框架時返回True
+    """
+    if df is None or len(df) == 0:
+        return False
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    timestamps = df['timestamp'].values.astype('datetime64[ms]').astype('int64')
+    if timestamps[-1] != floor_timestamp(now_ms, timeframe):
+        return False
+    step = TIMEFRAME_SECONDS.get(timeframe, 3600) * 1000
+    return bool((np.diff(timestamps) == step).all())
+
+
+def filter_since(df, since):
+    """
+    只保留時間不早於since的K線
+
+    參數:
+    df (DataFrame): OHLCV數據
+    since (int): 毫秒時間戳，None表示不過濾
+
+    返回:
+    pandas.DataFrame: 過濾後的數據
+    """
+    if df is None or since is None:
+        return df
+    return df[df['timestamp'] >= pd.to_datetime(since, unit='ms')].reset_index(drop=True)
+
+
+def merge_candles(base_df, new_df):
+    """
+    將新獲取的K線合併到已有數據中
+
+    時間戳相同的K線(如尚未收盤的最後一根)以新數據替換，而不是重複添加
+
+    參數:
+    base_df (DataFrame): 已有的OHLCV數據
+    new_df (DataFrame): 新獲取的OHLCV數據
+
+    返回:
+    pandas.DataFrame: 按時間排序的合併數據
+    """
+    if base_df is None or len(base_df) == 0:
+        return new_df
+    if new_df is None or len(new_df) == 0:
+        return base_df
+    merged = pd.concat([base_df[OHLCV_COLUMNS], new_df[OHLCV_COLUMNS]], ignore_index=True)
+    merged = merged.drop_duplicates(subset='timestamp', keep='last')
+    return merged.sort_values('timestamp').reset_index(drop=True)
+
+
+def dataframe_to_records(df, timeframe=None):
+    """
+    將OHLCV DataFrame轉換為按時間排序且時間戳唯一的記錄數組
+
+    參數:
+    df (DataFrame): 包含 timestamp, open, high, low, close, volume 列的數據
+    timeframe (str): 時間框架，提供時時間戳取整到K線開始時間(如不在整點的CoinGecko價格點)
+
+    返回:
+    numpy.ndarray: CANDLE_DTYPE 格式的記錄數組
+    """
+    records = np.empty(len(df), dtype=CANDLE_DTYPE)
+    records['timestamp'] = pd.to_datetime(df['timestamp']).values.astype('datetime64[ms]').astype('int64')
+    if timeframe is not None:
+        records['timestamp'] = floor_timestamp(records['timestamp'], timeframe)
+    for column in OHLCV_COLUMNS[1:]:
+        records[column] = df[column].to_numpy(dtype='float64')
+
+    # 按時間排序，時間戳重複時保留最後一條
+    records = records[np.argsort(records['timestamp'], kind='stable')]
+    if len(records) > 1:
+        keep = np.append(records['timestamp'][1:] != records['timestamp'][:-1], True)
+        records = records[keep]
+    return records
+
+
+def _is_approximate(df):
+    if df.attrs.get('approximate'):
+        print("近似K線(由收盤價或報價估算)不寫入本地存儲")
+        return True
+    return False
+
+
+def records_to_dataframe(records):
+    """將記錄數組轉換為OHLCV DataFrame"""
+    df = pd.DataFrame({column: np.array(records[column]) for column in OHLCV_COLUMNS})
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    return df
+
+
+class CandleStore:
+    """
+    按 (symbol, timeframe) 分文件存儲K線的本地存儲
+    """
+
+    def __init__(self, root=CANDLE_STORE_DIR):
+        self.root = root
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _path(self, symbol, timeframe):
+        name = f"{symbol.replace('/', '_').upper()}_{timeframe}.bin"
+        return os.path.join(self.root, name)
+
+    def _lock(self, path):
+        with self._locks_guard:
+            if path not in self._locks:
+                self._locks[path] = threading.Lock()
+            return self._locks[path]
+
+    def _record_count(self, path):
+        """返回文件中完整記錄的數量，並截斷寫入中斷留下的殘缺記錄"""
+        if not os.path.exists(path):
+            return 0
+        size = os.path.getsize(path)
+        remainder = size % CANDLE_DTYPE.itemsize
+        if remainder:
+            print(f"K線存儲文件存在殘缺記錄，已截斷: {path}")
+            with open(path, 'r+b') as f:
+                f.truncate(size - remainder)
+        return size // CANDLE_DTYPE.itemsize
+
+    def _read_last_record(self, path, count):
+        with open(path, 'rb') as f:
+            f.seek((count - 1) * CANDLE_DTYPE.itemsize)
+            return np.frombuffer(f.read(CANDLE_DTYPE.itemsize), dtype=CANDLE_DTYPE)[0]
+
+    def read(self, symbol, timeframe, limit=None):
+        """
+        讀取已存儲的K線
+
+        參數:
+        symbol (str): 交易對符號，如 'BTC/USDT'
+        timeframe (str): 時間框架，如 '1h'
+        limit (int): 只返回最近的limit條K線
+
+        返回:
+        pandas.DataFrame: 存儲的K線數據，沒有數據時返回None
+        """
+        path = self._path(symbol, timeframe)
+        with self._lock(path):
+            count = self._record_count(path)
+            if count == 0:
+                return None
+            records = np.memmap(path, dtype=CANDLE_DTYPE, mode='r', shape=(count,))
+            if limit is not None and count > limit:
+                records = records[-limit:]
+            df = records_to_dataframe(records)
+            del records
+        return df
+
+    def last_timestamp(self, symbol, timeframe):
+        """返回最後一條K線的時間，沒有數據時返回None"""
+        path = self._path(symbol, timeframe)
+        with self._lock(path):
+            count = self._record_count(path)
+            if count == 0:
+                return None
+            last = self._read_last_record(path, count)
+        return pd.to_datetime(int(last['timestamp']), unit='ms')
+
+    def age(self, symbol, timeframe):
+        """返回存儲文件距離上次寫入的秒數，沒有數據時返回None"""
+        path = self._path(symbol, timeframe)
+        if not os.path.exists(path):
+            return None
+        return time.time() - os.path.getmtime(path)
+
+    def append(self, symbol, timeframe, df):
+        """
+        增量寫入K線
+
+        只追加比最後存儲時間戳更新的K線；與最後一條時間戳相同的K線
+        視為尚未收盤的K線，原地覆蓋而不重複寫入
+
+        參數:
+        symbol (str): 交易對符號
+        timeframe (str): 時間框架
+        df (DataFrame): 新獲取的OHLCV數據，近似K線不會寫入
+
+        返回:
+        int: 新追加的K線數量
+        """
+        if df is None or len(df) == 0 or _is_approximate(df):
+            return 0
+
+        records = dataframe_to_records(df, timeframe)
+        path = self._path(symbol, timeframe)
+        os.makedirs(self.root, exist_ok=True)
+
+        with self._lock(path):
+            count = self._record_count(path)
+            if count > 0:
+                last_ts = self._read_last_record(path, count)['timestamp']
+
+                # 覆蓋最後一根K線
+                same = records[records['timestamp'] == last_ts]
+                if len(same) > 0:
+                    with open(path, 'r+b') as f:
+                        f.seek((count - 1) * CANDLE_DTYPE.itemsize)
+                        f.write(same[-1:].tobytes())
+
+                records = records[records['timestamp'] > last_ts]
+
+            if len(records) > 0:
+                with open(path, 'ab') as f:
+                    f.write(records.tobytes())
+            elif count > 0:
+                # 更新修改時間，表示數據已經核對過
+                os.utime(path, None)
+
+        return len(records)
+
+    def merge(self, symbol, timeframe, df):
+        """
+        將任意時間範圍的K線合併寫入存儲(用於回填更早的歷史數據)
+
+        與已存儲時間戳相同的K線以新數據替換，合併後的文件整體替換原文件
+
+        參數:
+        symbol (str): 交易對符號
+        timeframe (str): 時間框架
+        df (DataFrame): OHLCV數據，可以早於已存儲的K線，近似K線不會寫入
+
+        返回:
+        int: 新增的K線數量
+        """
+        if df is None or len(df) == 0 or _is_approximate(df):
+            return 0
+
+        records = dataframe_to_records(df, timeframe)
+        path = self._path(symbol, timeframe)
+        os.makedirs(self.root, exist_ok=True)
+
+        with self._lock(path):
+            count = self._record_count(path)
+            existing = np.fromfile(path, dtype=CANDLE_DTYPE, count=count) if count > 0 else np.empty(0, dtype=CANDLE_DTYPE)
+            merged = np.concatenate([existing, records])
+            merged = merged[np.argsort(merged['timestamp'], kind='stable')]
+            if len(merged) > 1:
+                keep = np.append(merged['timestamp'][1:] != merged['timestamp'][:-1], True)
+                merged = merged[keep]
+
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(merged.tobytes())
+            os.replace(tmp_path, path)
+
+        return len(merged) - count
+
+    def delete(self, symbol, timeframe):
+        """刪除指定交易對和時間框架的存儲文件"""
+        path = self._path(symbol, timeframe)
+        with self._lock(path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+# 進程級共享實例
+candle_store = CandleStore()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+多數據源共識K線
+同一時間窗口同時向兩到三個數據源請求，按K線時間對齊後逐列取中位數合併，
+收盤價明顯偏離共識的數據源被標記為異常，不參與合併並在一段時間內跳過(見 negative_cache.py)。
+與只檢查最新價格是否落在固定區間的驗證相比，看似合理但實際錯誤的數據源不會再勝出。
+合併結果和普通獲取的結果一樣寫入本地存儲和共享緩存，一次共識獲取供所有會話使用。
+"""
+
+import os
+import threading
+
+import numpy as np
+
+from candle_store import floor_timestamp
+from ohlcv_decode import build_frame
+
+# 是否使用多數據源共識模式，可通過環境變數 CONSENSUS_MODE 設置
+CONSENSUS_MODE = os.getenv('CONSENSUS_MODE', 'false').lower() in ('1', 'true', 'yes')
+
+# 每次共識獲取使用的數據源數量
+CONSENSUS_PROVIDERS = int(os.getenv('CONSENSUS_PROVIDERS', '3'))
+
+# 至少需要多少個數據源的結果才進行合併，不足時退回普通競速
+CONSENSUS_MIN_PROVIDERS = int(os.getenv('CONSENSUS_MIN_PROVIDERS', '2'))
+
+# 收盤價相對共識的中位偏離超過此比例時視為異常數據源
+CONSENSUS_OUTLIER_THRESHOLD = float(os.getenv('CONSENSUS_OUTLIER_THRESHOLD', '0.02'))
+
+_PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def align_candles(results, timeframe):
+    """
+    將多個數據源的K線按時間對齊
+
+    時間戳向下取整到K線開始時間(週K線從週一開始)，不同數據源的同一根K線落在同一列；
+    某個數據源缺少的K線以NaN填充
+
+    參數:
+    results (list): (數據源名稱, DataFrame) 列表
+    timeframe (str): 時間框架，如 '1h'
+
+    返回:
+    tuple: (毫秒時間戳數組, 形狀為 (數據源數, K線數, 5) 的 open/high/low/close/volume 數組)
+    """
+    buckets = [
+        floor_timestamp(df['timestamp'].values.astype('datetime64[ms]').astype(np.int64), timeframe)
+        for _, df in results
+    ]
+    timestamps = np.unique(np.concatenate(buckets))
+
+    values = np.full((len(results), len(timestamps), len(_PRICE_COLUMNS)), np.nan)
+    for index, ((_, df), bucket) in enumerate(zip(results, buckets)):
+        # 同一數據源落在同一時間的多根K線以最後一根為準
+        values[index, np.searchsorted(timestamps, bucket)] = df[_PRICE_COLUMNS].to_numpy(dtype='float64')
+    return timestamps, values
+
+
+def close_deviation(values, median):
+    """
+    返回每個數據源的收盤價相對共識收盤價的中位偏離比例，沒有重疊K線的數據源為NaN
+    """
+    close = values[:, :, 3]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        deviation = np.abs(close - median[:, 3]) / median[:, 3]
+    deviation[:, ~(median[:, 3] > 0)] = np.nan
+    return np.array([np.nanmedian(row) if np.isfinite(row).any() else np.nan for row in deviation])
+
+
+def merge_consensus(results, timeframe, threshold=CONSENSUS_OUTLIER_THRESHOLD,
+                    min_providers=CONSENSUS_MIN_PROVIDERS):
+    """
+    將多個數據源的K線合併為共識K線
+
+    先以全部數據源的中位數作為參考，偏離超過 threshold 的數據源被標記為異常並剔除後重新取中位數。
+    只有兩個數據源時無法判斷哪一方有誤，互相偏離時不剔除，只在結果中標記分歧。
+
+    參數:
+    results (list): (數據源名稱, DataFrame) 列表
+    timeframe (str): 時間框架
+    threshold (float): 異常數據源的收盤價偏離比例
+    min_providers (int): 每根K線至少需要的數據源數量
+
+    返回:
+    tuple: (共識DataFrame或None, 報告字典 {providers, outliers, deviation, disagreement})
+    """
+    names = [name for name, _ in results]
+    timestamps, values = align_candles(results, timeframe)
+
+    with np.errstate(all='ignore'):
+        median = np.nanmedian(values, axis=0)
+    deviation = close_deviation(values, median)
+
+    outliers = []
+    disagreement = False
+    if len(names) >= 3:
+        outliers = [name for name, value in zip(names, deviation) if value > threshold]
+        if outliers and len(names) - len(outliers) >= min_providers:
+            keep = np.array([name not in outliers for name in names])
+            values = values[keep]
+            with np.errstate(all='ignore'):
+                median = np.nanmedian(values, axis=0)
+        else:
+            # 大多數數據源互相偏離，沒有可信的共識
+            disagreement = bool(outliers)
+            outliers = []
+    elif np.nanmax(deviation, initial=0.0) > threshold:
+        disagreement = True
+
+    report = {
+        'providers': [name for name in names if name not in outliers],
+        'outliers': outliers,
+        'deviation': {name: (None if np.isnan(value) else round(float(value), 5)) for name, value in zip(names, deviation)},
+        'disagreement': disagreement
+    }
+
+    # 只保留有足夠數據源覆蓋的K線
+    covered = np.isfinite(values[:, :, 3]).sum(axis=0) >= min(min_providers, len(values))
+    if not covered.any():
+        return None, report
+
+    merged = median[covered]
+    df = build_frame(timestamps[covered], merged[:, 0], merged[:, 1], merged[:, 2], merged[:, 3], merged[:, 4])
+    # 中位數逐列計算，保證最高價和最低價仍包住開盤價和收盤價
+    df['high'] = df[['open', 'high', 'close']].max(axis=1)
+    df['low'] = df[['open', 'low', 'close']].min(axis=1)
+    df.attrs['consensus'] = report
+    # 參與合併的數據源中有開高低價為估算值的，共識結果同樣只是近似數據，不寫入本地存儲
+    kept = [df_ for name, df_ in results if name not in outliers]
+    df.attrs['approximate'] = any(df_.attrs.get('approximate') for df_ in kept)
+    return df, report
+
+
+class ConsensusTracker:
+    """
+    記錄各數據源在共識合併中被標記為異常的次數，供設置頁顯示
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.merges = 0
+        self.disagreements = 0
+        self._providers = {}
+
+    def record(self, report):
+        with self._lock:
+            self.merges += 1
+            if report['disagreement']:
+                self.disagreements += 1
+            for name, value in report['deviation'].items():
+                entry = self._providers.setdefault(name, {'used': 0, 'outlier': 0, 'last_deviation': None})
+                entry['last_deviation'] = value
+                if name in report['outliers']:
+                    entry['outlier'] += 1
+                else:
+                    entry['used'] += 1
+
+    def stats(self):
+        """
+        返回共識合併統計
+
+        返回:
+        dict: {merges, disagreements, providers: 數據源名稱到 {used, outlier, last_deviation} 的映射}
+        """
+        with self._lock:
+            return {
+                'merges': self.merges,
+                'disagreements': self.disagreements,
+                'providers': {name: dict(entry) for name, entry in self._providers.items()}
+            }
+
+
+# 進程級共享實例
+consensus_tracker = ConsensusTracker()
@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import ccxt
 import time
 import random
 from datetime import datetime, timedelta
@@ -9,6 +8,7 @@ import plotly.graph_objects as go
 import requests
 import json
 import os
+from exchange_pool import get_exchange
 
 # 從環境變數讀取API密鑰，如果不存在則使用預設值
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "sk-6ae04d6789f94178b4053d2c42650b6c")
@@ -61,7 +61,8 @@ analysis_detail = st.sidebar.select_slider(
 @st.cache_data(ttl=300)  # 5分鐘緩存
 def get_crypto_data(symbol, timeframe, limit=100):
     try:
-        exchange = ccxt.binance()
+        # 使用共享的交易所實例，市場信息只加載一次
+        exchange = get_exchange('binance')
         ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
         df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import ccxt
 import time
 import random
 from datetime import datetime, timedelta
@@ -9,6 +8,7 @@ import plotly.graph_objects as go
 import subprocess
 import json
 import os
+from exchange_pool import get_exchange
 
 st.set_page_config(page_title="CryptoAnalyzer - 加密貨幣分析工具", layout="wide")
 
@@ -51,7 +51,8 @@ st.sidebar.info(f"功能: {ai_models[selected_ai_model]}")
 @st.cache_data(ttl=300)  # 5分鐘緩存
 def get_crypto_data(symbol, timeframe, limit=100):
     try:
-        exchange = ccxt.binance()
+        # 使用共享的交易所實例，市場信息只加載一次
+        exchange = get_exchange('binance')
         ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
         df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
         df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
@@ -1,7 +1,6 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import ccxt
 import time
 import random
 from datetime import datetime, timedelta
@@ -9,6 +8,8 @@ import plotly.graph_objects as go
 import requests
 import json
 import os
+from data_cache import shared_cache
+from exchange_pool import get_exchange
 
 # 設置頁面配置
 st.set_page_config(
@@ -392,7 +393,7 @@ def get_dexscreener_data(symbol, timeframe, limit=100):
             # 如果DexScreener失敗，嘗試使用ccxt
             try:
                 # 嘗試使用ccxt從主流交易所獲取數據
-                exchange = ccxt.binance()
+                exchange = get_exchange('binance')
                 ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
                 
                 # 將數據轉換為DataFrame
@@ -703,11 +704,11 @@ def get_crypto_data(symbol, timeframe, limit=100):
     返回:
     - 包含 timestamp, open, high, low, close, volume 列的 DataFrame
     """
-    # 檢查緩存
-    cache_key = f"{symbol}_{timeframe}"
-    if 'price_data' in st.session_state and cache_key in st.session_state.price_data:
+    # 檢查進程級共享緩存
+    cached_df = shared_cache.get(symbol, timeframe, limit)
+    if cached_df is not None:
         print(f"使用緩存的{symbol}數據")
-        return st.session_state.price_data[cache_key]
+        return cached_df
     
     st.info(f"正在獲取 {symbol} ({timeframe}) 的市場數據...")
     print(f"調用get_crypto_data: {symbol}, {timeframe}, {limit}")
@@ -718,11 +719,8 @@ def get_crypto_data(symbol, timeframe, limit=100):
         # 驗證價格合理性
         base_coin = symbol.split('/')[0].upper()
         if verify_price_reasonability(df, base_coin):
-            # 存入session_state
-            if 'price_data' not in st.session_state:
-                st.session_state.price_data = {}
-            
-            st.session_state.price_data[cache_key] = df.copy()
+            # 存入共享緩存
+            shared_cache.set(symbol, timeframe, df)
             
             st.success(f"成功獲取 {symbol} 數據，最新價格: ${df['close'].iloc[-1]:.2f}")
             return df
@@ -829,11 +827,8 @@ def get_crypto_data(symbol, timeframe, limit=100):
                 
                 # 驗證價格合理性
                 if verify_price_reasonability(df, base.upper()):
-                    # 存入session_state
-                    if 'price_data' not in st.session_state:
-                        st.session_state.price_data = {}
-                    
-                    st.session_state.price_data[cache_key] = df.copy()
+                    # 存入共享緩存
+                    shared_cache.set(symbol, timeframe, df)
                     
                     st.success(f"成功獲取 {symbol} 數據，最新價格: ${df['close'].iloc[-1]:.2f}")
                     return df
@@ -949,11 +944,8 @@ def get_crypto_data(symbol, timeframe, limit=100):
                 
                 # 驗證價格合理性
                 if verify_price_reasonability(df, base.upper()):
-                    # 存入session_state
-                    if 'price_data' not in st.session_state:
-                        st.session_state.price_data = {}
-                    
-                    st.session_state.price_data[cache_key] = df.copy()
+                    # 存入共享緩存
+                    shared_cache.set(symbol, timeframe, df)
                     
                     st.success(f"成功獲取 {symbol} 數據，最新價格: ${df['close'].iloc[-1]:.2f}")
                     return df
@@ -963,7 +955,7 @@ def get_crypto_data(symbol, timeframe, limit=100):
     # 4. 嘗試使用CCXT Binance
     try:
         print(f"嘗試使用CCXT Binance獲取{symbol}數據")
-        exchange = ccxt.binance()
+        exchange = get_exchange('binance')
         ohlcv = exchange.fetch_ohlcv(symbol, timeframe, limit=limit)
         
         if ohlcv and len(ohlcv) > 0:
@@ -976,11 +968,8 @@ def get_crypto_data(symbol, timeframe, limit=100):
             # 驗證價格合理性
             base_coin = symbol.split('/')[0].upper()
             if verify_price_reasonability(df, base_coin):
-                # 存入session_state
-                if 'price_data' not in st.session_state:
-                    st.session_state.price_data = {}
-                
-                st.session_state.price_data[cache_key] = df.copy()
+                # 存入共享緩存
+                shared_cache.set(symbol, timeframe, df)
                 
                 st.success(f"成功獲取 {symbol} 數據，最新價格: ${df['close'].iloc[-1]:.2f}")
                 return df
@@ -1492,14 +1481,8 @@ with tabs[0]:
         
         # 顯示加載中動畫
         with st.spinner(f"正在獲取 {selected_symbol} 數據並進行分析..."):
-            # 檢查是否已有緩存數據
-            cache_key = f"{selected_symbol}_{selected_timeframe}"
-            if 'price_data' in st.session_state and cache_key in st.session_state.price_data:
-                print(f"使用緩存的{selected_symbol}數據")
-                df = st.session_state.price_data[cache_key]
-            else:
-                # 使用DexScreener API獲取真實數據
-                df = get_crypto_data(selected_symbol, selected_timeframe, limit=100)
+            # 獲取數據 (get_crypto_data 會優先使用共享緩存)
+            df = get_crypto_data(selected_symbol, selected_timeframe, limit=100)
                 
             if df is not None:
                 # 使用真實數據創建圖表
@@ -1881,22 +1864,10 @@ with tabs[2]:
     
     # 嘗試獲取真實市場數據
     try:
-        # 檢查是否已有緩存數據
-        btc_cache_key = "BTC/USDT_1d"
-        eth_cache_key = "ETH/USDT_1d"
+        # 使用get_crypto_data獲取 (優先使用共享緩存)
+        btc_data = get_crypto_data("BTC/USDT", "1d", limit=2)
         
-        if 'price_data' in st.session_state and btc_cache_key in st.session_state.price_data:
-            print("使用緩存的BTC數據")
-            btc_data = st.session_state.price_data[btc_cache_key]
-        else:
-            # 使用get_crypto_data獲取
-            btc_data = get_crypto_data("BTC/USDT", "1d", limit=2)
-        
-        if 'price_data' in st.session_state and eth_cache_key in st.session_state.price_data:
-            print("使用緩存的ETH數據")
-            eth_data = st.session_state.price_data[eth_cache_key]
-        else:
-            eth_data = get_crypto_data("ETH/USDT", "1d", limit=2)
+        eth_data = get_crypto_data("ETH/USDT", "1d", limit=2)
         
         # 計算比特幣24小時變化百分比
         if btc_data is not None and len(btc_data) >= 2:
@@ -1996,14 +1967,8 @@ with tabs[2]:
     with st.spinner("正在獲取市場數據..."):
         for symbol in crypto_list:
             try:
-                # 檢查是否已有緩存數據
-                cache_key = f"{symbol}_1d"
-                if 'price_data' in st.session_state and cache_key in st.session_state.price_data:
-                    print(f"使用緩存的{symbol}數據")
-                    df = st.session_state.price_data[cache_key]
-                else:
-                    # 獲取當日數據
-                    df = get_crypto_data(symbol, "1d", limit=8)
+                # 獲取當日數據 (優先使用共享緩存)
+                df = get_crypto_data(symbol, "1d", limit=8)
                 
                 if df is not None and len(df) > 0:
                     # 獲取最新價格
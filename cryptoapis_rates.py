@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+Crypto APIs 匯率解析
+同時請求交易對匯率(按符號、按資產ID)和基礎/報價資產的美元價格，
+採用第一個有效的匯率。
+每個解析出的匯率作為一個報價點計入K線聚合器(見 tick_aggregator.py)，K線由實際收到的匯率聚合而成。
+Crypto APIs只提供即時匯率，匯率由後台輪詢線程定期獲取(CRYPTOAPIS_POLL_SECONDS)；
+只有累積了足夠的已收盤K線後才參與K線競速，聚合出的K線只是近似數據，不寫入本地K線存儲。
+"""
+
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from http_client import http_get
+from rate_limiter import request_priority, BACKGROUND
+from tick_aggregator import tick_aggregator
+from ohlcv_decode import loads
+from provider_api import (
+    DEFAULT_CRYPTOAPIS_KEY, USD_QUOTES, cryptoapis_headers, cryptoapis_symbols_rate_request, cryptoapis_ids_rate_request,
+    cryptoapis_asset_url, parse_cryptoapis_symbols_rate, parse_cryptoapis_ids_rate, parse_cryptoapis_asset_price
+)
+
+# 後台輪詢匯率的間隔(秒)，0表示不輪詢，此時Crypto APIs不參與K線競速
+CRYPTOAPIS_POLL_SECONDS = float(os.getenv('CRYPTOAPIS_POLL_SECONDS', '0'))
+
+CRYPTOAPIS_KEY = os.getenv('CRYPTOAPIS_KEY', DEFAULT_CRYPTOAPIS_KEY)
+
+# 各查詢方式的顯示名稱
+LOOKUP_LABELS = {
+    'symbols': '方法1',
+    'ids': '方法2',
+    'asset_price': '方法3'
+}
+
+def rate_candles(symbol, timeframe, limit=100):
+    """
+    返回由已收到的匯率聚合出的已收盤K線
+
+    匯率沒有成交量，volume 為NaN；DataFrame.attrs 中的 approximate 為True，
+    save_window 不會將其寫入本地K線存儲(見 data_cache.py)
+
+    參數:
+    symbol (str): 交易對符號，如 'BTC/USDT'
+    timeframe (str): 時間框架，如 '1h'
+    limit (int): 需要的數據點數量
+
+    返回:
+    pandas.DataFrame: OHLCV數據；累積的已收盤K線不足limit根時返回None
+    """
+    df = tick_aggregator.candles(symbol.upper(), timeframe, limit, closed_only=True)
+    if df is None or len(df) < limit:
+        return None
+    df['volume'] = float('nan')
+    df.attrs['approximate'] = True
+    return df
+
+
+def rate_candles_ready(symbol, timeframe, limit=100):
+    """是否已累積足夠的已收盤K線，不足時Crypto APIs不參與該交易對的K線競速"""
+    df = tick_aggregator.candles(symbol.upper(), timeframe, limit, closed_only=True)
+    return df is not None and len(df) >= limit
+
+
+def _lookups(base, quote):
+    """
+    返回所有需要並發發出的請求
+
+    返回:
+    list: (名稱, url, 請求參數, 解析函數) 列表
+    """
+    symbols_url, symbols_params = cryptoapis_symbols_rate_request(base, quote)
+    ids_url, ids_params = cryptoapis_ids_rate_request(base, quote)
+    lookups = [
+        ('symbols', symbols_url, symbols_params, parse_cryptoapis_symbols_rate),
+        ('ids', ids_url, ids_params, parse_cryptoapis_ids_rate),
+        ('base_price', cryptoapis_asset_url(base), None, parse_cryptoapis_asset_price)
+    ]
+    # 非美元報價需要同時獲取報價資產的美元價格來換算
+    if quote not in USD_QUOTES:
+        lookups.append(('quote_price', cryptoapis_asset_url(quote), None, parse_cryptoapis_asset_price))
+    return lookups
+
+
+class _Resolution:
+    """收集並發查詢的結果，判斷是否已得到有效匯率"""
+
+    def __init__(self, quote):
+        self.usd_quote = quote in USD_QUOTES
+        self.prices = {}
+
+    def offer(self, name, value):
+        """
+        記錄一個查詢結果
+
+        返回:
+        tuple: (查詢方式, 匯率)，尚未得到有效匯率時返回 (None, None)
+        """
+        if value is None or value <= 0:
+            return None, None
+        if name in ('symbols', 'ids'):
+            return name, value
+
+        self.prices[name] = value
+        base_price = self.prices.get('base_price')
+        if base_price is None:
+            return None, None
+        if self.usd_quote:
+            return 'asset_price', base_price
+        quote_price = self.prices.get('quote_price')
+        if quote_price:
+            return 'asset_price', base_price / quote_price
+        return None, None
+
+
+def _log_rate(base, quote, method, rate):
+    print(f"成功從Crypto APIs獲取匯率 ({LOOKUP_LABELS.get(method, method)}): {base}/{quote} = {rate}")
+    tick_aggregator.add_tick(f"{base}/{quote}", rate)
+
+
+def resolve_rate(base, quote, api_key, timeout=15):
+    """
+    並發查詢交易對匯率，返回第一個有效結果
+
+    每次都發出新的請求，解析出的匯率作為新的報價點計入K線聚合器
+
+    參數:
+    base (str): 基礎貨幣，如 'BTC'
+    quote (str): 報價貨幣，如 'USDT'
+    api_key (str): Crypto APIs 密鑰
+    timeout (float): 單個請求的超時秒數
+
+    返回:
+    float: 匯率，全部查詢失敗時返回None
+    """
+    base, quote = base.upper(), quote.upper()
+    headers = cryptoapis_headers(api_key)
+    lookups = _lookups(base, quote)
+    resolution = _Resolution(quote)
+
+    def run(url, params, parse):
+        response = http_get(url, params=params, headers=headers, timeout=timeout)
+        if response.status_code != 200:
+            raise ValueError(f"{response.status_code} - {response.text[:200]}")
+        return parse(loads(response.content))
+
+    executor = ThreadPoolExecutor(max_workers=len(lookups), thread_name_prefix='cryptoapis-rate')
+    futures = {executor.submit(contextvars.copy_context().run, run, url, params, parse): name
+               for name, url, params, parse in lookups}
+    try:
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                value = future.result()
+            except Exception as e:
+                print(f"Crypto APIs查詢{name}失敗: {str(e)}")
+                continue
+            method, rate = resolution.offer(name, value)
+            if rate is not None:
+                _log_rate(base, quote, method, rate)
+                return rate
+        return None
+    finally:
+        # 已得到匯率後其餘請求的結果直接丟棄
+        executor.shutdown(wait=False)
+
+
+class RatePoller:
+    """
+    後台定期查詢關注交易對的匯率，為K線聚合器提供連續的報價點
+
+    interval 為0時不啟動輪詢線程，watch 不做任何事
+    """
+
+    def __init__(self, interval=CRYPTOAPIS_POLL_SECONDS, api_key=CRYPTOAPIS_KEY):
+        self.interval = interval
+        self.api_key = api_key
+        self._symbols = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self.polls = 0
+        self.failures = 0
+
+    def watch(self, symbol):
+        """將交易對加入輪詢，首次調用時啟動輪詢線程"""
+        if self.interval <= 0:
+            return
+        with self._lock:
+            self._symbols.add(symbol.upper())
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='cryptoapis-poller', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def poll_once(self):
+        """查詢一次所有關注交易對的匯率，以最低優先級排隊(見 rate_limiter.py)"""
+        with self._lock:
+            symbols = sorted(self._symbols)
+        for symbol in symbols:
+            base, quote = symbol.split('/')
+            try:
+                with request_priority(BACKGROUND):
+                    rate = resolve_rate(base, quote, self.api_key)
+            except Exception as e:
+                print(f"輪詢Crypto APIs匯率失敗 ({symbol}): {str(e)}")
+                rate = None
+            with self._lock:
+                self.polls += 1
+                if rate is None:
+                    self.failures += 1
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.poll_once()
+            self._stop.wait(self.interval)
+
+    def stats(self):
+        with self._lock:
+            return {'symbols': sorted(self._symbols), 'polls': self.polls, 'failures': self.failures}
+
+
+# 進程級共享實例
+rate_poller = RatePoller()
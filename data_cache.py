@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+進程級共享OHLCV數據緩存
+所有Streamlit會話共用同一份數據，按時間框架設置不同的過期時間，
+超出容量時按最近最少使用(LRU)淘汰，並記錄命中/未命中次數。
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from candle_store import (
+    candle_store, floor_timestamp, merge_candles, window_is_current, OHLCV_COLUMNS, TIMEFRAME_SECONDS
+)
+from resample import base_timeframes, resample_ohlcv
+
+# 各時間框架的緩存過期時間(秒)，短週期K線更新更頻繁
+DEFAULT_TTL_BY_TIMEFRAME = {
+    '15m': 60,
+    '1h': 300,
+    '4h': 900,
+    '1d': 1800,
+    '1w': 3600
+}
+
+# 未列出的時間框架使用的默認過期時間(秒)
+DEFAULT_TTL = 300
+
+# 緩存最大條目數，可通過環境變數 OHLCV_CACHE_MAX_ENTRIES 設置
+OHLCV_CACHE_MAX_ENTRIES = int(os.getenv('OHLCV_CACHE_MAX_ENTRIES', '128'))
+
+# 過期後仍可先返回舊數據並在後台刷新的最長時間(秒)，超過後必須等待數據源
+OHLCV_MAX_STALENESS = float(os.getenv('OHLCV_MAX_STALENESS', '600'))
+
+
+class OHLCVCache:
+    """
+    線程安全的OHLCV緩存，以 (symbol, timeframe) 為鍵
+
+    讀取時返回DataFrame副本，避免分析函數添加指標列時修改共享數據
+    """
+
+    def __init__(self, max_entries=OHLCV_CACHE_MAX_ENTRIES, ttl_by_timeframe=None, default_ttl=DEFAULT_TTL,
+                 max_staleness=OHLCV_MAX_STALENESS):
+        self.max_entries = max_entries
+        self.max_staleness = max_staleness
+        self.ttl_by_timeframe = dict(DEFAULT_TTL_BY_TIMEFRAME if ttl_by_timeframe is None else ttl_by_timeframe)
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale_hits = 0
+
+    def ttl_for(self, timeframe):
+        """返回時間框架對應的過期時間(秒)"""
+        return self.ttl_by_timeframe.get(timeframe, self.default_ttl)
+
+    def get(self, symbol, timeframe, limit=None):
+        """
+        讀取緩存數據
+
+        參數:
+        symbol (str): 交易對符號，如 'BTC/USDT'
+        timeframe (str): 時間框架，如 '1h'
+        limit (int): 需要的數據點數量，緩存數據不足時視為未命中
+
+        返回:
+        pandas.DataFrame: 緩存數據的副本，未命中時返回None
+        """
+        key = (symbol, timeframe)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            df, stored_at = entry
+            age = time.time() - stored_at
+            if age > self.ttl_for(timeframe):
+                # 過期條目在最長過期時間內保留，供 get_stale 返回舊數據
+                if age > self.ttl_for(timeframe) + self.max_staleness:
+                    del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            if limit is not None and len(df) < limit:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+            if limit is not None and len(df) > limit:
+                df = df.tail(limit)
+            return df.copy()
+
+    def set(self, symbol, timeframe, df):
+        """
+        寫入緩存，超出容量時淘汰最久未使用的條目
+
+        新數據比已有條目短(如增量獲取的最新幾根K線)且與之銜接時合併到已有條目，
+        不會以短窗口替換長窗口；近似K線只補充已有真實K線中缺少的時間戳(見 merge_approximate)
+        """
+        if df is None or len(df) == 0:
+            return
+
+        key = (symbol, timeframe)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and len(df) < len(entry[0]) and self._continues(entry[0], df, timeframe):
+                existing = entry[0]
+                df = merge_approximate(existing, df).tail(len(existing)).reset_index(drop=True)
+            self._entries[key] = (df.copy(), time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def _continues(existing, df, timeframe):
+        """新數據的第一根K線是否不晚於已有條目最後一根K線的下一根，即合併後中間沒有缺口"""
+        step = pd.Timedelta(seconds=TIMEFRAME_SECONDS.get(timeframe, 3600))
+        return df['timestamp'].iloc[0] <= existing['timestamp'].iloc[-1] + step
+
+    def apply_candle(self, symbol, timeframe, candle):
+        """
+        將即時串流收到的K線更新到緩存條目
+
+        時間戳與最後一根K線屬於同一根K線時(比較取整到K線開始時間後的時間戳，
+        如不在整點的CoinGecko價格點)覆蓋該K線，更新時追加新K線並丟棄最早的一根，
+        窗口長度保持不變；沒有對應緩存條目時不做處理。
+        在鎖內以新DataFrame替換條目，不修改其他線程可能正在複製的舊DataFrame
+
+        參數:
+        symbol (str): 交易對符號
+        timeframe (str): 時間框架
+        candle (dict): 包含 timestamp(毫秒), open, high, low, close, volume 的K線
+
+        返回:
+        bool: 是否更新了緩存
+        """
+        key = (symbol, timeframe)
+        timestamp_ms = floor_timestamp(int(candle['timestamp']), timeframe)
+        row = pd.DataFrame([dict(zip(OHLCV_COLUMNS, [pd.to_datetime(timestamp_ms, unit='ms')] +
+                                     [float(candle[column]) for column in OHLCV_COLUMNS[1:]]))])
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+
+            df = entry[0]
+            last_ms = floor_timestamp(int(df['timestamp'].iloc[-1].value // 10**6), timeframe)
+            if timestamp_ms < last_ms:
+                return False
+            keep = df.iloc[:-1] if timestamp_ms == last_ms else df.iloc[1:]
+            updated = pd.concat([keep[OHLCV_COLUMNS], row], ignore_index=True)
+            updated.attrs = dict(df.attrs)
+            df = updated
+            # 串流數據是即時的，重置緩存時間
+            self._entries[key] = (df, time.time())
+        return True
+
+    def get_stale(self, symbol, timeframe, limit=None):
+        """
+        讀取已過期但未超過最長過期時間的緩存數據
+
+        返回:
+        tuple: (緩存數據的副本, 數據存在的秒數)，沒有可用的舊數據時返回 (None, None)
+        """
+        key = (symbol, timeframe)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+
+            df, stored_at = entry
+            age = time.time() - stored_at
+            if age > self.ttl_for(timeframe) + self.max_staleness or (limit is not None and len(df) < limit):
+                return None, None
+            self.stale_hits += 1
+
+            if limit is not None and len(df) > limit:
+                df = df.tail(limit)
+            return df.copy(), age
+
+    def peek(self, symbol, timeframe):
+        """讀取未過期的緩存數據副本，不計入命中統計，不存在或已過期時返回None"""
+        with self._lock:
+            entry = self._entries.get((symbol, timeframe))
+            if entry is None or time.time() - entry[1] > self.ttl_for(timeframe):
+                return None
+            return entry[0].copy()
+
+    def age(self, symbol, timeframe):
+        """返回緩存條目已存在的秒數，不存在時返回None，不計入命中統計"""
+        with self._lock:
+            entry = self._entries.get((symbol, timeframe))
+            if entry is None:
+                return None
+            return time.time() - entry[1]
+
+    def invalidate(self, symbol, timeframe):
+        """刪除指定的緩存條目"""
+        with self._lock:
+            self._entries.pop((symbol, timeframe), None)
+
+    def clear(self):
+        """清空緩存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """返回緩存統計數據"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'stale_hits': self.stale_hits
+            }
+
+
+# 進程級共享實例，app.py 與 crypto_analyzer_fixed.py 共用
+shared_cache = OHLCVCache()
+
+
+def derive_window(symbol, timeframe, limit, cache=shared_cache, store=candle_store):
+    """
+    由緩存或本地存儲中較小時間框架的有效數據聚合出目標時間框架的窗口(見 resample.py)
+
+    返回:
+    pandas.DataFrame: 至少 limit 根K線的窗口，沒有足夠的基礎數據時返回None
+    """
+    for base in base_timeframes(timeframe, list(cache.ttl_by_timeframe)):
+        ratio = TIMEFRAME_SECONDS[timeframe] // TIMEFRAME_SECONDS[base]
+        needed = (limit + 1) * ratio
+
+        base_df = cache.peek(symbol, base)
+        if base_df is None or len(base_df) < needed:
+            try:
+                store_age = store.age(symbol, base)
+                if store_age is None or store_age > cache.ttl_for(base):
+                    continue
+                base_df = store.read(symbol, base, needed)
+                if not window_is_current(base_df, base):
+                    continue
+            except Exception as e:
+                print(f"讀取本地K線存儲失敗: {str(e)}")
+                continue
+        if base_df is None or len(base_df) < limit * ratio:
+            continue
+
+        derived = resample_ohlcv(base_df, base, timeframe)
+        if len(derived) >= limit:
+            print(f"由{base} K線聚合出{symbol}的{timeframe}數據")
+            return derived.tail(limit).reset_index(drop=True)
+    return None
+
+
+def load_window(symbol, timeframe, limit, cache=shared_cache, store=candle_store, force=False):
+    """
+    從共享緩存和本地K線存儲讀取數據窗口，並計算增量獲取的起點
+
+    app.py 的 get_crypto_data 和批量獲取(bulk_fetch.py)共用此邏輯
+
+    參數:
+    symbol (str): 交易對符號，如 'BTC/USDT'
+    timeframe (str): 時間框架，如 '1h'
+    limit (int): 需要的數據點數量
+    force (bool): 忽略仍然有效的緩存和存儲，只計算增量獲取的起點(用於後台預取)
+
+    返回:
+    tuple: (可直接使用的DataFrame或None, 本地存儲的DataFrame或None, 增量獲取的毫秒時間戳或None)
+    """
+    # 檢查進程級共享緩存
+    cached_df = None if force else cache.get(symbol, timeframe, limit)
+    if cached_df is not None:
+        print(f"使用緩存的{symbol}數據")
+        return cached_df, None, None
+
+    # 檢查本地K線存儲，數據足夠、包含當前K線且沒有缺口，並在緩存有效期內更新過則無需請求數據源
+    stored_df = None
+    try:
+        stored_df = store.read(symbol, timeframe, limit)
+        store_age = store.age(symbol, timeframe)
+        if (not force and stored_df is not None and len(stored_df) >= limit and
+                store_age is not None and store_age <= cache.ttl_for(timeframe) and
+                window_is_current(stored_df, timeframe)):
+            print(f"使用本地存儲的{symbol}數據")
+            cache.set(symbol, timeframe, stored_df)
+            return stored_df, stored_df, None
+    except Exception as e:
+        print(f"讀取本地K線存儲失敗: {str(e)}")
+
+    # 由較小時間框架的有效數據聚合，切換時間框架時無需請求數據源
+    if not force:
+        derived_df = derive_window(symbol, timeframe, limit, cache, store)
+        if derived_df is not None:
+            cache.set(symbol, timeframe, derived_df)
+            return derived_df, stored_df, None
+
+    # 存儲中已有完整窗口時只獲取最後一根K線之後的數據，最後一根K線會被替換
+    since = None
+    if stored_df is not None and len(stored_df) >= limit:
+        last_ms = int(stored_df['timestamp'].iloc[-1].value // 10**6)
+        window_ms = TIMEFRAME_SECONDS.get(timeframe, 3600) * 1000 * limit
+        if time.time() * 1000 - last_ms < window_ms:
+            since = last_ms
+            print(f"增量獲取{symbol}自{stored_df['timestamp'].iloc[-1]}以來的K線")
+    return None, stored_df, since
+
+
+def floor_frame(df, timeframe):
+    """
+    將時間戳取整到K線開始時間，同一根K線的多個價格點只保留最後一個
+
+    不在整點的價格點(如CoinGecko)與已有窗口合併時不會產生相鄰的重複K線
+    """
+    timestamps = floor_timestamp(df['timestamp'].values.astype('datetime64[ms]').astype('int64'), timeframe)
+    floored = df.assign(timestamp=pd.to_datetime(timestamps, unit='ms'))
+    floored = floored.drop_duplicates(subset='timestamp', keep='last').reset_index(drop=True)
+    floored.attrs = dict(df.attrs)
+    return floored
+
+
+def merge_approximate(base_df, df):
+    """
+    將新K線合併到已有窗口，近似K線不覆蓋真實K線
+
+    df 為近似K線而 base_df 為真實K線時，只補充 base_df 中缺少的時間戳；
+    其他情況下時間戳相同的K線以新數據替換。結果保留 base_df 的 attrs，
+    合併了近似K線時標記為近似
+
+    返回:
+    pandas.DataFrame: 按時間排序的合併數據
+    """
+    if base_df is None or len(base_df) == 0:
+        return df
+    approximate = bool(base_df.attrs.get('approximate'))
+    if df.attrs.get('approximate') and not approximate:
+        df = df[~df['timestamp'].isin(base_df['timestamp'])]
+        approximate = len(df) > 0
+    merged = merge_candles(base_df, df).copy()
+    merged.attrs = dict(base_df.attrs)
+    merged.attrs['approximate'] = approximate
+    return merged
+
+
+def save_window(symbol, timeframe, df, limit, stored_df=None, since=None, cache=shared_cache, store=candle_store):
+    """
+    將新獲取的K線寫入本地存儲和共享緩存
+
+    只追加比本地存儲更新的K線，再從存儲讀取包含歷史數據的窗口；
+    DataFrame.attrs 中 approximate 為True的近似K線(如由匯率聚合)不寫入本地存儲，
+    但同樣與本地存儲(或緩存)中已有的窗口合併，增量獲取時不會只返回最新幾根K線
+
+    返回:
+    pandas.DataFrame: 合併歷史數據後的窗口
+    """
+    if df.attrs.get('approximate'):
+        base_df = stored_df if stored_df is not None else cache.peek(symbol, timeframe)
+        merged_df = merge_approximate(base_df, floor_frame(df, timeframe)).tail(limit).reset_index(drop=True)
+        cache.set(symbol, timeframe, merged_df)
+        return merged_df
+
+    try:
+        appended = store.append(symbol, timeframe, df)
+        print(f"本地存儲新增{appended}根{symbol} K線")
+        merged_df = store.read(symbol, timeframe, limit)
+    except Exception as e:
+        print(f"寫入本地K線存儲失敗: {str(e)}")
+        merged_df = merge_candles(stored_df, df).tail(limit).reset_index(drop=True) if since is not None else None
+    if merged_df is not None and len(merged_df) >= len(df):
+        df = merged_df
+
+    # 存入共享緩存
+    cache.set(symbol, timeframe, df)
+    return df
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+請求級截止時間
+一次「開始分析」有一個整體時間預算，截止時間通過 contextvars 傳遞到數據獲取、分析和LLM調用。
+HTTP請求、限流排隊和數據源競速都只使用剩餘的預算；預算不足時各階段自行降級
+(如使用緩存或本地存儲的數據、跳過深度歷史、改用模板報告)。
+沒有設置截止時間時行為與之前相同。
+"""
+
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+
+# 一次分析的整體時間預算(秒)，可通過環境變數 ANALYSIS_DEADLINE_SECONDS 設置
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv('ANALYSIS_DEADLINE_SECONDS', '45'))
+
+# 剩餘預算少於此秒數時不再發起新的網絡請求
+DEADLINE_MIN_REQUEST_SECONDS = float(os.getenv('DEADLINE_MIN_REQUEST_SECONDS', '1'))
+
+# 剩餘預算少於此秒數時跳過深度歷史K線加載，直接使用已獲取的數據分析
+HISTORY_MIN_BUDGET_SECONDS = float(os.getenv('HISTORY_MIN_BUDGET_SECONDS', '10'))
+
+# 剩餘預算少於此秒數時不調用LLM，改用模板生成策略報告
+LLM_MIN_BUDGET_SECONDS = float(os.getenv('LLM_MIN_BUDGET_SECONDS', '5'))
+
+_deadline = contextvars.ContextVar('request_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """剩餘預算不足以發起請求時拋出"""
+
+
+class Deadline:
+    """以單調時鐘計算的截止時間"""
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        """返回剩餘秒數，已過期時返回0"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def current_deadline():
+    """返回當前上下文的截止時間，沒有時返回None"""
+    return _deadline.get()
+
+
+def set_deadline(deadline):
+    """
+    設置當前上下文的截止時間，None表示取消
+
+    Streamlit腳本各階段分佈在不同的區塊中，無法用一個with區塊包住時使用
+    """
+    _deadline.set(deadline)
+
+
+@contextmanager
+def deadline_scope(seconds):
+    """在with區塊內使用新的截止時間，seconds為None時取消截止時間(如後台刷新)"""
+    token = _deadline.set(Deadline(seconds) if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """返回剩餘秒數，沒有截止時間時返回None"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def has_budget(seconds):
+    """剩餘預算是否至少有seconds秒，沒有截止時間時總是返回True"""
+    left = remaining()
+    return left is None or left >= seconds
+
+
+def cap_timeout(timeout):
+    """
+    將超時限制在剩餘預算內
+
+    參數:
+    timeout (float): 原本的超時秒數，None表示不設超時
+
+    返回:
+    float: 不超過剩餘預算的超時秒數；沒有截止時間時原樣返回
+
+    異常:
+    DeadlineExceeded: 剩餘預算少於 DEADLINE_MIN_REQUEST_SECONDS
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left < DEADLINE_MIN_REQUEST_SECONDS:
+        raise DeadlineExceeded(f"分析時間預算已用盡 (剩餘{left:.1f}秒)")
+    return left if timeout is None else min(timeout, left)
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+DexScreener交易對索引
+將 (基礎貨幣, 報價貨幣) 映射到 (chainId, pairAddress, 流動性) 並保存到磁盤，
+獲取K線時無需每次調用搜索端點；索引條目超過刷新間隔後再重新搜索。
+"""
+
+import json
+import os
+import threading
+import time
+
+from http_client import http_get
+from ohlcv_decode import loads
+from provider_api import DEXSCREENER_BASE_URL
+
+# 索引文件路徑，可通過環境變數 DEX_PAIR_INDEX_PATH 指向持久化磁盤
+DEX_PAIR_INDEX_PATH = os.getenv(
+    'DEX_PAIR_INDEX_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'dex_pairs.json')
+)
+
+# 索引條目的刷新間隔(秒)，流動性最高的交易對很少變化，默認6小時
+DEX_PAIR_REFRESH_SECONDS = float(os.getenv('DEX_PAIR_REFRESH_SECONDS', str(6 * 3600)))
+
+DEX_SEARCH_URL = f"{DEXSCREENER_BASE_URL}/latest/dex/search"
+
+
+def _liquidity(pair):
+    try:
+        return float((pair.get('liquidity') or {}).get('usd', 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def select_best_pair(pairs, base, quote):
+    """
+    在一次遍歷中選出最合適的交易對
+
+    優先選擇基礎和報價貨幣都匹配且流動性最高的交易對，
+    其次是報價貨幣匹配的交易對，最後使用第一個交易對
+
+    返回:
+    dict: 選中的交易對，列表為空時返回None
+    """
+    base, quote = base.lower(), quote.lower()
+    best_exact = None
+    best_quote = None
+    for pair in pairs:
+        liquidity = _liquidity(pair)
+        if pair['quoteToken']['symbol'].lower() != quote:
+            continue
+        if pair['baseToken']['symbol'].lower() == base:
+            if best_exact is None or liquidity > best_exact[0]:
+                best_exact = (liquidity, pair)
+        elif best_quote is None or liquidity > best_quote[0]:
+            best_quote = (liquidity, pair)
+
+    for candidate in (best_exact, best_quote):
+        if candidate is not None:
+            return candidate[1]
+    return pairs[0] if pairs else None
+
+
+class DexPairIndex:
+    """
+    線程安全的交易對索引，修改後寫回JSON文件
+    """
+
+    def __init__(self, path=DEX_PAIR_INDEX_PATH, refresh_seconds=DEX_PAIR_REFRESH_SECONDS):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        self.hits = 0
+        self.searches = 0
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"讀取DexScreener交易對索引失敗: {str(e)}")
+            return {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def _key(base, quote):
+        return f"{base.upper()}/{quote.upper()}"
+
+    def get(self, base, quote):
+        """返回未過期的索引條目，沒有或已過期時返回None"""
+        with self._lock:
+            entry = self._entries.get(self._key(base, quote))
+        if entry is None or time.time() - entry['resolved_at'] > self.refresh_seconds:
+            return None
+        return entry
+
+    def resolve(self, base, quote):
+        """
+        通過搜索端點解析交易對並更新索引
+
+        返回:
+        dict: {chainId, pairAddress, liquidity, resolved_at}，找不到交易對時返回None
+        """
+        self.searches += 1
+        response = http_get(DEX_SEARCH_URL, params={'q': base})
+        if response.status_code != 200:
+            raise Exception(f"DexScreener API請求失敗: {response.status_code}")
+
+        pair = select_best_pair(loads(response.content).get('pairs') or [], base, quote)
+        if pair is None:
+            return None
+
+        entry = {
+            'chainId': pair['chainId'],
+            'pairAddress': pair['pairAddress'],
+            'liquidity': _liquidity(pair),
+            'resolved_at': time.time()
+        }
+        with self._lock:
+            self._entries[self._key(base, quote)] = entry
+            try:
+                self._save()
+            except OSError as e:
+                print(f"保存DexScreener交易對索引失敗: {str(e)}")
+        return entry
+
+    def lookup(self, base, quote):
+        """返回交易對索引條目，不存在或已過期時重新搜索"""
+        entry = self.get(base, quote)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        return self.resolve(base, quote)
+
+    def stats(self):
+        """返回索引統計"""
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'searches': self.searches}
+
+
+# 進程級共享實例
+dex_pair_index = DexPairIndex()
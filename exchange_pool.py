@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+ccxt交易所實例池
+每個交易所在進程內只創建一個開啟 enableRateLimit 的實例，
+市場信息只加載一次並定期刷新，重複獲取數據時無需重新初始化。
+ccxt的同步實例不是線程安全的(限流計時、市場信息和HTTP會話都是實例狀態)，
+實例池返回的是以每個交易所一把鎖串行化方法調用的包裝，fetch_ohlcv 與刷新市場信息不會並發執行。
+"""
+
+import os
+import threading
+import time
+
+import ccxt
+
+# 市場信息的刷新間隔(秒)，可通過環境變數 CCXT_MARKETS_REFRESH_SECONDS 設置
+CCXT_MARKETS_REFRESH_SECONDS = float(os.getenv('CCXT_MARKETS_REFRESH_SECONDS', '3600'))
+
+# 創建交易所實例時使用的默認配置
+DEFAULT_EXCHANGE_CONFIG = {
+    'enableRateLimit': True
+}
+
+
+class LockedExchange:
+    """
+    共享ccxt實例的包裝，方法調用在該交易所的鎖內執行，屬性讀取直接轉發
+    """
+
+    def __init__(self, exchange, lock):
+        self._exchange = exchange
+        self._lock = lock
+
+    def __getattr__(self, name):
+        attr = getattr(self._exchange, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self._lock:
+                return attr(*args, **kwargs)
+        return call
+
+
+class ExchangePool:
+    """
+    線程安全的ccxt交易所實例池
+    """
+
+    def __init__(self, refresh_seconds=CCXT_MARKETS_REFRESH_SECONDS, config=None):
+        self.refresh_seconds = refresh_seconds
+        self.config = dict(DEFAULT_EXCHANGE_CONFIG if config is None else config)
+        self._exchanges = {}
+        self._loaded_at = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.market_loads = 0
+
+    def _exchange_lock(self, exchange_id):
+        with self._lock:
+            lock = self._locks.get(exchange_id)
+            if lock is None:
+                # 可重入，已持有鎖的線程在刷新市場信息時仍可通過包裝調用實例方法
+                lock = threading.RLock()
+                self._locks[exchange_id] = lock
+            return lock
+
+    def get(self, exchange_id='binance'):
+        """
+        返回交易所實例，市場信息未加載或已超過刷新間隔時重新加載
+
+        參數:
+        exchange_id (str): ccxt交易所ID，如 'binance'
+
+        返回:
+        LockedExchange: 共享交易所實例的包裝，方法調用按交易所串行執行
+        """
+        lock = self._exchange_lock(exchange_id)
+        with lock:
+            exchange = self._exchanges.get(exchange_id)
+            if exchange is None:
+                exchange = getattr(ccxt, exchange_id)(dict(self.config))
+                self._exchanges[exchange_id] = exchange
+                self.created += 1
+
+            loaded_at = self._loaded_at.get(exchange_id)
+            if loaded_at is None or time.time() - loaded_at > self.refresh_seconds:
+                try:
+                    exchange.load_markets(reload=loaded_at is not None)
+                    self._loaded_at[exchange_id] = time.time()
+                    self.market_loads += 1
+                except Exception as e:
+                    # 加載失敗時仍返回實例，下次調用再嘗試加載
+                    print(f"加載{exchange_id}市場信息失敗: {str(e)}")
+            return LockedExchange(exchange, lock)
+
+    def markets(self, exchange_id='binance'):
+        """返回已加載的市場和幣種信息 (markets, currencies)，未加載時返回 (None, None)"""
+        with self._exchange_lock(exchange_id):
+            exchange = self._exchanges.get(exchange_id)
+            if exchange is None or not exchange.markets:
+                return None, None
+            return exchange.markets, exchange.currencies
+
+    def stats(self):
+        """返回實例池統計"""
+        with self._lock:
+            return {
+                'exchanges': sorted(self._exchanges),
+                'created': self.created,
+                'market_loads': self.market_loads
+            }
+
+
+# 進程級共享實例
+exchange_pool = ExchangePool()
+
+
+def get_exchange(exchange_id='binance'):
+    """返回進程級共享的交易所實例"""
+    return exchange_pool.get(exchange_id)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+深度歷史K線加載
+交易所的 fetch_ohlcv 單次請求受分頁大小限制，無法一次取得計算SMA200等長週期指標所需的K線。
+此模組將需要的時間範圍按 since 切分為多頁，從最新一頁向更早的歷史回溯，
+在一個 ccxt.async_support 實例上並發請求(同步實例不是線程安全的，多線程共用會繞過其速率限制)，
+結果直接合併寫入本地K線存儲(見 candle_store.py)。
+已存儲的完整頁面不會重複請求。
+"""
+
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from async_providers import ccxt_async, run_sync
+from candle_store import candle_store, floor_timestamp, window_is_current, TIMEFRAME_SECONDS
+from data_cache import shared_cache
+from exchange_pool import exchange_pool
+from provider_api import ohlcv_to_dataframe
+from provider_health import provider_health
+
+# 每頁請求的K線數量，Binance單次最多返回1000根
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', '1000'))
+
+# 同時請求的頁數，實際請求頻率仍受異步交易所實例的 enableRateLimit 限制
+HISTORY_PAGE_WORKERS = int(os.getenv('HISTORY_PAGE_WORKERS', '3'))
+
+# 單個交易對和時間框架最多加載的K線數量
+HISTORY_MAX_CANDLES = int(os.getenv('HISTORY_MAX_CANDLES', '5000'))
+
+
+def plan_pages(timeframe, count, page_size=HISTORY_PAGE_SIZE, stored_timestamps=None, now_ms=None):
+    """
+    計算需要請求的分頁
+
+    參數:
+    timeframe (str): 時間框架，如 '1h'
+    count (int): 需要的K線數量(截至當前尚未收盤的K線)
+    page_size (int): 每頁K線數量
+    stored_timestamps (numpy.ndarray): 已存儲K線的毫秒時間戳，其中已完整覆蓋的頁面會被跳過
+    now_ms (int): 當前毫秒時間戳，默認使用系統時間
+
+    返回:
+    list: (since, limit) 列表，按從新到舊排列
+    """
+    step = TIMEFRAME_SECONDS[timeframe] * 1000
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    # 當前尚未收盤的K線的開盤時間，週線從週一開始
+    end = int(floor_timestamp(now_ms, timeframe))
+    start = end - (count - 1) * step
+
+    pages = []
+    for since in range(start, end + 1, page_size * step):
+        limit = min(page_size, (end - since) // step + 1)
+        if stored_timestamps is not None and len(stored_timestamps) > 0:
+            expected = np.arange(since, since + limit * step, step, dtype='int64')
+            # 包含未收盤K線的最新一頁總是重新請求
+            if expected[-1] < end and np.isin(expected, stored_timestamps).all():
+                continue
+        pages.append((since, limit))
+    return pages[::-1]
+
+
+async def fetch_pages(exchange, symbol, timeframe, pages, workers=HISTORY_PAGE_WORKERS):
+    """
+    在同一個異步交易所實例上並發請求多頁K線
+
+    同一實例的請求共用 enableRateLimit 的節流，最多 workers 頁同時進行，按從新到舊的順序開始
+
+    參數:
+    exchange: ccxt.async_support 交易所實例
+    symbol (str): 交易對符號
+    timeframe (str): 時間框架
+    pages (list): plan_pages 返回的 (since, limit) 列表
+    workers (int): 同時請求的頁數
+
+    返回:
+    tuple: (按從新到舊排列的K線行列表, 失敗時的異常或None)
+    """
+    semaphore = asyncio.Semaphore(max(1, workers))
+
+    async def fetch_page(since, limit):
+        async with semaphore:
+            return await exchange.fetch_ohlcv(symbol, timeframe, since=since, limit=limit)
+
+    tasks = [asyncio.ensure_future(fetch_page(since, limit)) for since, limit in pages]
+    rows = []
+    error = None
+    try:
+        # 按從新到舊的順序收集，某頁為空說明已早於上市時間，不再等待更早的頁面
+        for task in tasks:
+            page = await task
+            if not page:
+                break
+            rows.extend(page)
+    except Exception as e:
+        error = e
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return rows, error
+
+
+async def _load_pages(exchange_id, symbol, timeframe, pages):
+    """創建本次加載使用的異步交易所實例，複用同步實例池已加載的市場信息"""
+    exchange = getattr(ccxt_async, exchange_id)(dict(exchange_pool.config))
+    markets, currencies = exchange_pool.markets(exchange_id)
+    if markets:
+        exchange.set_markets(markets, currencies)
+    try:
+        return await fetch_pages(exchange, symbol, timeframe, pages)
+    finally:
+        await exchange.close()
+
+
+def load_history(symbol, timeframe, count, exchange_id='binance', store=candle_store, cache=shared_cache):
+    """
+    加載最近count根K線，缺少的部分分頁從交易所獲取並寫入本地存儲
+
+    參數:
+    symbol (str): 交易對符號，如 'BTC/USDT'
+    timeframe (str): 時間框架，如 '1h'
+    count (int): 需要的K線數量，不超過 HISTORY_MAX_CANDLES
+    exchange_id (str): ccxt交易所ID
+
+    返回:
+    pandas.DataFrame: 最近的K線數據(上市時間較短時可能少於count根)，獲取失敗且沒有存儲數據時返回None
+    """
+    if timeframe not in TIMEFRAME_SECONDS:
+        raise ValueError(f"不支持的時間框架: {timeframe}")
+    count = max(1, min(count, HISTORY_MAX_CANDLES))
+
+    stored_df = store.read(symbol, timeframe)
+    stored_timestamps = None
+    if stored_df is not None:
+        stored_timestamps = stored_df['timestamp'].values.astype('datetime64[ms]').astype('int64')
+        # 存儲數據足夠、包含當前K線且沒有缺口，並在緩存有效期內更新過時無需請求交易所
+        window_df = stored_df.tail(count).reset_index(drop=True)
+        store_age = store.age(symbol, timeframe)
+        if (len(stored_df) >= count and store_age is not None and store_age <= cache.ttl_for(timeframe) and
+                window_is_current(window_df, timeframe)):
+            return window_df
+
+    pages = plan_pages(timeframe, count, stored_timestamps=stored_timestamps)
+    if not provider_health.allow('ccxt'):
+        print(f"數據源ccxt處於熔斷狀態，使用已存儲的{symbol}歷史數據")
+        return stored_df.tail(count).reset_index(drop=True) if stored_df is not None else None
+
+    if ccxt_async is None:
+        print("未安裝ccxt.async_support，無法分頁加載歷史K線")
+        return stored_df.tail(count).reset_index(drop=True) if stored_df is not None else None
+
+    print(f"分頁加載{symbol} ({timeframe})歷史K線: {len(pages)}頁")
+    # 確保同步實例池已加載市場信息，供異步實例複用
+    exchange_pool.get(exchange_id)
+    start_time = time.time()
+    try:
+        rows, error = run_sync(_load_pages(exchange_id, symbol, timeframe, pages))
+    except Exception as e:
+        rows, error = [], e
+    if error is not None:
+        print(f"分頁加載{symbol}歷史K線失敗: {str(error)}")
+        provider_health.record_failure('ccxt', time.time() - start_time)
+        if not rows:
+            return stored_df.tail(count).reset_index(drop=True) if stored_df is not None else None
+    else:
+        provider_health.record_success('ccxt', time.time() - start_time)
+
+    if rows:
+        added = store.merge(symbol, timeframe, ohlcv_to_dataframe(rows))
+        print(f"本地存儲新增{added}根{symbol}歷史K線")
+
+    df = store.read(symbol, timeframe, count)
+    if df is not None:
+        cache.set(symbol, timeframe, df)
+    return df
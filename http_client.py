@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+共享HTTP連接池
+每個數據源主機使用一個保持連接(keep-alive)的 requests.Session，
+連接池大小、重試退避和超時策略統一在此設置，並提供連接複用統計。
+異步請求(async_http_request)使用同樣設置的 aiohttp.ClientSession。
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ohlcv_decode import loads
+from deadline import cap_timeout, current_deadline, has_budget, DEADLINE_MIN_REQUEST_SECONDS
+from rate_limiter import rate_limiter
+from response_archive import response_archive, PROVIDER_REPLAY_TIMING
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# 每個主機的連接池大小
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '10'))
+
+# 連接錯誤及5xx響應的重試次數和退避係數
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.3'))
+
+# 調用方未指定超時時使用的默認超時(秒)
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '15'))
+
+# 需要重試的狀態碼，429由限流邏輯處理，不在此重試
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+# 所有請求共用的默認請求頭
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _create_session(max_retries=HTTP_MAX_RETRIES):
+    """創建帶連接池和重試策略的Session"""
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=RETRY_STATUS_CODES,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(url, retries=True):
+    """
+    返回URL所屬主機的共享Session
+
+    參數:
+    url (str): 請求URL
+    retries (bool): 是否由連接池自動重試，False時返回不重試的Session
+
+    返回:
+    requests.Session: 該主機的連接池Session
+    """
+    key = (urlsplit(url).netloc, retries)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = _create_session(HTTP_MAX_RETRIES if retries else 0)
+            _sessions[key] = session
+        return session
+
+
+def _replayed_response(url, status_code, content, headers):
+    """將存檔中的響應包裝為 requests.Response"""
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers)
+    response.url = url
+    response.encoding = 'utf-8'
+    return response
+
+
+def _request_within_deadline(method, url, kwargs):
+    """
+    有截止時間時手動重試連接錯誤及5xx響應
+
+    連接池的自動重試每次都使用完整的超時，多次重試會超過截止時間；
+    這裡每次嘗試的超時都限制在剩餘預算內，剩餘預算不足以退避後再試時直接返回或拋出
+    """
+    session = get_session(url, retries=False)
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        delay = HTTP_BACKOFF_FACTOR * (2 ** attempt)
+        try:
+            response = session.request(method, url, **dict(kwargs, timeout=cap_timeout(kwargs['timeout'])))
+        except requests.ConnectionError:
+            if attempt == HTTP_MAX_RETRIES or not has_budget(delay + DEADLINE_MIN_REQUEST_SECONDS):
+                raise
+        else:
+            if (response.status_code not in RETRY_STATUS_CODES or attempt == HTTP_MAX_RETRIES or
+                    not has_budget(delay + DEADLINE_MIN_REQUEST_SECONDS)):
+                return response
+        time.sleep(delay)
+
+
+def http_request(method, url, **kwargs):
+    """
+    通過共享連接池發送請求，參數與 requests.request 相同
+
+    未指定 timeout 時使用 HTTP_TIMEOUT；開啟錄製或回放模式時響應寫入或讀取自存檔(見 response_archive.py)。
+    發送前先從該主機的令牌桶取得令牌，令牌不足時按當前優先級排隊(見 rate_limiter.py)；
+    有截止時間時排隊、每次嘗試的超時和重試都不超過剩餘的時間預算(見 deadline.py)
+    """
+    kwargs.setdefault('timeout', HTTP_TIMEOUT)
+    if response_archive.replaying(url):
+        status_code, content, headers, elapsed = response_archive.replay(
+            method, url, kwargs.get('params'), kwargs.get('json'))
+        if PROVIDER_REPLAY_TIMING:
+            time.sleep(elapsed)
+        return _replayed_response(url, status_code, content, headers)
+
+    # 剩餘預算不足時直接放棄，不進入排隊
+    cap_timeout(kwargs['timeout'])
+    rate_limiter.acquire(url)
+    start_time = time.time()
+    if current_deadline() is None:
+        response = get_session(url).request(method, url, **kwargs)
+    else:
+        response = _request_within_deadline(method, url, kwargs)
+    if response.status_code == 429:
+        rate_limiter.throttled(url, response.headers.get('Retry-After'))
+    if response_archive.recording(url):
+        response_archive.record(method, url, kwargs.get('params'), kwargs.get('json'), response.status_code,
+                                response.content, response.headers, time.time() - start_time)
+    return response
+
+
+def http_get(url, **kwargs):
+    """通過共享連接池發送GET請求"""
+    return http_request('GET', url, **kwargs)
+
+
+def http_post(url, **kwargs):
+    """通過共享連接池發送POST請求"""
+    return http_request('POST', url, **kwargs)
+
+
+def connection_stats():
+    """
+    返回各主機的連接複用統計
+
+    返回:
+    dict: 主機名到 {requests, connections, reused, reuse_rate} 的映射
+    """
+    stats = {}
+    with _sessions_lock:
+        sessions = dict(_sessions)
+
+    for host, session in sessions.items():
+        total_requests = 0
+        total_connections = 0
+        for adapter in set(session.adapters.values()):
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                total_requests += pool.num_requests
+                total_connections += pool.num_connections
+
+        reused = max(0, total_requests - total_connections)
+        stats[host] = {
+            'requests': total_requests,
+            'connections': total_connections,
+            'reused': reused,
+            'reuse_rate': round(reused / total_requests, 4) if total_requests else 0.0
+        }
+    return stats
+
+
+class AsyncResponse:
+    """異步請求的響應，提供與 requests.Response 相同的常用屬性"""
+
+    def __init__(self, status_code, content, headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return loads(self.content)
+
+
+def create_async_session():
+    """
+    創建帶連接池的 aiohttp.ClientSession，需在事件循環中調用
+
+    返回:
+    aiohttp.ClientSession: 每個主機最多 HTTP_POOL_SIZE 個保持連接
+    """
+    if aiohttp is None:
+        raise RuntimeError("未安裝aiohttp，無法使用異步數據源")
+    connector = aiohttp.TCPConnector(limit_per_host=HTTP_POOL_SIZE)
+    return aiohttp.ClientSession(connector=connector, headers=DEFAULT_HEADERS)
+
+
+async def async_http_request(session, method, url, timeout=HTTP_TIMEOUT, **kwargs):
+    """
+    通過異步Session發送請求，連接錯誤及5xx響應按 HTTP_MAX_RETRIES 退避重試
+
+    參數:
+    session (aiohttp.ClientSession): 由 create_async_session 創建的Session
+    method (str): HTTP方法
+    url (str): 請求URL
+    timeout (float): 超時秒數，None表示不設超時
+
+    返回:
+    AsyncResponse: 已讀取完響應體的響應
+    """
+    if response_archive.replaying(url):
+        status_code, content, headers, elapsed = response_archive.replay(
+            method, url, kwargs.get('params'), kwargs.get('json'))
+        if PROVIDER_REPLAY_TIMING:
+            await asyncio.sleep(elapsed)
+        return AsyncResponse(status_code, content, headers)
+
+    # 排隊等待令牌會阻塞線程，放到默認線程池中進行，並帶上請求優先級和截止時間；
+    # 協程被取消(如競速中落敗)時撤回排隊，不讓落敗的請求繼續佔用線程和令牌
+    cap_timeout(timeout)
+    context = contextvars.copy_context()
+    cancelled = threading.Event()
+    try:
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(context.run, rate_limiter.acquire, url, cancelled=cancelled))
+    except asyncio.CancelledError:
+        rate_limiter.cancel(cancelled)
+        raise
+
+    start_time = time.time()
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        try:
+            client_timeout = aiohttp.ClientTimeout(total=cap_timeout(timeout))
+            async with session.request(method, url, timeout=client_timeout, **kwargs) as response:
+                content = await response.read()
+                if response.status == 429:
+                    rate_limiter.throttled(url, response.headers.get('Retry-After'))
+                if response.status not in RETRY_STATUS_CODES or attempt == HTTP_MAX_RETRIES:
+                    if response_archive.recording(url):
+                        response_archive.record(method, url, kwargs.get('params'), kwargs.get('json'), response.status,
+                                                content, dict(response.headers), time.time() - start_time)
+                    return AsyncResponse(response.status, content, dict(response.headers))
+        except aiohttp.ClientConnectionError:
+            if attempt == HTTP_MAX_RETRIES:
+                raise
+        await asyncio.sleep(HTTP_BACKOFF_FACTOR * (2 ** attempt))
+
+
+async def async_http_get(session, url, **kwargs):
+    """通過異步Session發送GET請求"""
+    return await async_http_request(session, 'GET', url, **kwargs)
+
+
+async def async_http_post(session, url, **kwargs):
+    """通過異步Session發送POST請求"""
+    return await async_http_request(session, 'POST', url, **kwargs)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+本地K線串流重放服務器
+讀取逐行保存的K線websocket消息(如設置 KLINE_STREAM_RECORD_PATH 後由 kline_stream.py 記錄的文件)，
+在 ws://{host}:{port}/ws/{stream} 上按固定間隔重放，用於在沒有外網的環境中測試即時串流。
+
+用法:
+    python kline_replay.py data/klines.jsonl --port 8765 --interval 0.5 --loop
+    KLINE_STREAM_URL=ws://127.0.0.1:8765/ws streamlit run app.py
+"""
+
+import argparse
+import asyncio
+
+from aiohttp import web
+
+from ohlcv_decode import loads
+
+
+def load_messages(path):
+    """
+    讀取重放文件並按串流名稱分組
+
+    返回:
+    dict: 串流名稱(如 'btcusdt@kline_1h')到原始消息列表的映射
+    """
+    streams = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            data = loads(line)
+            payload = data.get('data', data)
+            kline = payload.get('k') or {}
+            name = f"{str(payload.get('s', kline.get('s', ''))).lower()}@kline_{kline.get('i', '')}"
+            streams.setdefault(name, []).append(line)
+    return streams
+
+
+def create_app(streams, interval=0.5, loop=False):
+    """
+    創建重放服務器應用
+
+    參數:
+    streams (dict): load_messages 返回的消息分組
+    interval (float): 兩條消息之間的間隔秒數
+    loop (bool): 重放完畢後是否從頭開始
+    """
+    async def replay(request):
+        name = request.match_info['stream']
+        messages = streams.get(name)
+        if not messages:
+            raise web.HTTPNotFound(text=f"沒有串流{name}的重放數據")
+
+        ws = web.WebSocketResponse(heartbeat=20)
+        await ws.prepare(request)
+        try:
+            while not ws.closed:
+                for message in messages:
+                    if ws.closed:
+                        break
+                    await ws.send_str(message)
+                    await asyncio.sleep(interval)
+                if not loop:
+                    break
+        finally:
+            await ws.close()
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/ws/{stream}', replay)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地K線串流重放服務器')
+    parser.add_argument('path', help='逐行保存的K線消息文件')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--interval', type=float, default=0.5, help='消息間隔(秒)')
+    parser.add_argument('--loop', action='store_true', help='重放完畢後從頭開始')
+    args = parser.parse_args()
+
+    streams = load_messages(args.path)
+    print(f"已加載{sum(len(messages) for messages in streams.values())}條消息: {', '.join(streams)}")
+    web.run_app(create_app(streams, args.interval, args.loop), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
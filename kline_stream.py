@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+即時K線串流
+在後台事件循環中訂閱交易所的K線websocket(默認Binance)，在內存中維護當前K線，
+每條消息更新共享緩存的最後一根K線，收盤的K線寫入本地存儲，並通知已註冊的監聽函數。
+頁面只需讀取 latest() 即可得到亞秒級價格，無需重新下載歷史數據。
+測試時可將 KLINE_STREAM_URL 指向本地重放服務器(見 kline_replay.py)。
+"""
+
+import asyncio
+import os
+import threading
+import time
+
+from candle_store import candle_store
+from data_cache import shared_cache
+from http_client import DEFAULT_HEADERS
+from ohlcv_decode import loads, build_frame
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# 是否默認開啟即時串流，可通過環境變數 KLINE_STREAM_ENABLED 設置
+KLINE_STREAM_ENABLED = os.getenv('KLINE_STREAM_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+# websocket基礎地址，訂閱地址為 {KLINE_STREAM_URL}/{stream}
+KLINE_STREAM_URL = os.getenv('KLINE_STREAM_URL', 'wss://stream.binance.com:9443/ws')
+
+# 連接斷開後重新連接的等待時間(秒)
+KLINE_STREAM_RECONNECT_SECONDS = float(os.getenv('KLINE_STREAM_RECONNECT_SECONDS', '5'))
+
+# 超過多少秒沒有會話讀取某個串流時取消訂閱
+KLINE_STREAM_IDLE_SECONDS = float(os.getenv('KLINE_STREAM_IDLE_SECONDS', '120'))
+
+# 將收到的原始消息逐行追加到此文件，可作為 kline_replay.py 的重放數據
+KLINE_STREAM_RECORD_PATH = os.getenv('KLINE_STREAM_RECORD_PATH', '')
+
+
+def stream_name(symbol, timeframe):
+    """返回交易對和時間框架對應的串流名稱，如 'btcusdt@kline_1h'"""
+    return f"{symbol.replace('/', '').lower()}@kline_{timeframe}"
+
+
+def parse_kline_message(data):
+    """
+    解析K線串流消息，支持單串流和組合串流({'stream': ..., 'data': ...})格式
+
+    返回:
+    tuple: (K線字典, 是否已收盤)，不是K線消息時返回 (None, False)
+    """
+    if 'data' in data and 'stream' in data:
+        data = data['data']
+    kline = data.get('k') if isinstance(data, dict) else None
+    if not kline:
+        return None, False
+    candle = {
+        'timestamp': int(kline['t']),
+        'open': float(kline['o']),
+        'high': float(kline['h']),
+        'low': float(kline['l']),
+        'close': float(kline['c']),
+        'volume': float(kline['v'])
+    }
+    return candle, bool(kline.get('x'))
+
+
+class KlineStream:
+    """
+    管理多個K線串流訂閱的後台事件循環
+    """
+
+    def __init__(self, url=KLINE_STREAM_URL, cache=shared_cache, store=candle_store,
+                 idle_seconds=KLINE_STREAM_IDLE_SECONDS, record_path=KLINE_STREAM_RECORD_PATH):
+        self.url = url.rstrip('/')
+        self.cache = cache
+        self.store = store
+        self.idle_seconds = idle_seconds
+        self.record_path = record_path
+        self._loop = None
+        self._thread = None
+        self._tasks = {}
+        self._candles = {}
+        self._last_watched = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.messages = 0
+        self.closed_candles = 0
+        self.reconnects = 0
+
+    def start(self):
+        """啟動後台事件循環線程，重複調用無效"""
+        if aiohttp is None:
+            raise RuntimeError("未安裝aiohttp，無法使用即時K線串流")
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name='kline-stream', daemon=True)
+            self._thread.start()
+
+    def subscribe(self, symbol, timeframe):
+        """
+        訂閱交易對和時間框架的K線串流，已訂閱時只記錄本次讀取
+
+        會話需要定期調用(如每次刷新即時價格時)，超過 KLINE_STREAM_IDLE_SECONDS 沒有調用時自動取消訂閱
+        """
+        self.start()
+        key = (symbol, timeframe)
+        with self._lock:
+            self._last_watched[key] = time.time()
+            if key in self._tasks:
+                return
+            self._tasks[key] = None
+        self._loop.call_soon_threadsafe(self._spawn, key)
+
+    def _spawn(self, key):
+        self._tasks[key] = self._loop.create_task(self._consume(*key))
+
+    def add_listener(self, listener):
+        """註冊監聽函數 listener(symbol, timeframe, candle, closed)，在串流線程中調用"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """移除監聽函數"""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def latest(self, symbol, timeframe):
+        """
+        返回最新收到的K線
+
+        返回:
+        tuple: (K線字典的副本, 距離收到的秒數)，尚未收到時返回 (None, None)
+        """
+        with self._lock:
+            self._last_watched[(symbol, timeframe)] = time.time()
+            entry = self._candles.get((symbol, timeframe))
+        if entry is None:
+            return None, None
+        return dict(entry[0]), time.time() - entry[1]
+
+    def _idle(self, key):
+        with self._lock:
+            return time.time() - self._last_watched.get(key, 0) > self.idle_seconds
+
+    async def _consume(self, symbol, timeframe):
+        key = (symbol, timeframe)
+        url = f"{self.url}/{stream_name(symbol, timeframe)}"
+        try:
+            async with aiohttp.ClientSession(headers=DEFAULT_HEADERS) as session:
+                while not self._idle(key):
+                    try:
+                        async with session.ws_connect(url, heartbeat=20) as ws:
+                            print(f"已連接K線串流: {url}")
+                            async for message in ws:
+                                if message.type == aiohttp.WSMsgType.TEXT:
+                                    self._on_message(symbol, timeframe, message.data)
+                                elif message.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                                    break
+                                if self._idle(key):
+                                    break
+                    except Exception as e:
+                        print(f"K線串流{stream_name(symbol, timeframe)}連接失敗: {str(e)}")
+                    if self._idle(key):
+                        break
+                    self.reconnects += 1
+                    await asyncio.sleep(KLINE_STREAM_RECONNECT_SECONDS)
+        finally:
+            print(f"已取消訂閱K線串流: {stream_name(symbol, timeframe)}")
+            with self._lock:
+                self._tasks.pop(key, None)
+
+    def _on_message(self, symbol, timeframe, raw):
+        try:
+            candle, closed = parse_kline_message(loads(raw))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"無法解析K線串流消息: {str(e)}")
+            return
+        if candle is None:
+            return
+        self._record(raw)
+
+        with self._lock:
+            self._candles[(symbol, timeframe)] = (candle, time.time())
+            self.messages += 1
+            listeners = list(self._listeners)
+
+        # 更新緩存中的最後一根K線(在鎖內替換整個條目)
+        self.cache.apply_candle(symbol, timeframe, candle)
+        if closed:
+            self.closed_candles += 1
+            try:
+                self.store.append(symbol, timeframe, build_frame(
+                    [candle['timestamp']], [candle['open']], [candle['high']],
+                    [candle['low']], [candle['close']], [candle['volume']]
+                ))
+            except Exception as e:
+                print(f"寫入本地K線存儲失敗: {str(e)}")
+
+        for listener in listeners:
+            try:
+                listener(symbol, timeframe, candle, closed)
+            except Exception as e:
+                print(f"K線串流監聽函數出錯: {str(e)}")
+
+    def _record(self, raw):
+        if not self.record_path:
+            return
+        try:
+            with open(self.record_path, 'a', encoding='utf-8') as f:
+                f.write((raw if isinstance(raw, str) else raw.decode('utf-8')).strip() + '\n')
+        except OSError as e:
+            print(f"記錄K線串流消息失敗: {str(e)}")
+
+    def stats(self):
+        """返回串流統計"""
+        with self._lock:
+            return {
+                'streams': len(self._tasks),
+                'messages': self.messages,
+                'closed_candles': self.closed_candles,
+                'reconnects': self.reconnects
+            }
+
+
+# 進程級共享實例
+kline_stream = KlineStream()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+失敗結果緩存
+記錄確定沒有數據的 (數據源, 交易對, 時間框架) 組合，
+在短暫的過期時間內直接跳過，避免每次重新運行都等待同一個必然失敗的請求。
+只有確定性的缺失(找不到交易對、不支持的時間框架、404、完整窗口請求返回空數據)才會記入，
+超時、5xx、429等暫時性錯誤由熔斷器處理(見 provider_health.py)，不會讓組合被跳過。
+"""
+
+import os
+import threading
+import time
+
+# 失敗結果的緩存時間(秒)，可通過環境變數 NEGATIVE_CACHE_TTL 設置
+NEGATIVE_CACHE_TTL = float(os.getenv('NEGATIVE_CACHE_TTL', '120'))
+
+
+class KnownMiss(Exception):
+    """數據源確定沒有此交易對或時間框架的數據時拋出，競速時會記入失敗緩存"""
+
+
+class NegativeCache:
+    """
+    線程安全的失敗結果緩存，以 (provider, symbol, timeframe) 為鍵
+    """
+
+    def __init__(self, ttl=NEGATIVE_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.added = 0
+        self.skipped = 0
+
+    def add(self, provider, symbol, timeframe, reason=None, ttl=None):
+        """記錄一次失敗結果，在 ttl 秒內跳過該組合"""
+        if self.ttl <= 0 and ttl is None:
+            return
+        with self._lock:
+            self._entries[(provider, symbol, timeframe)] = (time.time() + (self.ttl if ttl is None else ttl), reason)
+            self.added += 1
+
+    def is_blocked(self, provider, symbol, timeframe):
+        """組合仍在失敗緩存中時返回True，並計入跳過次數"""
+        key = (provider, symbol, timeframe)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            if time.time() >= entry[0]:
+                del self._entries[key]
+                return False
+            self.skipped += 1
+            return True
+
+    def discard(self, provider, symbol, timeframe):
+        """刪除指定組合的失敗記錄"""
+        with self._lock:
+            self._entries.pop((provider, symbol, timeframe), None)
+
+    def clear(self):
+        """清空失敗緩存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """返回失敗緩存統計"""
+        now = time.time()
+        with self._lock:
+            return {
+                'entries': sum(1 for expires_at, _ in self._entries.values() if expires_at > now),
+                'added': self.added,
+                'skipped': self.skipped
+            }
+
+
+# 進程級共享實例
+negative_cache = NegativeCache()
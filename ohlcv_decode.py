@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+數據源響應解碼
+使用orjson解析響應體，並直接以NumPy數組構建OHLCV各列，
+取代逐根K線調用 float() 並追加到列表的寫法。所有數據源的解析函數共用此模組。
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+OHLCV_COLUMNS = ['timestamp', 'open', 'high', 'low', 'close', 'volume']
+
+# 大於此值的時間戳視為毫秒時間戳，否則視為秒時間戳
+MILLISECOND_THRESHOLD = 10000000000
+
+
+def loads(content):
+    """
+    解析JSON響應體，優先使用orjson
+
+    參數:
+    content (bytes|str): 響應體
+
+    返回:
+    解析後的Python對象
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def to_datetime(timestamps, unit=None):
+    """
+    將數值時間戳數組轉換為datetime
+
+    參數:
+    timestamps (array-like): 時間戳
+    unit (str): 'ms' 或 's'，None時按第一個時間戳的大小自動判斷
+
+    返回:
+    pandas.DatetimeIndex: 轉換後的時間
+    """
+    values = np.asarray(timestamps, dtype='float64')
+    if unit is None:
+        unit = 'ms' if values.size and values[0] > MILLISECOND_THRESHOLD else 's'
+    return pd.to_datetime(values.astype('int64'), unit=unit)
+
+
+def build_frame(timestamps, open_, high, low, close, volume, unit='ms'):
+    """由各列數組構建OHLCV DataFrame"""
+    return pd.DataFrame({
+        'timestamp': to_datetime(timestamps, unit),
+        'open': np.asarray(open_, dtype='float64'),
+        'high': np.asarray(high, dtype='float64'),
+        'low': np.asarray(low, dtype='float64'),
+        'close': np.asarray(close, dtype='float64'),
+        'volume': np.asarray(volume, dtype='float64')
+    })
+
+
+def decode_candle_records(items, volume_key=None, unit=None):
+    """
+    將K線字典列表解碼為OHLCV DataFrame
+
+    參數:
+    items (list): 包含 timestamp/open/high/low/close/volume 字段的字典列表
+    volume_key (str): volume 為嵌套字典時使用的鍵，如DexScreener的 'base'
+    unit (str): 時間戳單位，None時自動判斷毫秒或秒
+
+    返回:
+    pandas.DataFrame: 按時間排序的OHLCV數據，缺少必要字段的K線會被丟棄；沒有有效K線時返回None
+    """
+    if not items:
+        return None
+
+    records = pd.DataFrame.from_records(items)
+    if any(column not in records.columns for column in OHLCV_COLUMNS):
+        return None
+
+    volume = records['volume']
+    if volume_key is not None and volume.dtype == object:
+        volume = volume.map(lambda value: value.get(volume_key, 0) if isinstance(value, dict) else value)
+
+    columns = {column: pd.to_numeric(records[column], errors='coerce').to_numpy(dtype='float64')
+               for column in OHLCV_COLUMNS if column != 'volume'}
+    columns['volume'] = pd.to_numeric(volume, errors='coerce').to_numpy(dtype='float64')
+
+    valid = np.ones(len(records), dtype=bool)
+    for values in columns.values():
+        valid &= ~np.isnan(values)
+    dropped = int(len(records) - valid.sum())
+    if dropped:
+        print(f"丟棄{dropped}條缺少必要字段的K線")
+    if not valid.any():
+        return None
+
+    df = build_frame(*(columns[column][valid] for column in OHLCV_COLUMNS), unit=unit)
+    return df.sort_values('timestamp', kind='stable').reset_index(drop=True)
+
+
+def decode_price_points(points):
+    """
+    將 [時間戳, 數值] 列表解碼為兩個NumPy數組
+
+    返回:
+    tuple: (時間戳數組, 數值數組)
+    """
+    values = np.asarray(points, dtype='float64').reshape(-1, 2)
+    return values[:, 0], values[:, 1]
+
+
+def estimate_ohlc(prices):
+    """
+    只有收盤價時以小波動估算開高低價，保持價格接近真實值
+
+    返回:
+    tuple: (開盤價, 最高價, 最低價) 數組
+    """
+    prices = np.asarray(prices, dtype='float64')
+    size = prices.shape[0]
+    open_ = prices * (1 - np.random.uniform(0, 0.002, size))
+    high = prices * (1 + np.random.uniform(0, 0.003, size))
+    low = prices * (1 - np.random.uniform(0, 0.003, size))
+    return open_, high, low
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+後台預取
+在後台線程中按K線收盤時間刷新默認的交易對×時間框架網格，
+使共享緩存中的數據始終保持有效，首次點擊無需等待數據源。
+請求之間保持最小間隔，所有數據源熔斷時暫停，沒有活躍會話時停止刷新。
+"""
+
+import os
+import threading
+import time
+
+from candle_store import TIMEFRAME_SECONDS
+from data_cache import shared_cache
+from provider_health import provider_health, OPEN
+
+# 是否啟用後台預取，可通過環境變數 PREFETCH_ENABLED 關閉
+PREFETCH_ENABLED = os.getenv('PREFETCH_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+# 預取的數據點數量，與技術分析頁的請求保持一致
+PREFETCH_LIMIT = int(os.getenv('PREFETCH_LIMIT', '100'))
+
+# 兩次預取請求之間的最小間隔(秒)，避免觸發數據源限流
+PREFETCH_MIN_INTERVAL = float(os.getenv('PREFETCH_MIN_INTERVAL', '2'))
+
+# K線收盤後延遲多少秒再刷新，等待數據源生成新K線
+PREFETCH_CLOSE_DELAY = float(os.getenv('PREFETCH_CLOSE_DELAY', '5'))
+
+# 超過多少秒沒有會話活動後暫停預取
+PREFETCH_IDLE_SECONDS = float(os.getenv('PREFETCH_IDLE_SECONDS', '300'))
+
+# 緩存存在時間達到過期時間的此比例時提前刷新
+PREFETCH_TTL_FRACTION = 0.8
+
+
+def next_candle_close(timeframe, now=None):
+    """返回時間框架下一根K線的收盤時間(秒級時間戳)"""
+    now = time.time() if now is None else now
+    seconds = TIMEFRAME_SECONDS.get(timeframe, 3600)
+    return (int(now) // seconds + 1) * seconds
+
+
+class Prefetcher:
+    """
+    交易對×時間框架網格的後台刷新器
+
+    refresh(symbol, timeframe, limit) 由調用方提供，負責獲取數據並寫入共享緩存
+    """
+
+    def __init__(self, symbols, timeframes, refresh, limit=PREFETCH_LIMIT, cache=shared_cache, health=provider_health):
+        self.symbols = list(symbols)
+        self.timeframes = list(timeframes)
+        self.refresh = refresh
+        self.limit = limit
+        self.cache = cache
+        self.health = health
+        self._due = {(symbol, timeframe): 0.0 for timeframe in self.timeframes for symbol in self.symbols}
+        self._last_active = time.time()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshed = 0
+        self.skipped = 0
+        self.failures = 0
+
+    def touch(self):
+        """記錄一次會話活動，喚醒暫停中的預取"""
+        self._last_active = time.time()
+        self._wake.set()
+
+    def start(self):
+        """啟動後台線程，重複調用無效"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='grid-prefetcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止後台線程"""
+        self._stop.set()
+        self._wake.set()
+
+    def _next_due(self, timeframe, now):
+        """下一次刷新時間：K線收盤後或緩存即將過期時，取較早者"""
+        close_due = next_candle_close(timeframe, now) + PREFETCH_CLOSE_DELAY
+        ttl_due = now + self.cache.ttl_for(timeframe) * PREFETCH_TTL_FRACTION
+        return min(close_due, ttl_due)
+
+    def _providers_down(self):
+        """所有已知數據源都處於熔斷狀態時返回True"""
+        stats = self.health.stats() if self.health is not None else {}
+        return bool(stats) and all(item['state'] == OPEN for item in stats.values())
+
+    def _run(self):
+        print(f"後台預取已啟動: {len(self.symbols)}個交易對 × {len(self.timeframes)}個時間框架")
+        while not self._stop.is_set():
+            # 沒有活躍會話時暫停，等待下一次會話活動
+            if time.time() - self._last_active > PREFETCH_IDLE_SECONDS:
+                print("沒有活躍會話，暫停後台預取")
+                self._wake.clear()
+                self._wake.wait()
+                continue
+
+            if self._providers_down():
+                self._stop.wait(self.health.cooldown)
+                continue
+
+            key, due = min(self._due.items(), key=lambda item: item[1])
+            now = time.time()
+            if due > now:
+                self._wake.clear()
+                self._wake.wait(min(due - now, PREFETCH_IDLE_SECONDS))
+                continue
+
+            symbol, timeframe = key
+            age = self.cache.age(symbol, timeframe)
+            if age is not None and age < self.cache.ttl_for(timeframe) * PREFETCH_TTL_FRACTION:
+                # 會話剛剛獲取過，緩存仍然新鮮
+                self.skipped += 1
+            else:
+                try:
+                    self.refresh(symbol, timeframe, self.limit)
+                    self.refreshed += 1
+                except Exception as e:
+                    self.failures += 1
+                    print(f"後台預取{symbol} ({timeframe})失敗: {str(e)}")
+                self._stop.wait(PREFETCH_MIN_INTERVAL)
+
+            self._due[key] = self._next_due(timeframe, time.time())
+
+    def stats(self):
+        """返回預取統計"""
+        return {
+            'cells': len(self._due),
+            'refreshed': self.refreshed,
+            'skipped': self.skipped,
+            'failures': self.failures,
+            'active': self._thread is not None and self._thread.is_alive(),
+            'paused': time.time() - self._last_active > PREFETCH_IDLE_SECONDS
+        }
+
+
+_prefetcher = None
+_prefetcher_lock = threading.Lock()
+
+
+def ensure_prefetcher(symbols, timeframes, refresh, limit=PREFETCH_LIMIT):
+    """
+    返回進程級的預取器，首次調用時創建並啟動
+
+    Streamlit每次重新運行腳本都會調用，同時記錄會話活動
+    """
+    global _prefetcher
+    if not PREFETCH_ENABLED:
+        return None
+
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher(symbols, timeframes, refresh, limit)
+            _prefetcher.start()
+    _prefetcher.touch()
+    return _prefetcher
@@ -0,0 +1,527 @@
+# -*- coding: utf-8 -*-
+"""
+數據源請求構建與響應解析
+數據源的請求參數和響應解析邏輯(app.py 和 bulk_fetch.py 使用)，
+不包含任何網絡調用。響應解碼統一使用 ohlcv_decode.py 的向量化實現。
+不支持的時間框架和確定沒有數據的響應拋出 KnownMiss，競速時記入失敗緩存(見 negative_cache.py)。
+"""
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from candle_store import filter_since, TIMEFRAME_SECONDS
+from negative_cache import KnownMiss
+from ohlcv_decode import build_frame, decode_candle_records, decode_price_points, estimate_ohlc
+from resample import resample_ohlcv
+
+# 本地模擬服務器地址(見 provider_emulator.py)，設置後所有數據源默認指向該服務器
+PROVIDER_EMULATOR_URL = os.getenv('PROVIDER_EMULATOR_URL', '').rstrip('/')
+
+
+def provider_base_url(name, default):
+    """
+    返回數據源的基礎地址
+
+    優先使用環境變數 {NAME}_BASE_URL，其次是 PROVIDER_EMULATOR_URL 下的 /{name} 路徑，最後使用默認地址
+    """
+    override = os.getenv(f'{name.upper()}_BASE_URL', '')
+    if override:
+        return override.rstrip('/')
+    if PROVIDER_EMULATOR_URL:
+        return f"{PROVIDER_EMULATOR_URL}/{name}"
+    return default
+
+
+# 默認的 Crypto APIs 密鑰，可通過環境變數 CRYPTOAPIS_KEY 覆蓋
+DEFAULT_CRYPTOAPIS_KEY = '56af1c06ebd5a7602a660516e0d044489c307860'
+
+BROWSER_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+def check_timeframe(provider, timeframe, supported):
+    """數據源不支持該時間框架時拋出 KnownMiss，而不是以其他時間框架的數據代替"""
+    if timeframe not in supported:
+        raise KnownMiss(f"{provider}不支持{timeframe}時間框架")
+
+
+def check_miss(provider, status_code, df=None, since=None):
+    """
+    響應確定沒有數據時拋出 KnownMiss
+
+    404(找不到交易對或幣種)，或完整窗口請求(since為None)返回200但沒有K線；
+    增量請求沒有新K線、以及其他錯誤狀態碼(429、5xx)都不是確定性的缺失
+    """
+    if status_code == 404:
+        raise KnownMiss(f"{provider}返回404")
+    if status_code == 200 and since is None and (df is None or len(df) == 0):
+        raise KnownMiss(f"{provider}返回空數據")
+
+# ---------------------------------------------------------------------------
+# Smithery MCP
+# ---------------------------------------------------------------------------
+
+SMITHERY_BASE_URL = provider_base_url('smithery', "https://smithery.ai/server/@truss44/mcp-crypto-price")
+SMITHERY_URL = f"{SMITHERY_BASE_URL}/get_crypto_price"
+
+# 時間間隔映射
+SMITHERY_INTERVAL_MAP = {
+    '15m': '15min',
+    '1h': '1h',
+    '4h': '4h',
+    '1d': '1d',
+    '1w': '1w'
+}
+
+
+def smithery_request(symbol, timeframe, limit=100, since=None):
+    """
+    構建Smithery MCP請求
+
+    返回:
+    tuple: (url, 請求參數, 請求頭)
+    """
+    # 解析交易對符號
+    base, quote = symbol.split('/')
+    base = base.upper()
+    quote = quote.upper()
+
+    # 轉換為Smithery MCP可接受的格式
+    mcp_symbol = f"{base}{quote}"
+
+    # 轉換時間框架為MCP接受的格式
+    check_timeframe('Smithery MCP', timeframe, SMITHERY_INTERVAL_MAP)
+    mcp_timeframe = SMITHERY_INTERVAL_MAP[timeframe]
+
+    # 準備請求參數
+    params = {
+        'symbol': mcp_symbol,
+        'interval': mcp_timeframe,
+        'limit': limit
+    }
+
+    # 增量獲取時只請求since之後的K線
+    if since is not None:
+        params['startTime'] = int(since)
+        params['limit'] = min(limit, int((time.time() * 1000 - since) // (TIMEFRAME_SECONDS.get(timeframe, 3600) * 1000)) + 1)
+
+    # 準備請求頭
+    headers = {
+        'accept': 'application/json',
+        'Content-Type': 'application/json',
+        'User-Agent': BROWSER_USER_AGENT
+    }
+    return SMITHERY_URL, params, headers
+
+
+def parse_smithery_candles(data, limit=100, since=None):
+    """
+    解析Smithery MCP返回的K線列表
+
+    時間戳按大小自動判斷毫秒或秒(見 ohlcv_decode.py)
+
+    返回:
+    pandas.DataFrame: OHLCV數據，格式不正確時返回None
+    """
+    if not isinstance(data, list) or len(data) == 0:
+        print(f"Smithery MCP API返回空數據或格式不正確: {data}")
+        return None
+
+    df = decode_candle_records(data)
+    if df is None:
+        print("Smithery MCP API返回的數據格式不包含必要字段")
+        return None
+
+    df = filter_since(df, since)
+
+    # 取最近的limit個數據點
+    if len(df) > limit:
+        df = df.tail(limit)
+    return df
+
+
+# ---------------------------------------------------------------------------
+# Crypto APIs
+# ---------------------------------------------------------------------------
+
+CRYPTOAPIS_BASE_URL = provider_base_url('cryptoapis', "https://rest.cryptoapis.io/v2/market-data")
+
+# 資產ID映射
+CRYPTOAPIS_ASSET_IDS = {
+    'BTC': 'bitcoin',
+    'ETH': 'ethereum',
+    'USDT': 'tether',
+    'USDC': 'usd-coin',
+    'SOL': 'solana',
+    'BNB': 'binancecoin',
+    'XRP': 'xrp',
+    'ADA': 'cardano',
+    'DOGE': 'dogecoin',
+    'SHIB': 'shiba-inu'
+}
+
+# 以美元計價、可直接使用USD價格的報價貨幣
+USD_QUOTES = ['USD', 'USDT', 'USDC']
+
+
+def cryptoapis_headers(api_key):
+    """構建Crypto APIs請求頭"""
+    return {
+        'Content-Type': 'application/json',
+        'X-API-Key': api_key,
+        'User-Agent': BROWSER_USER_AGENT
+    }
+
+
+def cryptoapis_symbols_rate_request(base, quote):
+    """方法1: Exchange Rate By Asset Symbols 端點，返回 (url, 參數)"""
+    url = f"{CRYPTOAPIS_BASE_URL}/exchange-rates/by-asset-symbols"
+    params = {
+        'context': 'crypto_analyzer',
+        'assetPairFrom': base,
+        'assetPairTo': quote
+    }
+    return url, params
+
+
+def cryptoapis_ids_rate_request(base, quote):
+    """方法2: Exchange Rate By Assets IDs 端點，返回 (url, 參數)"""
+    url = f"{CRYPTOAPIS_BASE_URL}/exchange-rates/by-assets-ids"
+    params = {
+        'context': 'crypto_analyzer',
+        'assetIdFrom': CRYPTOAPIS_ASSET_IDS.get(base, base.lower()),
+        'assetIdTo': CRYPTOAPIS_ASSET_IDS.get(quote, quote.lower())
+    }
+    return url, params
+
+
+def cryptoapis_asset_url(asset):
+    """方法3: Asset Details By Asset Symbol 端點"""
+    return f"{CRYPTOAPIS_BASE_URL}/assets/assetSymbol/{asset}"
+
+
+def parse_cryptoapis_symbols_rate(data):
+    """從方法1的響應中提取匯率，無法提取時返回None"""
+    if 'data' not in data or 'item' not in data['data']:
+        return None
+
+    item = data['data']['item']
+    # 如果API響應數據格式與預期不同，嘗試其他解析方式
+    if 'calculationTimestamp' in item or 'calculatedAt' in item:
+        rate = float(item['rate'])
+    else:
+        # 嘗試直接獲取rate字段
+        rate = 0
+        for key, value in item.items():
+            if isinstance(value, (int, float)) and key != 'calculationTimestamp' and key != 'calculatedAt':
+                rate = float(value)
+                break
+
+    return rate if rate and rate > 0 else None
+
+
+def parse_cryptoapis_ids_rate(data):
+    """從方法2的響應中提取匯率，無法提取時返回None"""
+    if 'data' in data and 'item' in data['data'] and 'rate' in data['data']['item']:
+        return float(data['data']['item']['rate'])
+    return None
+
+
+def parse_cryptoapis_asset_price(data):
+    """從方法3的響應中提取資產美元價格，無法提取時返回None"""
+    if 'data' in data and 'item' in data['data'] and 'price' in data['data']['item']:
+        return float(data['data']['item']['price'])
+    return None
+
+
+# ---------------------------------------------------------------------------
+# CoinCap
+# ---------------------------------------------------------------------------
+
+COINCAP_BASE_URL = provider_base_url('coincap', "https://api.coincap.io/v2")
+
+# CoinCap ID映射
+COINCAP_ID_MAP = {
+    'BTC': 'bitcoin',
+    'ETH': 'ethereum',
+    'SOL': 'solana',
+    'BNB': 'binance-coin',
+    'XRP': 'xrp',
+    'ADA': 'cardano',
+    'DOGE': 'dogecoin',
+    'SHIB': 'shiba-inu'
+}
+
+# 時間間隔映射
+COINCAP_INTERVAL_MAP = {
+    '15m': 'm15',
+    '1h': 'h1',
+    '4h': 'h1',  # CoinCap沒有h4，獲取h1後聚合
+    '1d': 'd1',
+    '1w': 'w1'
+}
+
+# 根據時間框架計算合適的時間範圍(天)
+COINCAP_TIME_RANGE_DAYS = {
+    '15m': 1,
+    '1h': 7,
+    '4h': 17,
+    '1d': 30,
+    '1w': 90
+}
+
+
+def coincap_request(symbol, timeframe, since=None):
+    """
+    構建CoinCap歷史價格請求
+
+    返回:
+    tuple: (url, 請求參數, 請求頭)
+    """
+    base, quote = symbol.split('/')
+    coin_id = COINCAP_ID_MAP.get(base.upper(), base.lower())
+    check_timeframe('CoinCap', timeframe, COINCAP_INTERVAL_MAP)
+    interval = COINCAP_INTERVAL_MAP[timeframe]
+
+    # 計算時間範圍
+    end_time = int(time.time() * 1000)
+    start_time = end_time - (COINCAP_TIME_RANGE_DAYS.get(timeframe, 7) * 24 * 60 * 60 * 1000)
+
+    # 增量獲取時只請求since之後的數據
+    if since is not None:
+        start_time = max(start_time, int(since))
+
+    url = f"{COINCAP_BASE_URL}/assets/{coin_id}/history"
+    params = {
+        'interval': interval,
+        'start': start_time,
+        'end': end_time
+    }
+    headers = {
+        'Accept': 'application/json',
+        'User-Agent': BROWSER_USER_AGENT
+    }
+    return url, params, headers
+
+
+def parse_coincap_history(data, limit=100, since=None, timeframe=None):
+    """
+    解析CoinCap歷史價格，CoinCap只提供價格，OHLC以小波動估算
+
+    CoinCap沒有的時間框架(4h)由h1數據聚合
+
+    返回:
+    pandas.DataFrame: OHLCV數據，沒有數據時返回None
+    """
+    if 'data' not in data or not data['data']:
+        return None
+
+    records = pd.DataFrame.from_records(data['data'], columns=['time', 'priceUsd'])
+    timestamps = pd.to_numeric(records['time'], errors='coerce').to_numpy(dtype='float64')
+    prices = pd.to_numeric(records['priceUsd'], errors='coerce').to_numpy(dtype='float64')
+    valid = ~(np.isnan(timestamps) | np.isnan(prices))
+    timestamps, prices = timestamps[valid], prices[valid]
+
+    open_, high, low = estimate_ohlc(prices)
+    volume = prices * np.random.uniform(prices * 1000, prices * 10000)  # 估算交易量
+
+    df = build_frame(timestamps, open_, high, low, prices, volume, unit='ms')
+    df = df.sort_values('timestamp')
+    if timeframe == '4h':
+        df = resample_ohlcv(df, '1h', '4h')
+    df = filter_since(df, since)
+
+    # 過濾所需數量的數據點
+    if len(df) > limit:
+        df = df.tail(limit)
+    # 開高低價由收盤價估算，只存入共享緩存，不寫入本地K線存儲
+    df.attrs['approximate'] = True
+    return df
+
+
+# ---------------------------------------------------------------------------
+# CoinGecko
+# ---------------------------------------------------------------------------
+
+COINGECKO_BASE_URL = provider_base_url('coingecko', "https://api.coingecko.com/api/v3")
+
+# CoinGecko ID映射
+COINGECKO_ID_MAP = {
+    'BTC': 'bitcoin',
+    'ETH': 'ethereum',
+    'SOL': 'solana',
+    'BNB': 'binancecoin',
+    'XRP': 'ripple',
+    'ADA': 'cardano',
+    'DOGE': 'dogecoin',
+    'SHIB': 'shiba-inu'
+}
+
+# 根據時間框架選擇天數
+COINGECKO_DAYS_MAP = {
+    '15m': 1,
+    '1h': 7,
+    '4h': 14,
+    '1d': 30,
+    '1w': 90
+}
+
+
+def coingecko_interval(timeframe):
+    """選擇合適的時間間隔"""
+    return 'hourly' if timeframe in ['15m', '1h', '4h'] else 'daily'
+
+
+def coingecko_request(symbol, timeframe, since=None):
+    """
+    構建CoinGecko市場圖表請求
+
+    返回:
+    tuple: (url, 請求參數, 請求頭)
+    """
+    base, quote = symbol.split('/')
+    coin_id = COINGECKO_ID_MAP.get(base.upper(), base.lower())
+    check_timeframe('CoinGecko', timeframe, COINGECKO_DAYS_MAP)
+    days = COINGECKO_DAYS_MAP[timeframe]
+
+    # 增量獲取時只請求since之後的天數
+    if since is not None:
+        days = max(1, min(days, int((time.time() * 1000 - since) // 86400000) + 1))
+
+    url = f"{COINGECKO_BASE_URL}/coins/{coin_id}/market_chart"
+    params = {
+        'vs_currency': quote.lower(),
+        'days': days,
+        'interval': coingecko_interval(timeframe)
+    }
+    # 請求頭，減少被限流概率
+    headers = {
+        'Accept': 'application/json',
+        'User-Agent': BROWSER_USER_AGENT
+    }
+    return url, params, headers
+
+
+def parse_coingecko_market_chart(data, timeframe, limit=100, since=None):
+    """
+    解析CoinGecko市場圖表，CoinGecko只提供收盤價，OHLC以小波動估算
+
+    返回:
+    pandas.DataFrame: OHLCV數據，沒有數據時返回None
+    """
+    if 'prices' not in data or not data['prices']:
+        return None
+
+    timestamps, prices = decode_price_points(data['prices'])
+
+    # 獲取成交量，缺少的部分以價格估算
+    volume = prices * np.random.uniform(prices * 1000, prices * 10000)
+    if data.get('total_volumes'):
+        _, volumes = decode_price_points(data['total_volumes'][:len(prices)])
+        volume[:len(volumes)] = volumes
+
+    open_, high, low = estimate_ohlc(prices)
+    df = build_frame(timestamps, open_, high, low, prices, volume, unit='ms')
+
+    # 小時數據聚合為4小時K線，保留區間內的最高價和最低價
+    if timeframe == '4h':
+        df = resample_ohlcv(df, '1h', '4h')
+
+    df = filter_since(df, since)
+
+    # 確保數據點數量
+    if len(df) > limit:
+        df = df.tail(limit)
+    # 開高低價由收盤價估算，只存入共享緩存，不寫入本地K線存儲
+    df.attrs['approximate'] = True
+    return df
+
+
+def coingecko_markets_request(bases, quote='USDT'):
+    """
+    構建CoinGecko批量市場數據請求，一次返回多個幣種的價格和7天小時級走勢
+
+    參數:
+    bases (list): 基礎貨幣列表，如 ['BTC', 'ETH']
+    quote (str): 報價貨幣
+
+    返回:
+    tuple: (url, 請求參數, 請求頭)
+    """
+    ids = [COINGECKO_ID_MAP.get(base.upper(), base.lower()) for base in bases]
+    url = f"{COINGECKO_BASE_URL}/coins/markets"
+    params = {
+        'vs_currency': 'usd' if quote.upper() in USD_QUOTES else quote.lower(),
+        'ids': ','.join(ids),
+        'sparkline': 'true',
+        'per_page': len(ids)
+    }
+    headers = {
+        'Accept': 'application/json',
+        'User-Agent': BROWSER_USER_AGENT
+    }
+    return url, params, headers
+
+
+def parse_coingecko_markets_daily(data, limit=8):
+    """
+    將CoinGecko批量市場數據的7天小時級走勢聚合為日K線
+
+    走勢從7天前的某個小時開始，第一天不完整，直接丟棄；端點只提供當前24小時成交量，
+    K線成交量為NaN，24小時成交量保存在 DataFrame.attrs['volume_24h']。
+    開高低價由小時價格點估算，結果標記為近似K線，不寫入本地存儲
+
+    返回:
+    dict: 基礎貨幣(大寫)到OHLCV DataFrame的映射
+    """
+    id_to_base = {coin_id: base for base, coin_id in COINGECKO_ID_MAP.items()}
+    frames = {}
+    for item in data if isinstance(data, list) else []:
+        prices = (item.get('sparkline_in_7d') or {}).get('price') or []
+        if not prices or not item.get('last_updated'):
+            continue
+
+        # 走勢數據按小時排列，最後一個點對應 last_updated
+        end = pd.Timestamp(item['last_updated']).tz_localize(None).floor('h')
+        index = pd.date_range(end=end, periods=len(prices), freq='h')
+        series = pd.Series(prices, index=index, dtype='float64')
+        series.iloc[-1] = float(item.get('current_price') or series.iloc[-1])
+
+        daily = series.resample('1D').agg(['first', 'max', 'min', 'last']).dropna()
+        if len(daily) > 0 and index[0] > daily.index[0]:
+            daily = daily.iloc[1:]
+        if len(daily) == 0:
+            continue
+        df = pd.DataFrame({
+            'timestamp': daily.index,
+            'open': daily['first'].values,
+            'high': daily['max'].values,
+            'low': daily['min'].values,
+            'close': daily['last'].values,
+            'volume': np.nan
+        })
+        base = id_to_base.get(item.get('id'), str(item.get('symbol', '')).upper())
+        df = df.tail(limit).reset_index(drop=True)
+        df.attrs['approximate'] = True
+        df.attrs['volume_24h'] = float(item.get('total_volume') or 0.0)
+        frames[base] = df
+    return frames
+
+
+# ---------------------------------------------------------------------------
+# DexScreener
+# ---------------------------------------------------------------------------
+
+DEXSCREENER_BASE_URL = provider_base_url('dexscreener', "https://api.dexscreener.com")
+
+
+# ---------------------------------------------------------------------------
+# CCXT
+# ---------------------------------------------------------------------------
+
+def ohlcv_to_dataframe(ohlcv):
+    """將ccxt返回的OHLCV列表轉換為DataFrame"""
+    values = np.asarray(ohlcv, dtype='float64').reshape(-1, 6)
+    return build_frame(*values.T, unit='ms')
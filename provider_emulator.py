@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+本地數據源模擬服務器
+按各數據源(Crypto APIs、Smithery、CoinCap、CoinGecko、DexScreener)的原始JSON格式返回確定性的合成數據，
+或返回 --fixtures 目錄中錄製的響應，使整個數據獲取流程可以離線運行、做基準測試和壓力測試。
+每個端點可單獨配置延遲分佈、錯誤率和超時率。
+
+用法:
+    python provider_emulator.py --port 8900 --config emulator.json --seed 42
+    PROVIDER_EMULATOR_URL=http://127.0.0.1:8900 streamlit run app.py
+
+配置文件示例(端點名稱 > 數據源名稱 > default 依次查找):
+    {
+        "default": {"latency": {"distribution": "lognormal", "median_ms": 80, "sigma": 0.5}},
+        "coingecko": {"error_rate": 0.1, "error_status": 429},
+        "coincap_history": {"timeout_rate": 0.05, "timeout_seconds": 30}
+    }
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import zlib
+from datetime import datetime, timezone
+
+from aiohttp import web
+
+from provider_api import COINCAP_ID_MAP, COINGECKO_ID_MAP, CRYPTOAPIS_ASSET_IDS, USD_QUOTES
+
+# 合成數據使用的基準價格
+EMULATOR_BASE_PRICES = {
+    'BTC': 67000,
+    'ETH': 3200,
+    'SOL': 165,
+    'BNB': 560,
+    'XRP': 0.61,
+    'ADA': 0.45,
+    'DOGE': 0.15,
+    'SHIB': 0.000027,
+    'USDT': 1.0,
+    'USDC': 1.0,
+    'USD': 1.0
+}
+
+# 解析Smithery交易對符號(如 'BTCUSDT')時嘗試的報價貨幣
+KNOWN_QUOTES = ('USDT', 'USDC', 'USD', 'BTC', 'ETH')
+
+SMITHERY_INTERVALS = {'15min': 900, '1h': 3600, '4h': 14400, '1d': 86400, '1w': 604800}
+COINCAP_INTERVALS = {'m15': 900, 'h1': 3600, 'd1': 86400}
+DEX_TIMEFRAMES = {'15m': 900, '1h': 3600, '4h': 14400, '1d': 86400}
+
+DEFAULT_PROFILE = {
+    'latency': {'distribution': 'fixed', 'ms': 0},
+    'error_rate': 0.0,
+    'error_status': 503,
+    'timeout_rate': 0.0,
+    'timeout_seconds': 60
+}
+
+
+def _reverse(mapping):
+    return {value: key for key, value in mapping.items()}
+
+
+COIN_BY_ID = {**_reverse(COINCAP_ID_MAP), **_reverse(COINGECKO_ID_MAP), **_reverse(CRYPTOAPIS_ASSET_IDS)}
+
+
+def synthetic_price(base, timestamp_ms):
+    """
+    返回確定性的合成價格：週期波動疊加按時間戳哈希的小幅噪聲，
+    同一時間點在不同請求、不同時間框架下的價格一致
+    """
+    base_price = EMULATOR_BASE_PRICES.get(base.upper(), 100.0)
+    t = timestamp_ms / 1000.0
+    phase = zlib.crc32(base.upper().encode()) % 1000 / 1000.0 * 2 * math.pi
+    trend = 0.05 * math.sin(2 * math.pi * t / (7 * 86400) + phase) + 0.01 * math.sin(2 * math.pi * t / 86400 + phase)
+    noise = (zlib.crc32(f"{base}:{int(t // 60)}".encode()) % 10000 / 10000.0 - 0.5) * 0.004
+    return base_price * (1 + trend + noise)
+
+
+def synthetic_candle(base, open_ms, step_seconds):
+    """返回一根合成K線 (open, high, low, close, volume)"""
+    close_ms = open_ms + step_seconds * 1000
+    samples = [synthetic_price(base, open_ms + (close_ms - open_ms) * i / 4) for i in range(5)]
+    volume = 1000.0 + zlib.crc32(f"{base}:{open_ms}".encode()) % 9000
+    return samples[0], max(samples), min(samples), samples[-1], volume
+
+
+def candle_opens(step_seconds, start_ms=None, end_ms=None, limit=100):
+    """返回 [start_ms, end_ms] 內按時間框架對齊的開盤時間，最多limit個"""
+    step_ms = step_seconds * 1000
+    end_ms = int(time.time() * 1000) if end_ms is None else int(end_ms)
+    last = end_ms // step_ms * step_ms
+    first = last - (limit - 1) * step_ms
+    if start_ms is not None:
+        first = max(first, int(start_ms) // step_ms * step_ms)
+    return list(range(first, last + 1, step_ms))
+
+
+def split_pair(symbol):
+    """將 'BTCUSDT' 拆分為 ('BTC', 'USDT')"""
+    symbol = symbol.upper()
+    for quote in KNOWN_QUOTES:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return symbol, 'USDT'
+
+
+def quote_price(base, quote, timestamp_ms):
+    """返回以報價貨幣計價的合成價格"""
+    price = synthetic_price(base, timestamp_ms)
+    if quote.upper() in USD_QUOTES:
+        return price
+    return price / synthetic_price(quote, timestamp_ms)
+
+
+# ---------------------------------------------------------------------------
+# 各數據源端點
+# ---------------------------------------------------------------------------
+
+def smithery_candles(query):
+    base, quote = split_pair(query.get('symbol', 'BTCUSDT'))
+    step = SMITHERY_INTERVALS.get(query.get('interval', '1h'), 3600)
+    opens = candle_opens(step, query.get('startTime'), limit=int(query.get('limit', 100)))
+    factor = 1.0 if quote in USD_QUOTES else 1 / synthetic_price(quote, opens[-1])
+    body = []
+    for open_ms in opens:
+        o, h, l, c, v = synthetic_candle(base, open_ms, step)
+        body.append({'timestamp': open_ms, 'open': o * factor, 'high': h * factor,
+                     'low': l * factor, 'close': c * factor, 'volume': v})
+    return body
+
+
+def cryptoapis_symbols_rate(query):
+    now_ms = int(time.time() * 1000)
+    rate = quote_price(query.get('assetPairFrom', 'BTC'), query.get('assetPairTo', 'USDT'), now_ms)
+    return {'data': {'item': {'calculationTimestamp': now_ms // 1000, 'rate': str(rate)}}}
+
+
+def cryptoapis_ids_rate(query):
+    now_ms = int(time.time() * 1000)
+    base = COIN_BY_ID.get(query.get('assetIdFrom', ''), query.get('assetIdFrom', 'BTC'))
+    quote = COIN_BY_ID.get(query.get('assetIdTo', ''), query.get('assetIdTo', 'USDT'))
+    return {'data': {'item': {'calculationTimestamp': now_ms // 1000, 'rate': str(quote_price(base, quote, now_ms))}}}
+
+
+def cryptoapis_asset(asset):
+    return {'data': {'item': {'assetSymbol': asset, 'price': str(synthetic_price(asset, time.time() * 1000))}}}
+
+
+def coincap_history(coin_id, query):
+    base = COIN_BY_ID.get(coin_id, coin_id.upper())
+    step = COINCAP_INTERVALS.get(query.get('interval', 'h1'), 3600)
+    end_ms = int(query.get('end', time.time() * 1000))
+    start_ms = int(query.get('start', end_ms - 7 * 86400000))
+    opens = candle_opens(step, start_ms, end_ms, limit=2000)
+    return {'data': [{'priceUsd': str(synthetic_price(base, t)), 'time': t} for t in opens],
+            'timestamp': int(time.time() * 1000)}
+
+
+def coingecko_market_chart(coin_id, query):
+    base = COIN_BY_ID.get(coin_id, coin_id.upper())
+    days = int(float(query.get('days', 7)))
+    step = 86400 if query.get('interval') == 'daily' else 3600
+    opens = candle_opens(step, int(time.time() * 1000) - days * 86400000, limit=days * 86400 // step + 1)
+    return {
+        'prices': [[t, synthetic_price(base, t)] for t in opens],
+        'market_caps': [[t, synthetic_price(base, t) * 1e7] for t in opens],
+        'total_volumes': [[t, synthetic_candle(base, t, step)[4] * synthetic_price(base, t)] for t in opens]
+    }
+
+
+def coingecko_markets(query):
+    now_ms = int(time.time() * 1000)
+    opens = candle_opens(3600, limit=168)
+    body = []
+    for coin_id in filter(None, query.get('ids', '').split(',')):
+        base = COIN_BY_ID.get(coin_id, coin_id.upper())
+        body.append({
+            'id': coin_id,
+            'symbol': base.lower(),
+            'current_price': synthetic_price(base, now_ms),
+            'total_volume': synthetic_price(base, now_ms) * 1e6,
+            'last_updated': datetime.fromtimestamp(now_ms / 1000, tz=timezone.utc).isoformat().replace('+00:00', 'Z'),
+            'sparkline_in_7d': {'price': [synthetic_price(base, t) for t in opens]}
+        })
+    return body
+
+
+def dexscreener_search(query):
+    base = query.get('q', 'BTC').upper()
+    return {'pairs': [{
+        'chainId': 'emulator',
+        'pairAddress': f"{base.lower()}-usdt",
+        'baseToken': {'symbol': base},
+        'quoteToken': {'symbol': 'USDT'},
+        'liquidity': {'usd': 10000000}
+    }]}
+
+
+def dexscreener_candles(query):
+    base = query.get('pairAddress', 'btc-usdt').split('-')[0].upper()
+    start_ms = int(query['from']) * 1000 if query.get('from') else None
+    candles = []
+    for timeframe, step in DEX_TIMEFRAMES.items():
+        for open_ms in candle_opens(step, start_ms, limit=200):
+            o, h, l, c, v = synthetic_candle(base, open_ms, step)
+            candles.append({'timeframe': timeframe, 'timestamp': open_ms, 'open': o, 'high': h,
+                            'low': l, 'close': c, 'volume': {'base': v}})
+    return {'candles': candles}
+
+
+# ---------------------------------------------------------------------------
+# 服務器
+# ---------------------------------------------------------------------------
+
+class FaultInjector:
+    """
+    按端點配置注入延遲、錯誤和超時
+    """
+
+    def __init__(self, config=None, seed=None):
+        self.config = config or {}
+        self.random = random.Random(seed)
+        self.counts = {}
+
+    def profile(self, route, provider):
+        profile = dict(DEFAULT_PROFILE)
+        for name in ('default', provider, route):
+            profile.update(self.config.get(name, {}))
+        return profile
+
+    def latency(self, spec):
+        """按延遲分佈抽樣，返回秒數"""
+        distribution = spec.get('distribution', 'fixed')
+        if distribution == 'uniform':
+            ms = self.random.uniform(spec.get('min_ms', 0), spec.get('max_ms', 100))
+        elif distribution == 'normal':
+            ms = self.random.gauss(spec.get('mean_ms', 50), spec.get('std_ms', 10))
+        elif distribution == 'lognormal':
+            ms = self.random.lognormvariate(math.log(max(spec.get('median_ms', 50), 1e-3)), spec.get('sigma', 0.5))
+        else:
+            ms = spec.get('ms', 0)
+        return max(0.0, ms) / 1000.0
+
+    def record(self, route, outcome):
+        counts = self.counts.setdefault(route, {'ok': 0, 'error': 0, 'timeout': 0})
+        counts[outcome] += 1
+
+
+def create_app(config=None, seed=None, fixtures_dir=None):
+    """
+    創建模擬服務器應用
+
+    參數:
+    config (dict): 延遲/錯誤/超時配置
+    seed (int): 隨機數種子，相同種子下注入的故障序列相同
+    fixtures_dir (str): 錄製響應目錄，存在 {端點名稱}.json 時直接返回該文件內容
+    """
+    injector = FaultInjector(config, seed)
+
+    def endpoint(route, provider, build):
+        async def handler(request):
+            profile = injector.profile(route, provider)
+            await asyncio.sleep(injector.latency(profile['latency']))
+
+            draw = injector.random.random()
+            if draw < profile['timeout_rate']:
+                injector.record(route, 'timeout')
+                await asyncio.sleep(profile['timeout_seconds'])
+                return web.json_response({'error': 'emulated timeout'}, status=504)
+            if draw < profile['timeout_rate'] + profile['error_rate']:
+                injector.record(route, 'error')
+                return web.json_response({'error': 'emulated failure'}, status=profile['error_status'])
+
+            injector.record(route, 'ok')
+            if fixtures_dir:
+                fixture = os.path.join(fixtures_dir, f"{route}.json")
+                if os.path.exists(fixture):
+                    return web.FileResponse(fixture, headers={'Content-Type': 'application/json'})
+            body = build(request)
+            if asyncio.iscoroutine(body):
+                body = await body
+            return web.json_response(body)
+        return handler
+
+    async def stats(request):
+        return web.json_response(injector.counts)
+
+    app = web.Application()
+    query = lambda request: dict(request.query)
+
+    async def smithery_body(request):
+        # Smithery以POST發送JSON請求體(見 provider_api.smithery_request)
+        return smithery_candles(await request.json())
+
+    app.router.add_post('/smithery/get_crypto_price', endpoint('smithery_candles', 'smithery', smithery_body))
+    app.router.add_get('/cryptoapis/exchange-rates/by-asset-symbols', endpoint(
+        'cryptoapis_symbols_rate', 'cryptoapis', lambda r: cryptoapis_symbols_rate(query(r))))
+    app.router.add_get('/cryptoapis/exchange-rates/by-assets-ids', endpoint(
+        'cryptoapis_ids_rate', 'cryptoapis', lambda r: cryptoapis_ids_rate(query(r))))
+    app.router.add_get('/cryptoapis/assets/assetSymbol/{asset}', endpoint(
+        'cryptoapis_asset', 'cryptoapis', lambda r: cryptoapis_asset(r.match_info['asset'])))
+    app.router.add_get('/coincap/assets/{coin_id}/history', endpoint(
+        'coincap_history', 'coincap', lambda r: coincap_history(r.match_info['coin_id'], query(r))))
+    app.router.add_get('/coingecko/coins/markets', endpoint(
+        'coingecko_markets', 'coingecko', lambda r: coingecko_markets(query(r))))
+    app.router.add_get('/coingecko/coins/{coin_id}/market_chart', endpoint(
+        'coingecko_market_chart', 'coingecko', lambda r: coingecko_market_chart(r.match_info['coin_id'], query(r))))
+    app.router.add_get('/dexscreener/latest/dex/search', endpoint(
+        'dexscreener_search', 'dexscreener', lambda r: dexscreener_search(query(r))))
+    app.router.add_get('/dexscreener/latest/dex/candles', endpoint(
+        'dexscreener_candles', 'dexscreener', lambda r: dexscreener_candles(query(r))))
+    app.router.add_get('/__stats', stats)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地數據源模擬服務器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--config', help='延遲/錯誤/超時配置JSON文件')
+    parser.add_argument('--seed', type=int, help='隨機數種子')
+    parser.add_argument('--fixtures', help='錄製響應目錄')
+    args = parser.parse_args()
+
+    config = None
+    if args.config:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    print(f"數據源模擬服務器: 設置 PROVIDER_EMULATOR_URL=http://{args.host}:{args.port} 後運行應用")
+    web.run_app(create_app(config, args.seed, args.fixtures), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+數據源健康追蹤與熔斷
+記錄每個數據源的錯誤率和延遲，連續失敗達到閾值後打開熔斷，
+冷卻期後以半開狀態放行一個探測請求，成功則恢復，失敗則重新熔斷。
+健康評分用於按成功率和延遲重新排列回退順序。
+"""
+
+import os
+import threading
+import time
+
+# 連續失敗多少次後打開熔斷
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '3'))
+
+# 熔斷打開後等待多少秒再放行探測請求
+CIRCUIT_COOLDOWN_SECONDS = float(os.getenv('CIRCUIT_COOLDOWN_SECONDS', '30'))
+
+# 成功率和延遲的指數移動平均係數
+HEALTH_EWMA_ALPHA = 0.2
+
+# 熔斷狀態
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """數據源處於熔斷狀態時拋出"""
+
+
+class ProviderHealth:
+    """單個數據源的健康狀態"""
+
+    def __init__(self, name):
+        self.name = name
+        self.state = CLOSED
+        self.success_rate = 1.0
+        self.latency = None
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def score(self):
+        """健康評分，成功率越高、延遲越低分數越高"""
+        latency = self.latency or 0.0
+        return self.success_rate / (1.0 + latency)
+
+    def as_dict(self):
+        return {
+            'state': self.state,
+            'success_rate': round(self.success_rate, 3),
+            'latency': round(self.latency, 3) if self.latency is not None else None,
+            'consecutive_failures': self.consecutive_failures,
+            'successes': self.successes,
+            'failures': self.failures,
+            'rejected': self.rejected,
+            'score': round(self.score(), 3)
+        }
+
+
+class HealthTracker:
+    """
+    線程安全的數據源健康追蹤器
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown=CIRCUIT_COOLDOWN_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name):
+        health = self._providers.get(name)
+        if health is None:
+            health = ProviderHealth(name)
+            self._providers[name] = health
+        return health
+
+    def allow(self, name):
+        """
+        判斷是否允許向數據源發送請求
+
+        熔斷打開且冷卻未結束時拒絕；冷卻結束後切換為半開狀態，只放行一個探測請求
+        """
+        with self._lock:
+            health = self._get(name)
+            if health.state == CLOSED:
+                return True
+
+            if health.state == OPEN and time.time() - health.opened_at >= self.cooldown:
+                health.state = HALF_OPEN
+                health.probe_in_flight = False
+
+            if health.state == HALF_OPEN and not health.probe_in_flight:
+                health.probe_in_flight = True
+                print(f"數據源{name}熔斷冷卻結束，發送探測請求")
+                return True
+
+            health.rejected += 1
+            return False
+
+    def record_success(self, name, latency):
+        """記錄一次成功請求及其延遲(秒)"""
+        with self._lock:
+            health = self._get(name)
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.success_rate += HEALTH_EWMA_ALPHA * (1.0 - health.success_rate)
+            if health.latency is None:
+                health.latency = latency
+            else:
+                health.latency += HEALTH_EWMA_ALPHA * (latency - health.latency)
+            if health.state != CLOSED:
+                print(f"數據源{name}探測成功，關閉熔斷")
+            health.state = CLOSED
+            health.probe_in_flight = False
+
+    def record_failure(self, name, latency=None):
+        """記錄一次失敗請求，連續失敗達到閾值或半開探測失敗時打開熔斷"""
+        with self._lock:
+            health = self._get(name)
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.success_rate -= HEALTH_EWMA_ALPHA * health.success_rate
+            if latency is not None:
+                if health.latency is None:
+                    health.latency = latency
+                else:
+                    health.latency += HEALTH_EWMA_ALPHA * (latency - health.latency)
+
+            if health.state == HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+                if health.state != OPEN:
+                    print(f"數據源{name}連續失敗{health.consecutive_failures}次，打開熔斷{self.cooldown}秒")
+                health.state = OPEN
+                health.opened_at = time.time()
+            health.probe_in_flight = False
+
+    def release(self, name):
+        """放棄已獲准但最終沒有發出的請求，使半開狀態可以重新放行探測"""
+        with self._lock:
+            health = self._get(name)
+            if health.state == HALF_OPEN:
+                health.probe_in_flight = False
+
+    def order(self, names):
+        """按健康評分從高到低排列數據源名稱，評分相同時保持原順序"""
+        with self._lock:
+            scores = {name: self._get(name).score() for name in names}
+        return sorted(names, key=lambda name: -scores[name])
+
+    def stats(self):
+        """返回所有數據源的健康統計"""
+        with self._lock:
+            return {name: health.as_dict() for name, health in self._providers.items()}
+
+
+# 進程級共享實例
+provider_health = HealthTracker()
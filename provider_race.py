@@ -0,0 +1,439 @@
+# -*- coding: utf-8 -*-
+"""
+數據源競速模組
+以並行或錯開延遲(hedged)的方式啟動多個數據源，
+採用第一個通過價格驗證的結果，並取消其餘尚未完成的請求。
+
+模式:
+- race: 所有數據源同時啟動
+- hedged: 按各數據源的錯開延遲依次啟動，前一個失敗時立即啟動下一個
+- serial: 保留原本的依序回退行為
+
+所有模式都會按數據源健康評分重新排序，並跳過處於熔斷狀態的數據源(見 provider_health.py)。
+提供 key=(symbol, timeframe) 時，數據源拋出 KnownMiss 的組合會在一段時間內被跳過(見 negative_cache.py)。
+race_providers_async 是基於asyncio的版本，落敗的請求會被真正取消。
+gather_providers 同時啟動多個數據源並收集多個有效結果，供共識合併使用(見 consensus.py)。
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from deadline import has_budget, remaining as deadline_remaining, DEADLINE_MIN_REQUEST_SECONDS
+from provider_health import provider_health
+from negative_cache import KnownMiss, negative_cache
+
+# 數據獲取模式，可通過環境變數 DATA_FETCH_MODE 設置
+DATA_FETCH_MODE = os.getenv('DATA_FETCH_MODE', 'hedged')
+
+# 整體競速超時(秒)，超過後視為所有數據源失敗
+PROVIDER_RACE_TIMEOUT = float(os.getenv('PROVIDER_RACE_TIMEOUT', '20'))
+
+# 各數據源相對於開始時間的錯開延遲(秒)，僅在 hedged 模式下使用
+DEFAULT_PROVIDER_STAGGER = {
+    'cryptoapis': 0.0,
+    'smithery': 0.5,
+    'coincap': 1.0,
+    'coingecko': 1.5,
+    'ccxt': 2.0
+}
+
+
+def parse_stagger_config(value, defaults=None):
+    """
+    解析錯開延遲設置字符串
+
+    參數:
+    value (str): 形如 'smithery:0.5,coincap:1' 的設置
+    defaults (dict): 默認的錯開延遲
+
+    返回:
+    dict: 數據源名稱到延遲秒數的映射
+    """
+    stagger = dict(defaults or {})
+    if not value:
+        return stagger
+
+    for item in value.split(','):
+        if ':' not in item:
+            continue
+        name, seconds = item.split(':', 1)
+        try:
+            stagger[name.strip()] = max(0.0, float(seconds))
+        except ValueError:
+            print(f"忽略無效的錯開延遲設置: {item}")
+    return stagger
+
+
+# 從環境變數 PROVIDER_STAGGER 讀取錯開延遲，未設置的數據源使用默認值
+PROVIDER_STAGGER = parse_stagger_config(os.getenv('PROVIDER_STAGGER', ''), DEFAULT_PROVIDER_STAGGER)
+
+
+def _is_valid(df, validator):
+    """檢查數據源結果是否可用"""
+    if df is None or len(df) == 0:
+        return False
+    try:
+        return bool(validator(df))
+    except Exception as e:
+        print(f"驗證數據時出錯: {str(e)}")
+        return False
+
+
+def _record_result(name, df, start_time, validator, health, key=None, negative=None, miss=None):
+    """
+    驗證數據源結果，同時向健康追蹤器記錄成敗和延遲
+
+    只有確定性的缺失(miss，由數據源拋出的 KnownMiss)記入失敗緩存，且不計入健康狀態；
+    其餘無效結果(超時、5xx、429、價格驗證失敗等)只計入健康狀態，由熔斷器處理。
+    同步和異步的數據源調用共用此邏輯
+
+    返回:
+    bool: 是否通過驗證
+    """
+    valid = _is_valid(df, validator)
+    if not valid and not has_budget(DEADLINE_MIN_REQUEST_SECONDS):
+        # 因分析時間預算用盡而失敗，不計入數據源健康狀態和失敗緩存
+        if health is not None:
+            health.release(name)
+        return valid
+    if miss is not None:
+        print(f"數據源{name}沒有此交易對或時間框架的數據: {miss}")
+        if health is not None:
+            health.release(name)
+        if key is not None and negative is not None:
+            negative.add(name, *key, reason=miss)
+        return False
+    if health is not None:
+        if valid:
+            health.record_success(name, time.time() - start_time)
+        else:
+            health.record_failure(name, time.time() - start_time)
+    if not valid:
+        print(f"數據源{name}未返回有效數據")
+    return valid
+
+
+def _release(plan, health):
+    """釋放已由 _plan 放行但沒有實際調用的數據源，使半開狀態可以重新放行探測"""
+    if health is None:
+        return
+    for name, _, _ in plan:
+        health.release(name)
+
+
+def _attempt(name, fetch, validator, health, key=None, negative=None):
+    """
+    調用單個數據源並驗證結果
+
+    返回:
+    tuple: (DataFrame, 是否通過驗證)
+    """
+    start_time = time.time()
+    miss = None
+    try:
+        df = fetch()
+    except KnownMiss as e:
+        df, miss = None, str(e)
+    except Exception as e:
+        print(f"數據源{name}請求失敗: {str(e)}")
+        df = None
+    return df, _record_result(name, df, start_time, validator, health, key, negative, miss)
+
+
+def _plan(providers, stagger, health, key=None, negative=None):
+    """
+    按健康評分重新排列數據源並跳過熔斷中的數據源
+
+    錯開延遲按排序後的位置分配，評分最高的數據源使用最短的延遲
+
+    返回:
+    list: (名稱, 獲取函數, 延遲秒數) 列表
+    """
+    if key is not None and negative is not None:
+        providers = [(name, fetch) for name, fetch in providers if not negative.is_blocked(name, *key)]
+        if not providers:
+            print(f"{key}的所有數據源最近都沒有返回有效數據，跳過")
+            return []
+
+    delays = sorted(stagger.get(name, 0.0) for name, _ in providers)
+    if health is None:
+        return [(name, fetch, delays[index]) for index, (name, fetch) in enumerate(providers)]
+
+    fetchers = dict(providers)
+    ordered = health.order([name for name, _ in providers])
+    plan = []
+    for name in ordered:
+        if not health.allow(name):
+            print(f"數據源{name}處於熔斷狀態，跳過")
+            continue
+        plan.append((name, fetchers[name], delays[len(plan)]))
+    return plan
+
+
+def race_providers(providers, validator, mode=None, stagger=None, timeout=None, health=provider_health,
+                   key=None, negative=negative_cache):
+    """
+    競速獲取數據，返回第一個通過驗證的數據源結果
+
+    參數:
+    providers (list): (名稱, 無參數的獲取函數) 列表，按默認優先順序排列
+    validator (callable): 接收DataFrame並返回是否可用的函數
+    mode (str): 'race'、'hedged' 或 'serial'，默認使用 DATA_FETCH_MODE
+    stagger (dict): 各數據源的錯開延遲(秒)，默認使用 PROVIDER_STAGGER
+    timeout (float): 整體超時秒數，默認使用 PROVIDER_RACE_TIMEOUT
+    health (HealthTracker): 健康追蹤器，用於排序、熔斷和記錄結果，None表示不追蹤
+    key (tuple): (symbol, timeframe)，用於查詢和記錄失敗緩存，None表示不使用
+    negative (NegativeCache): 失敗結果緩存
+
+    返回:
+    tuple: (數據源名稱, DataFrame)，全部失敗時返回 (None, None)
+    """
+    mode = mode or DATA_FETCH_MODE
+    stagger = PROVIDER_STAGGER if stagger is None else stagger
+    timeout = PROVIDER_RACE_TIMEOUT if timeout is None else timeout
+    # 整體超時不超過當前分析的剩餘時間預算(見 deadline.py)
+    if deadline_remaining() is not None:
+        timeout = min(timeout, deadline_remaining())
+
+    plan = _plan(providers, stagger, health, key, negative) if providers else []
+    if not plan:
+        return None, None
+
+    if mode == 'serial':
+        attempted = 0
+        try:
+            for name, fetch, _ in plan:
+                attempted += 1
+                df, valid = _attempt(name, fetch, validator, health, key, negative)
+                if valid:
+                    return name, df
+            return None, None
+        finally:
+            # 成功後不再嘗試的數據源已由 _plan 放行，需要釋放半開探測名額
+            _release(plan[attempted:], health)
+
+    # 取消信號，一旦有結果勝出即通知尚未啟動的數據源放棄
+    cancelled = threading.Event()
+    # 每個數據源的立即啟動信號，前一個數據源失敗時提前觸發下一個
+    start_now = [threading.Event() for _ in plan]
+
+    def run(index, name, fetch, delay):
+        if mode != 'race' and delay > 0:
+            start_now[index].wait(delay)
+        if cancelled.is_set():
+            if health is not None:
+                health.release(name)
+            return None, False
+        return _attempt(name, fetch, validator, health, key, negative)
+
+    def promote_next(index):
+        # 觸發下一個尚未啟動的數據源，避免空等錯開延遲
+        for event in start_now[index + 1:]:
+            if not event.is_set():
+                event.set()
+                break
+
+    start_time = time.time()
+    executor = ThreadPoolExecutor(max_workers=len(plan), thread_name_prefix='provider-race')
+    # 每個線程複製調用方的上下文，使請求優先級(見 rate_limiter.py)傳遞到數據源請求
+    futures = {
+        executor.submit(contextvars.copy_context().run, run, index, name, fetch, delay): (index, name)
+        for index, (name, fetch, delay) in enumerate(plan)
+    }
+
+    try:
+        pending = set(futures)
+        while pending:
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                print(f"數據源競速超時 ({timeout}秒)，放棄剩餘請求")
+                break
+
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, name = futures[future]
+                df, valid = future.result()
+                if valid:
+                    elapsed = time.time() - start_time
+                    print(f"數據源{name}勝出，耗時{elapsed:.2f}秒")
+                    return name, df
+                promote_next(index)
+        return None, None
+    finally:
+        # 取消尚未開始的請求，已在進行中的請求完成後結果將被丟棄
+        cancelled.set()
+        for event in start_now:
+            event.set()
+        for future, (_, name) in futures.items():
+            if future.cancel() and health is not None:
+                health.release(name)
+        executor.shutdown(wait=False)
+
+
+def gather_providers(providers, validator, count, timeout=None, health=provider_health, key=None,
+                     negative=negative_cache):
+    """
+    同時啟動所有可用的數據源，收集最先返回的 count 個有效結果
+
+    參數:
+    providers (list): (名稱, 無參數的獲取函數) 列表
+    validator (callable): 接收DataFrame並返回是否可用的函數
+    count (int): 需要的有效結果數量，收集足夠後取消其餘請求
+    timeout (float): 整體超時秒數，默認使用 PROVIDER_RACE_TIMEOUT
+    health (HealthTracker): 健康追蹤器，None表示不追蹤
+    key (tuple): (symbol, timeframe)，用於查詢和記錄失敗緩存
+    negative (NegativeCache): 失敗結果緩存
+
+    返回:
+    list: 按完成順序排列的 (數據源名稱, DataFrame) 列表，超時時返回已收集的結果
+    """
+    timeout = PROVIDER_RACE_TIMEOUT if timeout is None else timeout
+    if deadline_remaining() is not None:
+        timeout = min(timeout, deadline_remaining())
+
+    plan = _plan(providers, {}, health, key, negative) if providers else []
+    if not plan:
+        return []
+
+    cancelled = threading.Event()
+
+    def run(name, fetch):
+        if cancelled.is_set():
+            if health is not None:
+                health.release(name)
+            return None, False
+        return _attempt(name, fetch, validator, health, key, negative)
+
+    start_time = time.time()
+    results = []
+    executor = ThreadPoolExecutor(max_workers=len(plan), thread_name_prefix='provider-gather')
+    futures = {
+        executor.submit(contextvars.copy_context().run, run, name, fetch): name
+        for name, fetch, _ in plan
+    }
+
+    try:
+        pending = set(futures)
+        while pending and len(results) < count:
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                print(f"多數據源請求超時 ({timeout}秒)，使用已返回的{len(results)}個結果")
+                break
+
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                df, valid = future.result()
+                if valid:
+                    results.append((futures[future], df))
+        return results[:count]
+    finally:
+        cancelled.set()
+        for future, name in futures.items():
+            if future.cancel() and health is not None:
+                health.release(name)
+        executor.shutdown(wait=False)
+
+
+async def _attempt_async(name, fetch, validator, health, key=None, negative=None):
+    """異步調用單個數據源並驗證結果，返回 (DataFrame, 是否通過驗證)"""
+    start_time = time.time()
+    miss = None
+    try:
+        df = await fetch()
+    except asyncio.CancelledError:
+        # 請求被取消，不計入成敗，但需釋放半開探測名額
+        if health is not None:
+            health.release(name)
+        raise
+    except KnownMiss as e:
+        df, miss = None, str(e)
+    except Exception as e:
+        print(f"數據源{name}請求失敗: {str(e)}")
+        df = None
+    return df, _record_result(name, df, start_time, validator, health, key, negative, miss)
+
+
+async def race_providers_async(providers, validator, mode=None, stagger=None, timeout=None, health=provider_health,
+                               key=None, negative=negative_cache):
+    """
+    異步競速獲取數據，參數和返回值與 race_providers 相同
+
+    providers 中的獲取函數需返回協程；勝出後其餘請求會被取消
+    """
+    mode = mode or DATA_FETCH_MODE
+    stagger = PROVIDER_STAGGER if stagger is None else stagger
+    timeout = PROVIDER_RACE_TIMEOUT if timeout is None else timeout
+    # 整體超時不超過當前分析的剩餘時間預算(見 deadline.py)
+    if deadline_remaining() is not None:
+        timeout = min(timeout, deadline_remaining())
+
+    plan = _plan(providers, stagger, health, key, negative) if providers else []
+    if not plan:
+        return None, None
+
+    if mode == 'serial':
+        attempted = 0
+        try:
+            for name, fetch, _ in plan:
+                attempted += 1
+                df, valid = await _attempt_async(name, fetch, validator, health, key, negative)
+                if valid:
+                    return name, df
+            return None, None
+        finally:
+            # 成功或被取消後不再嘗試的數據源已由 _plan 放行，需要釋放半開探測名額
+            _release(plan[attempted:], health)
+
+    start_now = [asyncio.Event() for _ in plan]
+
+    async def run(index, name, fetch, delay):
+        if mode != 'race' and delay > 0:
+            try:
+                await asyncio.wait_for(start_now[index].wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        return await _attempt_async(name, fetch, validator, health, key, negative)
+
+    def promote_next(index):
+        # 觸發下一個尚未啟動的數據源，避免空等錯開延遲
+        for event in start_now[index + 1:]:
+            if not event.is_set():
+                event.set()
+                break
+
+    start_time = time.time()
+    tasks = {
+        asyncio.ensure_future(run(index, name, fetch, delay)): (index, name)
+        for index, (name, fetch, delay) in enumerate(plan)
+    }
+
+    try:
+        pending = set(tasks)
+        while pending:
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
+                print(f"數據源競速超時 ({timeout}秒)，放棄剩餘請求")
+                break
+
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, name = tasks[task]
+                df, valid = task.result()
+                if valid:
+                    elapsed = time.time() - start_time
+                    print(f"數據源{name}勝出，耗時{elapsed:.2f}秒")
+                    return name, df
+                promote_next(index)
+        return None, None
+    finally:
+        # 取消其餘請求，已獲准但未完成的請求釋放健康追蹤器的探測名額
+        for task, (_, name) in tasks.items():
+            if not task.done():
+                task.cancel()
+                if health is not None:
+                    health.release(name)
+        await asyncio.gather(*tasks, return_exceptions=True)
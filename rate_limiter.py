@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+數據源限流調度
+每個數據源主機一個令牌桶，所有經過 http_client.py 的請求先取得令牌再發送。
+令牌不足時請求按優先級排隊等待，而不是直接觸發429後回退到較慢的數據源：
+互動分析(INTERACTIVE)優先於市場數據表的批量請求(BULK)，再優先於後台刷新(BACKGROUND)，
+同一優先級按到達順序放行。收到429時按 Retry-After 暫停該主機的令牌發放。
+排隊中的請求可通過 cancel 撤回(如競速中落敗而被取消的異步請求)，不再佔用隊列位置和令牌。
+"""
+
+import contextvars
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from deadline import remaining as deadline_remaining
+
+# 優先級，數值越小越先放行
+INTERACTIVE = 0
+BULK = 1
+BACKGROUND = 2
+
+PRIORITY_NAMES = {
+    INTERACTIVE: 'interactive',
+    BULK: 'bulk',
+    BACKGROUND: 'background'
+}
+
+# 各主機的令牌桶設置 (每秒令牌數, 桶容量)，按免費套餐的限制保守設置
+DEFAULT_RATE_LIMITS = {
+    'api.coingecko.com': (0.25, 3),
+    'api.coincap.io': (1.5, 5),
+    'rest.cryptoapis.io': (3.0, 3),
+    'api.dexscreener.com': (5.0, 10),
+    'smithery.ai': (2.0, 5)
+}
+
+# 覆蓋或補充的主機設置，JSON格式，如 {"api.coingecko.com": [0.5, 5]}
+RATE_LIMITS = {
+    **DEFAULT_RATE_LIMITS,
+    **{host: tuple(value) for host, value in json.loads(os.getenv('RATE_LIMITS', '{}')).items()}
+}
+
+# 請求排隊的最長等待時間(秒)，超過後拋出 RateLimitTimeout
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', '30'))
+
+# 當前請求的優先級，在線程池中需通過 contextvars.copy_context() 傳遞
+_priority = contextvars.ContextVar('request_priority', default=INTERACTIVE)
+
+
+class RateLimitTimeout(Exception):
+    """請求排隊超過最長等待時間時拋出"""
+
+
+class RateLimitCancelled(Exception):
+    """排隊中的請求被撤回時拋出"""
+
+
+def current_priority():
+    """返回當前上下文的請求優先級"""
+    return _priority.get()
+
+
+@contextmanager
+def request_priority(priority):
+    """在with區塊內以指定優先級發送請求"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """按固定速率補充令牌的令牌桶"""
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """返回取得一個令牌還需等待的秒數"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds, now):
+        """在seconds秒內不再發放令牌"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class RateLimitScheduler:
+    """
+    按主機和優先級調度請求的線程安全調度器
+    """
+
+    def __init__(self, limits=RATE_LIMITS, max_wait=RATE_LIMIT_MAX_WAIT):
+        self.limits = dict(limits)
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._buckets = {}
+        self._queues = {}
+        self._sequence = itertools.count()
+        self._metrics = {}
+
+    def _host_metrics(self, host):
+        metrics = self._metrics.get(host)
+        if metrics is None:
+            metrics = {
+                'granted': 0,
+                'queued': 0,
+                'timeouts': 0,
+                'cancelled': 0,
+                'throttled': 0,
+                'max_depth': 0,
+                'wait_total': 0.0,
+                'wait_max': 0.0,
+                'wait_by_priority': {name: 0.0 for name in PRIORITY_NAMES.values()}
+            }
+            self._metrics[host] = metrics
+        return metrics
+
+    def acquire(self, url, priority=None, max_wait=None, cancelled=None):
+        """
+        取得發送請求的令牌，令牌不足時按優先級排隊等待
+
+        參數:
+        url (str): 請求URL或主機名，未設置限流的主機直接放行
+        priority (int): 優先級，默認使用當前上下文的優先級
+        max_wait (float): 最長等待秒數，默認使用 RATE_LIMIT_MAX_WAIT，並且不超過當前截止時間的剩餘預算
+        cancelled (threading.Event): 撤回信號，通過 cancel 設置後立即離開隊列
+
+        返回:
+        float: 排隊等待的秒數
+
+        異常:
+        RateLimitTimeout: 等待超過最長時間
+        RateLimitCancelled: 排隊中被撤回
+        """
+        host = urlsplit(url).hostname if '://' in url else url
+        if host not in self.limits:
+            return 0.0
+        priority = current_priority() if priority is None else priority
+        max_wait = self.max_wait if max_wait is None else max_wait
+        if deadline_remaining() is not None:
+            max_wait = min(max_wait, deadline_remaining())
+
+        ticket = (priority, next(self._sequence))
+        start = time.monotonic()
+        with self._cond:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(*self.limits[host])
+                self._buckets[host] = bucket
+            queue = self._queues.setdefault(host, [])
+            metrics = self._host_metrics(host)
+            heapq.heappush(queue, ticket)
+            metrics['max_depth'] = max(metrics['max_depth'], len(queue))
+            # 新的請求可能優先於正在等待的隊首
+            self._cond.notify_all()
+
+            while True:
+                now = time.monotonic()
+                wait = None
+                if cancelled is not None and cancelled.is_set():
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                    metrics['cancelled'] += 1
+                    self._cond.notify_all()
+                    raise RateLimitCancelled(f"{host}排隊中的請求已撤回")
+                if queue[0] == ticket:
+                    wait = bucket.wait_time(now)
+                    if wait <= 0:
+                        bucket.take()
+                        heapq.heappop(queue)
+                        self._cond.notify_all()
+                        waited = now - start
+                        metrics['granted'] += 1
+                        if waited > 0.001:
+                            metrics['queued'] += 1
+                        metrics['wait_total'] += waited
+                        metrics['wait_max'] = max(metrics['wait_max'], waited)
+                        metrics['wait_by_priority'][PRIORITY_NAMES.get(priority, str(priority))] += waited
+                        return waited
+
+                remaining = max_wait - (now - start)
+                if remaining <= 0:
+                    queue.remove(ticket)
+                    heapq.heapify(queue)
+                    metrics['timeouts'] += 1
+                    self._cond.notify_all()
+                    raise RateLimitTimeout(f"{host}請求排隊超過{max_wait:.0f}秒")
+                self._cond.wait(remaining if wait is None else min(wait, remaining))
+
+    def cancel(self, cancelled):
+        """
+        撤回以 cancelled 排隊的請求
+
+        參數:
+        cancelled (threading.Event): 傳給 acquire 的撤回信號
+        """
+        with self._cond:
+            cancelled.set()
+            self._cond.notify_all()
+
+    def throttled(self, url, retry_after=None):
+        """
+        數據源返回429時調用，按 Retry-After(秒) 暫停該主機的令牌發放
+
+        未提供 Retry-After 時暫停一個令牌補充週期
+        """
+        host = urlsplit(url).hostname
+        if host not in self.limits:
+            return
+        try:
+            seconds = float(retry_after) if retry_after is not None else None
+        except (TypeError, ValueError):
+            seconds = None
+        with self._cond:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(*self.limits[host])
+                self._buckets[host] = bucket
+            bucket.pause(seconds if seconds is not None else 1 / bucket.rate, time.monotonic())
+            self._host_metrics(host)['throttled'] += 1
+
+    def stats(self):
+        """
+        返回各主機的限流統計
+
+        返回:
+        dict: 主機名到 {depth, max_depth, granted, queued, timeouts, cancelled, throttled, avg_wait, max_wait, wait_by_priority} 的映射
+        """
+        with self._cond:
+            stats = {}
+            for host, metrics in self._metrics.items():
+                stats[host] = {
+                    'depth': len(self._queues.get(host, [])),
+                    'max_depth': metrics['max_depth'],
+                    'granted': metrics['granted'],
+                    'queued': metrics['queued'],
+                    'timeouts': metrics['timeouts'],
+                    'cancelled': metrics['cancelled'],
+                    'throttled': metrics['throttled'],
+                    'avg_wait': round(metrics['wait_total'] / metrics['granted'], 3) if metrics['granted'] else 0.0,
+                    'max_wait': round(metrics['wait_max'], 3),
+                    'wait_by_priority': {name: round(value, 3) for name, value in metrics['wait_by_priority'].items()}
+                }
+            return stats
+
+
+# 進程級共享實例
+rate_limiter = RateLimitScheduler()
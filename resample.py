@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+OHLCV重採樣
+由較小時間框架的K線聚合出較大時間框架的K線：
+開盤價取第一根、最高價取最大值、最低價取最小值、收盤價取最後一根、成交量求和。
+週K線與交易所一致，從週一00:00(UTC)開始。
+"""
+
+import pandas as pd
+
+from candle_store import TIMEFRAME_SECONDS
+
+# 各時間框架對應的pandas重採樣規則
+RESAMPLE_RULES = {
+    '15m': '15min',
+    '30m': '30min',
+    '1h': '1h',
+    '4h': '4h',
+    '12h': '12h',
+    '1d': '1D',
+    '1w': 'W-MON'
+}
+
+OHLCV_AGGREGATION = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum'
+}
+
+
+def can_resample(source_timeframe, target_timeframe):
+    """判斷能否由 source_timeframe 的K線聚合出 target_timeframe 的K線"""
+    source = TIMEFRAME_SECONDS.get(source_timeframe)
+    target = TIMEFRAME_SECONDS.get(target_timeframe)
+    if not source or not target or target_timeframe not in RESAMPLE_RULES:
+        return False
+    return target > source and target % source == 0
+
+
+def resample_ohlcv(df, source_timeframe, target_timeframe):
+    """
+    將OHLCV數據聚合為更大的時間框架
+
+    參數:
+    df (DataFrame): 按時間排序的OHLCV數據
+    source_timeframe (str): 原始時間框架，如 '1h'
+    target_timeframe (str): 目標時間框架，如 '4h'
+
+    返回:
+    pandas.DataFrame: 聚合後的OHLCV數據；第一根K線的原始數據不完整時會被丟棄，
+    最後一根K線可能尚未收盤
+    """
+    if df is None or len(df) == 0:
+        return df
+    if source_timeframe == target_timeframe:
+        return df
+    if not can_resample(source_timeframe, target_timeframe):
+        raise ValueError(f"無法由{source_timeframe}聚合出{target_timeframe}")
+
+    grouped = df.set_index('timestamp').resample(RESAMPLE_RULES[target_timeframe], label='left', closed='left')
+    result = grouped.agg(OHLCV_AGGREGATION)
+    counts = grouped['close'].count()
+
+    # 去除沒有數據的區間
+    result = result[counts > 0]
+    counts = counts[counts > 0]
+
+    # 第一個區間可能只包含部分原始K線，丟棄以免開盤價和最高/最低價失真
+    expected = TIMEFRAME_SECONDS[target_timeframe] // TIMEFRAME_SECONDS[source_timeframe]
+    if len(result) > 1 and counts.iloc[0] < expected:
+        result = result.iloc[1:]
+
+    return result.reset_index()[['timestamp', 'open', 'high', 'low', 'close', 'volume']]
+
+
+def base_timeframes(target_timeframe, candidates):
+    """
+    返回可以聚合出目標時間框架的候選時間框架，按從大到小排列
+
+    較大的基礎時間框架需要的K線數量更少，優先使用
+    """
+    usable = [tf for tf in candidates if can_resample(tf, target_timeframe)]
+    return sorted(usable, key=lambda tf: -TIMEFRAME_SECONDS[tf])
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+數據源響應錄製與回放
+錄製模式下，經過 http_client.py 的每個數據源響應(原始字節、狀態碼、耗時)都追加到一個壓縮存檔文件；
+回放模式下按請求從存檔返回相同的字節，不訪問網絡，用於重現緩慢或異常的分析、性能分析和回歸基準測試。
+
+存檔文件由連續的記錄組成，每條記錄為:
+    4字節頭部長度 + 頭部JSON + 4字節正文長度 + zlib壓縮的響應正文
+請求頭(包含API密鑰)不會寫入存檔。
+
+只覆蓋經過 http_client.py 的請求。ccxt交易所實例(exchange_pool.py、history_loader.py)使用
+ccxt自己的HTTP會話，K線串流(kline_stream.py)使用websocket，這些流量不會被錄製；
+回放模式下它們仍會訪問網絡，重現分析時應關閉即時串流，並預期CCXT Binance數據源的結果與錄製時不同。
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+# 錄製模式: off(默認)、record(錄製)、replay(回放)，可通過環境變數 PROVIDER_RECORD_MODE 設置
+PROVIDER_RECORD_MODE = os.getenv('PROVIDER_RECORD_MODE', 'off').lower()
+
+# 存檔文件路徑
+PROVIDER_ARCHIVE_PATH = os.getenv(
+    'PROVIDER_ARCHIVE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'provider_archive.bin')
+)
+
+# 回放時是否按錄製的耗時等待，用於重現緩慢的數據源
+PROVIDER_REPLAY_TIMING = os.getenv('PROVIDER_REPLAY_TIMING', 'false').lower() in ('1', 'true', 'yes')
+
+# 不錄製也不回放的主機(如AI分析接口)，以逗號分隔
+PROVIDER_ARCHIVE_EXCLUDE = [
+    host.strip() for host in os.getenv('PROVIDER_ARCHIVE_EXCLUDE', 'api.deepseek.com').split(',') if host.strip()
+]
+
+_LENGTH = struct.Struct('>I')
+
+
+def request_key(method, url, params=None, body=None):
+    """
+    返回請求的精確鍵和寬鬆鍵
+
+    精確鍵包含全部請求參數；寬鬆鍵只包含方法和URL路徑，
+    用於回放帶有當前時間參數(如CoinCap的 start/end)的請求
+    """
+    canonical = json.dumps([method.upper(), url, params or {}, body], sort_keys=True, default=str)
+    exact = hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+    loose = f"{method.upper()} {url.split('?')[0]}"
+    return exact, loose
+
+
+class ResponseArchive:
+    """
+    線程安全的響應存檔
+    """
+
+    def __init__(self, path=PROVIDER_ARCHIVE_PATH, mode=PROVIDER_RECORD_MODE, exclude=PROVIDER_ARCHIVE_EXCLUDE):
+        self.path = path
+        self.mode = mode
+        self.exclude = set(exclude)
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._loose = {}
+        self._cursors = {}
+        self.recorded = 0
+        self.replayed = 0
+        self.missed = 0
+        if self.mode == 'replay':
+            self._load()
+
+    def _applies(self, url):
+        return urlsplit(url).hostname not in self.exclude
+
+    def recording(self, url):
+        """是否應錄製此URL的響應"""
+        return self.mode == 'record' and self._applies(url)
+
+    def replaying(self, url):
+        """是否應從存檔回放此URL的響應"""
+        return self.mode == 'replay' and self._applies(url)
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            print(f"回放存檔不存在: {self.path}")
+            return
+
+        offset = 0
+        while offset + _LENGTH.size <= len(data):
+            (header_length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            header = json.loads(data[offset:offset + header_length].decode('utf-8'))
+            offset += header_length
+            (body_length,) = _LENGTH.unpack_from(data, offset)
+            offset += _LENGTH.size
+            if offset + body_length > len(data):
+                print("回放存檔末尾存在不完整的記錄，已忽略")
+                break
+            entry = (header, zlib.decompress(data[offset:offset + body_length]))
+            offset += body_length
+            self._exact.setdefault(header['key'], []).append(entry)
+            self._loose.setdefault(header['loose_key'], []).append(entry)
+        print(f"已加載回放存檔: {sum(len(entries) for entries in self._exact.values())}條響應")
+
+    def record(self, method, url, params, body, status_code, content, headers, elapsed):
+        """
+        將一個響應追加到存檔
+
+        參數:
+        method (str): HTTP方法
+        url (str): 請求URL
+        params (dict): 查詢參數
+        body: POST的JSON正文
+        status_code (int): 響應狀態碼
+        content (bytes): 原始響應正文
+        headers (dict): 響應頭，只保存 Content-Type
+        elapsed (float): 請求耗時(秒)
+        """
+        exact, loose = request_key(method, url, params, body)
+        header = json.dumps({
+            'key': exact,
+            'loose_key': loose,
+            'method': method.upper(),
+            'url': url,
+            'params': params or {},
+            'status': status_code,
+            'content_type': (headers or {}).get('Content-Type', 'application/json'),
+            'elapsed': round(elapsed, 4),
+            'recorded_at': time.time()
+        }, default=str).encode('utf-8')
+        compressed = zlib.compress(content or b'', 6)
+
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'ab') as f:
+                f.write(_LENGTH.pack(len(header)) + header + _LENGTH.pack(len(compressed)) + compressed)
+            self.recorded += 1
+
+    def replay(self, method, url, params=None, body=None):
+        """
+        從存檔返回錄製的響應
+
+        同一請求錄製了多次時按錄製順序依次返回，用完後從頭循環，保證相同的請求序列得到相同的結果；
+        PROVIDER_REPLAY_TIMING 開啟時由調用方按返回的耗時等待
+
+        返回:
+        tuple: (狀態碼, 原始正文, 響應頭字典, 錄製時的耗時)
+
+        異常:
+        ConnectionError: 存檔中沒有此請求的響應
+        """
+        exact, loose = request_key(method, url, params, body)
+        with self._lock:
+            key, entries = (exact, self._exact.get(exact)) if exact in self._exact else (loose, self._loose.get(loose))
+            if not entries:
+                self.missed += 1
+                raise ConnectionError(f"回放存檔中沒有此請求的響應: {method.upper()} {url}")
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            self.replayed += 1
+        header, content = entries[cursor % len(entries)]
+        return header['status'], content, {'Content-Type': header['content_type']}, header['elapsed']
+
+    def stats(self):
+        """返回錄製和回放統計"""
+        with self._lock:
+            return {'mode': self.mode, 'recorded': self.recorded, 'replayed': self.replayed, 'missed': self.missed}
+
+
+# 進程級共享實例
+response_archive = ResponseArchive()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+相同請求合併(single-flight)
+多個會話同時請求同一個鍵時，只有第一個請求真正調用數據源，
+其餘請求等待並共享其結果，同時記錄被合併的請求數。
+"""
+
+import contextvars
+import threading
+
+
+class _Call:
+    """一次進行中的調用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    線程安全的請求合併器
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        執行 fn 並返回其結果，相同鍵的並發調用共享同一次執行
+
+        參數:
+        key (hashable): 請求鍵，如 (symbol, timeframe, limit)
+        fn (callable): 無參數的執行函數
+
+        返回:
+        tuple: (fn的返回值, 是否為共享結果)
+
+        fn 拋出的異常會傳遞給所有等待中的調用方
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            if call.waiters:
+                print(f"請求{key}已合併{call.waiters}個並發請求")
+            call.done.set()
+        return call.result, False
+
+    def do_background(self, key, fn):
+        """
+        在後台線程中執行 fn，相同鍵已有進行中的調用時不重複啟動
+
+        後台線程沿用調用時的上下文(如請求優先級)
+
+        返回:
+        bool: 是否啟動了新的後台調用
+        """
+        with self._lock:
+            if key in self._calls:
+                return False
+
+        def run():
+            try:
+                self.do(key, fn)
+            except Exception as e:
+                print(f"後台刷新{key}失敗: {str(e)}")
+
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), name='single-flight-refresh', daemon=True).start()
+        return True
+
+    def stats(self):
+        """返回請求合併統計"""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._calls)
+            }
+
+
+# 進程級共享實例，get_crypto_data 使用
+crypto_flight = SingleFlight()
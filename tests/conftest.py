@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""測試共用設置：模組位於倉庫根目錄，本地存儲寫入臨時目錄"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('CANDLE_STORE_DIR', tempfile.mkdtemp(prefix='candles-'))
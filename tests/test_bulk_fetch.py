@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pandas as pd
+
+import bulk_fetch
+import data_cache
+from candle_store import CandleStore
+from data_cache import OHLCVCache
+
+
+def frame(count, close):
+    return pd.DataFrame({'timestamp': pd.date_range('2024-05-13', periods=count, freq='h'), 'open': close,
+                         'high': close, 'low': close, 'close': close, 'volume': 1.0})
+
+
+def test_bulk_fetch_uses_cache_and_reports_failures(monkeypatch, tmp_path):
+    cache = OHLCVCache()
+    store = CandleStore(str(tmp_path))
+    monkeypatch.setattr(bulk_fetch, 'load_window',
+                        lambda *args: data_cache.load_window(*args, cache=cache, store=store))
+    monkeypatch.setattr(bulk_fetch, 'save_window',
+                        lambda *args: data_cache.save_window(*args, cache=cache, store=store))
+    cache.set('BTC/USDT', '1h', frame(5, 100.0))
+    calls = []
+    lock = threading.Lock()
+
+    def fetch_one(symbol, since):
+        with lock:
+            calls.append(symbol)
+        if symbol == 'DOGE/USDT':
+            return None, None
+        return 'test', frame(5, 2.0)
+
+    frames, failed = bulk_fetch.bulk_get_crypto_data(['BTC/USDT', 'ETH/USDT', 'DOGE/USDT'], '1h', 5, fetch_one,
+                                                     max_workers=2)
+    assert sorted(calls) == ['DOGE/USDT', 'ETH/USDT']
+    assert frames['BTC/USDT']['close'].iloc[-1] == 100.0
+    assert frames['ETH/USDT']['close'].iloc[-1] == 2.0
+    assert failed == ['DOGE/USDT']
+    assert len(store.read('ETH/USDT', '1h')) == 5
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+from candle_store import CandleStore, window_is_current
+
+
+def candles(timestamps, close):
+    return pd.DataFrame({
+        'timestamp': pd.to_datetime(timestamps), 'open': close, 'high': close, 'low': close,
+        'close': close, 'volume': 1.0
+    })
+
+
+def test_append_adds_newer_and_replaces_last(tmp_path):
+    store = CandleStore(root=str(tmp_path))
+    assert store.append('BTC/USDT', '1h', candles(['2024-05-13 00:00', '2024-05-13 01:00'], 1.0)) == 2
+    assert store.append('BTC/USDT', '1h', candles(['2024-05-13 01:00', '2024-05-13 02:00'], 2.0)) == 1
+    df = store.read('BTC/USDT', '1h')
+    assert list(df['close']) == [1.0, 2.0, 2.0]
+    assert len(store.read('BTC/USDT', '1h', limit=2)) == 2
+
+
+def test_off_boundary_rows_are_floored_to_the_timeframe(tmp_path):
+    store = CandleStore(root=str(tmp_path))
+    store.append('BTC/USDT', '1d', candles(['2024-05-13 00:00', '2024-05-14 00:00'], 1.0))
+    # CoinGecko的當前價格點不在日線的開始時間
+    store.append('BTC/USDT', '1d', candles(['2024-05-14 13:37'], 3.0))
+    df = store.read('BTC/USDT', '1d')
+    assert list(df['timestamp']) == [pd.Timestamp('2024-05-13'), pd.Timestamp('2024-05-14')]
+    assert df['close'].iloc[-1] == 3.0
+
+
+def test_approximate_rows_are_not_persisted(tmp_path):
+    store = CandleStore(root=str(tmp_path))
+    df = candles(['2024-05-13 00:00'], 1.0)
+    df.attrs['approximate'] = True
+    assert store.append('BTC/USDT', '1h', df) == 0
+    assert store.merge('BTC/USDT', '1h', df) == 0
+    assert store.read('BTC/USDT', '1h') is None
+
+
+def test_merge_backfills_older_history(tmp_path):
+    store = CandleStore(root=str(tmp_path))
+    store.append('ETH/USDT', '1h', candles(['2024-05-13 02:00', '2024-05-13 03:00'], 2.0))
+    added = store.merge('ETH/USDT', '1h', candles(['2024-05-13 00:00', '2024-05-13 01:00', '2024-05-13 02:00'], 1.0))
+    assert added == 2
+    df = store.read('ETH/USDT', '1h')
+    assert list(df['close']) == [1.0, 1.0, 1.0, 2.0]
+
+
+def test_window_is_current_checks_last_candle_and_gaps():
+    now_ms = int(pd.Timestamp('2024-05-13 03:20').value // 10**6)
+    assert window_is_current(candles(['2024-05-13 01:00', '2024-05-13 02:00', '2024-05-13 03:00'], 1.0), '1h', now_ms)
+    # 最後一根K線已收盤，缺少當前K線
+    assert not window_is_current(candles(['2024-05-13 01:00', '2024-05-13 02:00'], 1.0), '1h', now_ms)
+    # 中間缺少 02:00 的K線
+    assert not window_is_current(candles(['2024-05-13 00:00', '2024-05-13 01:00', '2024-05-13 03:00'], 1.0), '1h',
+                                 now_ms)
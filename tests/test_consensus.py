@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from consensus import ConsensusTracker, merge_consensus
+
+
+def frame(closes, start='2024-05-13 00:00', offset='0min', approximate=False):
+    timestamps = pd.date_range(start, periods=len(closes), freq='h') + pd.Timedelta(offset)
+    closes = np.asarray(closes, dtype='float64')
+    df = pd.DataFrame({'timestamp': timestamps, 'open': closes, 'high': closes * 1.01, 'low': closes * 0.99,
+                       'close': closes, 'volume': 10.0})
+    if approximate:
+        df.attrs['approximate'] = True
+    return df
+
+
+def test_outlier_is_excluded_from_median():
+    results = [('a', frame([100, 101, 102])), ('b', frame([100.2, 101.2, 102.2])), ('c', frame([110, 111, 112]))]
+    df, report = merge_consensus(results, '1h')
+    assert report['outliers'] == ['c']
+    assert not report['disagreement']
+    assert np.allclose(df['close'], [100.1, 101.1, 102.1])
+    assert (df['high'] >= df[['open', 'close']].max(axis=1)).all()
+
+
+def test_off_boundary_timestamps_are_aligned():
+    results = [('a', frame([100, 101])), ('b', frame([100, 101], offset='7min'))]
+    df, report = merge_consensus(results, '1h')
+    assert len(df) == 2
+    assert report['deviation'] == {'a': 0.0, 'b': 0.0}
+
+
+def test_two_disagreeing_providers_are_flagged_not_dropped():
+    df, report = merge_consensus([('a', frame([100, 101])), ('b', frame([120, 121]))], '1h')
+    assert report['disagreement']
+    assert report['outliers'] == []
+    assert len(df) == 2
+
+
+def test_approximate_inputs_make_consensus_approximate():
+    df, _ = merge_consensus([('a', frame([100, 101])), ('b', frame([100, 101], approximate=True))], '1h')
+    assert df.attrs['approximate']
+
+
+def test_tracker_counts_outliers():
+    tracker = ConsensusTracker()
+    tracker.record({'providers': ['a', 'b'], 'outliers': ['c'], 'deviation': {'a': 0.0, 'b': 0.001, 'c': 0.1},
+                    'disagreement': False})
+    stats = tracker.stats()
+    assert stats['merges'] == 1
+    assert stats['providers']['c']['outlier'] == 1
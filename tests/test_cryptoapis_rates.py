@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import math
+import time
+
+import cryptoapis_rates
+from tick_aggregator import TickAggregator
+
+
+def test_rate_candles_only_returns_complete_windows(monkeypatch):
+    aggregator = TickAggregator(timeframes=('15m',))
+    monkeypatch.setattr(cryptoapis_rates, 'tick_aggregator', aggregator)
+    now_ms = int(time.time() * 1000)
+    step = 15 * 60 * 1000
+    for index in range(4):
+        aggregator.add_tick('ETH/USDT', 3000.0 + index, timestamp_ms=now_ms - (3 - index) * step)
+
+    # 最後一根K線尚未收盤，只有3根已收盤K線
+    assert not cryptoapis_rates.rate_candles_ready('ETH/USDT', '15m', 4)
+    assert cryptoapis_rates.rate_candles('ETH/USDT', '15m', 4) is None
+
+    df = cryptoapis_rates.rate_candles('ETH/USDT', '15m', 3)
+    assert len(df) == 3
+    assert df.attrs['approximate'] is True
+    assert all(math.isnan(value) for value in df['volume'])
+
+
+def test_poller_disabled_without_interval():
+    poller = cryptoapis_rates.RatePoller(interval=0)
+    poller.watch('BTC/USDT')
+    assert poller.stats()['symbols'] == []
+
+
+def test_each_poll_adds_a_fresh_tick(monkeypatch):
+    aggregator = TickAggregator(timeframes=('1m',))
+    monkeypatch.setattr(cryptoapis_rates, 'tick_aggregator', aggregator)
+    rates = iter([3000.0, 3010.0])
+
+    class Response:
+        status_code = 200
+
+        def __init__(self, content):
+            self.content = content
+
+    def fake_get(url, params=None, headers=None, timeout=None):
+        if 'by-asset-symbols' in url:
+            rate = next(rates)
+            return Response(f'{{"data": {{"item": {{"calculationTimestamp": 0, "rate": "{rate}"}}}}}}'.encode())
+        return Response(b'{}')
+
+    monkeypatch.setattr(cryptoapis_rates, 'http_get', fake_get)
+    poller = cryptoapis_rates.RatePoller(interval=0)
+    poller._symbols.add('ETH/USDT')
+    poller.poll_once()
+    poller.poll_once()
+    # 沒有匯率緩存，第二次輪詢同樣發出請求並計入新的報價點
+    assert poller.stats()['failures'] == 0
+    assert aggregator.candles('ETH/USDT', '1m', 1)['close'].iloc[-1] == 3010.0
+
+
+def test_approximate_candles_are_not_persisted(tmp_path):
+    import pandas as pd
+    from candle_store import CandleStore
+    from data_cache import OHLCVCache, save_window
+
+    store = CandleStore(root=str(tmp_path))
+    cache = OHLCVCache()
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2024-05-13', periods=3, freq='h'),
+        'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': float('nan')
+    })
+    df.attrs['approximate'] = True
+
+    save_window('ETH/USDT', '1h', df, 3, cache=cache, store=store)
+    assert store.read('ETH/USDT', '1h') is None
+    assert len(cache.get('ETH/USDT', '1h')) == 3
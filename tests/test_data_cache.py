@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from data_cache import OHLCVCache
+
+
+def frame(count, start='2024-05-13 00:00', close=100.0):
+    closes = np.full(count, close)
+    return pd.DataFrame({'timestamp': pd.date_range(start, periods=count, freq='D'), 'open': closes,
+                         'high': closes, 'low': closes, 'close': closes, 'volume': 1.0})
+
+
+def test_short_fetch_merges_into_longer_entry():
+    cache = OHLCVCache()
+    cache.set('BTC/USDT', '1d', frame(100))
+    # limit=2 的請求只返回最後一根和新的一根K線
+    cache.set('BTC/USDT', '1d', frame(2, start='2024-08-20', close=200.0))
+    df = cache.get('BTC/USDT', '1d', 100)
+    assert df is not None and len(df) == 100
+    assert df['timestamp'].iloc[-1] == pd.Timestamp('2024-08-21')
+    assert list(df['close'].tail(3)) == [100.0, 200.0, 200.0]
+
+
+def test_short_fetch_with_gap_replaces_entry():
+    cache = OHLCVCache()
+    cache.set('BTC/USDT', '1d', frame(100))
+    cache.set('BTC/USDT', '1d', frame(2, start='2025-01-01'))
+    assert cache.get('BTC/USDT', '1d', 100) is None
+    assert len(cache.get('BTC/USDT', '1d')) == 2
+
+
+def test_approximate_short_fetch_tags_merged_entry():
+    cache = OHLCVCache()
+    cache.set('BTC/USDT', '1d', frame(10))
+    short = frame(1, start='2024-05-23')
+    short.attrs['approximate'] = True
+    cache.set('BTC/USDT', '1d', short)
+    assert cache.peek('BTC/USDT', '1d').attrs['approximate']
+
+
+def test_approximate_short_fetch_does_not_overwrite_real_candles():
+    cache = OHLCVCache()
+    cache.set('BTC/USDT', '1d', frame(10))
+    # 近似K線的最後一根與已有真實K線重疊，只補充缺少的新K線
+    short = frame(2, start='2024-05-22', close=200.0)
+    short.attrs['approximate'] = True
+    cache.set('BTC/USDT', '1d', short)
+    df = cache.peek('BTC/USDT', '1d')
+    assert len(df) == 10
+    assert list(df['close'].tail(2)) == [100.0, 200.0]
+    assert df.attrs['approximate']
+
+    cache.set('ETH/USDT', '1d', frame(10))
+    overlap = frame(1, start='2024-05-22', close=300.0)
+    overlap.attrs['approximate'] = True
+    cache.set('ETH/USDT', '1d', overlap)
+    df = cache.peek('ETH/USDT', '1d')
+    assert df['close'].iloc[-1] == 100.0
+    assert not df.attrs['approximate']
+
+
+def test_reads_return_copies():
+    cache = OHLCVCache()
+    cache.set('BTC/USDT', '1d', frame(5))
+    cache.get('BTC/USDT', '1d')['close'] = 0.0
+    stale, _ = cache.get_stale('BTC/USDT', '1d', 3)
+    stale['close'] = 0.0
+    assert (cache.peek('BTC/USDT', '1d')['close'] == 100.0).all()
+
+
+def test_approximate_incremental_fetch_is_merged_into_window(tmp_path):
+    from candle_store import CandleStore
+    from data_cache import save_window
+
+    cache = OHLCVCache()
+    store = CandleStore(str(tmp_path))
+    stored = frame(100)
+    store.append('BTC/USDT', '1d', stored)
+    # CoinCap/CoinGecko 的增量結果只有最後一根和新的一根K線，時間不在整點
+    update = frame(2, start='2024-08-20 00:07', close=200.0)
+    update.attrs['approximate'] = True
+    since = int(stored['timestamp'].iloc[-1].value // 10**6)
+
+    df = save_window('BTC/USDT', '1d', update, 100, stored, since, cache=cache, store=store)
+    assert len(df) == 100
+    assert df['timestamp'].iloc[-1] == pd.Timestamp('2024-08-21')
+    # 與已存儲K線重疊的近似K線不覆蓋真實數據，只追加新的一根
+    assert list(df['close'].tail(3)) == [100.0, 100.0, 200.0]
+    assert df.attrs['approximate']
+    assert len(cache.peek('BTC/USDT', '1d')) == 100
+    # 近似K線不寫入本地存儲
+    assert store.read('BTC/USDT', '1d')['close'].iloc[-1] == 100.0
+
+
+def test_rate_candles_merge_into_cache_entry_without_store(tmp_path):
+    from candle_store import CandleStore
+    from data_cache import save_window
+
+    cache = OHLCVCache()
+    cache.set('BTC/USDT', '1d', frame(10))
+    # 由匯率聚合的K線(user-020)沒有本地存儲可合併時，與緩存中的窗口合併
+    rates = frame(1, start='2024-05-23', close=150.0)
+    rates['volume'] = np.nan
+    rates.attrs['approximate'] = True
+    df = save_window('BTC/USDT', '1d', rates, 10, cache=cache, store=CandleStore(str(tmp_path)))
+    assert len(df) == 10
+    assert df['close'].iloc[-1] == 150.0
+    assert df['timestamp'].iloc[0] == pd.Timestamp('2024-05-14')
+
+
+def test_recently_written_old_window_is_not_fresh(tmp_path):
+    from candle_store import CandleStore
+    from data_cache import load_window
+
+    cache = OHLCVCache()
+    store = CandleStore(str(tmp_path))
+    # 剛寫入的文件修改時間是新的，但最後一根K線早已收盤
+    stored = frame(10)
+    store.append('BTC/USDT', '1d', stored)
+    ready_df, stored_df, since = load_window('BTC/USDT', '1d', 10, cache=cache, store=store)
+    assert ready_df is None
+    assert len(stored_df) == 10
+
+    current = frame(10, start=pd.Timestamp.now(tz='UTC').tz_localize(None).floor('D') - pd.Timedelta(days=9))
+    store.append('ETH/USDT', '1d', current)
+    ready_df, _, _ = load_window('ETH/USDT', '1d', 10, cache=cache, store=store)
+    assert ready_df is not None and len(ready_df) == 10
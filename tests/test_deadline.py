@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import http_client
+from deadline import Deadline, DeadlineExceeded, cap_timeout, deadline_scope, has_budget, remaining
+
+
+class SlowUnavailableHandler(BaseHTTPRequestHandler):
+    requests_seen = 0
+
+    def do_GET(self):
+        type(self).requests_seen += 1
+        time.sleep(0.4)
+        self.send_response(503)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_server():
+    SlowUnavailableHandler.requests_seen = 0
+    server = HTTPServer(('127.0.0.1', 0), SlowUnavailableHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    server.shutdown()
+
+
+def test_no_deadline_keeps_timeouts():
+    assert remaining() is None
+    assert has_budget(1000)
+    assert cap_timeout(15) == 15
+    assert cap_timeout(None) is None
+
+
+def test_deadline_caps_timeouts_and_raises_when_spent():
+    with deadline_scope(5):
+        assert cap_timeout(15) <= 5
+        assert cap_timeout(None) <= 5
+        with deadline_scope(None):
+            assert remaining() is None
+    with deadline_scope(0.5):
+        with pytest.raises(DeadlineExceeded):
+            cap_timeout(15)
+    assert Deadline(0).expired()
+
+
+def test_retries_stop_at_deadline(slow_server):
+    with deadline_scope(1.5):
+        start = time.monotonic()
+        response = http_client.http_get(slow_server, timeout=10)
+        elapsed = time.monotonic() - start
+    assert response.status_code == 503
+    # 連接池自動重試會發出3次請求(約1.2秒以上並加上退避)；有截止時間時剩餘預算不足即停止重試
+    assert elapsed < 1.5
+    assert SlowUnavailableHandler.requests_seen < 1 + http_client.HTTP_MAX_RETRIES
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+from dex_pairs import DexPairIndex, select_best_pair
+
+
+def pair(base, quote, liquidity, address):
+    return {'baseToken': {'symbol': base}, 'quoteToken': {'symbol': quote}, 'liquidity': {'usd': liquidity},
+            'chainId': 'ethereum', 'pairAddress': address}
+
+
+def test_select_best_pair_prefers_exact_match_with_most_liquidity():
+    pairs = [pair('WBTC', 'USDT', 9e9, 'a'), pair('BTC', 'USDT', 1e6, 'b'), pair('btc', 'usdt', 5e6, 'c'),
+             pair('BTC', 'ETH', 1e10, 'd')]
+    assert select_best_pair(pairs, 'BTC', 'USDT')['pairAddress'] == 'c'
+    assert select_best_pair(pairs[:1], 'BTC', 'USDT')['pairAddress'] == 'a'
+    assert select_best_pair(pairs[3:], 'BTC', 'USDT')['pairAddress'] == 'd'
+    assert select_best_pair([], 'BTC', 'USDT') is None
+
+
+def test_index_entries_expire(tmp_path):
+    index = DexPairIndex(path=str(tmp_path / 'pairs.json'), refresh_seconds=60)
+    index._entries['BTC/USDT'] = {'chainId': 'ethereum', 'pairAddress': 'c', 'liquidity': 1.0, 'resolved_at': 0}
+    assert index.get('btc', 'usdt') is None
+    index._entries['BTC/USDT']['resolved_at'] = 10 ** 12
+    assert index.lookup('btc', 'usdt')['pairAddress'] == 'c'
+    assert index.stats()['hits'] == 1
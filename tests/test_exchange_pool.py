@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import types
+
+import exchange_pool as pool_module
+from exchange_pool import ExchangePool
+
+
+class FakeExchange:
+    instances = 0
+
+    def __init__(self, config):
+        FakeExchange.instances += 1
+        self.config = config
+        self.markets = None
+        self.currencies = None
+        self.loads = []
+        self.active = 0
+        self.max_active = 0
+
+    def _enter(self):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        self.active -= 1
+
+    def load_markets(self, reload=False):
+        self._enter()
+        self.loads.append(reload)
+        self.markets = {'BTC/USDT': {}}
+        self.currencies = {'BTC': {}}
+        return self.markets
+
+    def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self._enter()
+        return [[0, 1.0, 1.0, 1.0, 1.0, 1.0]]
+
+
+def fake_ccxt(monkeypatch):
+    FakeExchange.instances = 0
+    monkeypatch.setattr(pool_module, 'ccxt', types.SimpleNamespace(binance=FakeExchange))
+
+
+def test_reuses_instance_and_markets(monkeypatch):
+    fake_ccxt(monkeypatch)
+    pool = ExchangePool(refresh_seconds=3600)
+    first = pool.get('binance')
+    second = pool.get('binance')
+    assert first._exchange is second._exchange
+    assert FakeExchange.instances == 1
+    assert first._exchange.loads == [False]
+    assert pool.markets('binance')[0] == {'BTC/USDT': {}}
+    assert pool.stats() == {'exchanges': ['binance'], 'created': 1, 'market_loads': 1}
+
+
+def test_refreshes_markets_after_interval(monkeypatch):
+    fake_ccxt(monkeypatch)
+    pool = ExchangePool(refresh_seconds=0.05)
+    exchange = pool.get('binance')
+    time.sleep(0.06)
+    pool.get('binance')
+    assert exchange._exchange.loads == [False, True]
+    assert FakeExchange.instances == 1
+
+
+def test_concurrent_calls_are_serialized(monkeypatch):
+    fake_ccxt(monkeypatch)
+    pool = ExchangePool(refresh_seconds=0)
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(3):
+                # refresh_seconds=0 使每次 get 都刷新市場信息，與其他線程的 fetch_ohlcv 交錯
+                pool.get('binance').fetch_ohlcv('BTC/USDT', '1h')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert FakeExchange.instances == 1
+    assert pool.get('binance')._exchange.max_active == 1
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import numpy as np
+
+from history_loader import fetch_pages, plan_pages
+
+HOUR = 3600 * 1000
+NOW = 1_715_600_000_000 // HOUR * HOUR + 1234
+
+
+def test_plan_pages_newest_first_and_covers_count():
+    pages = plan_pages('1h', 25, page_size=10, now_ms=NOW)
+    assert [limit for _, limit in pages] == [5, 10, 10]
+    end = NOW // HOUR * HOUR
+    assert pages[0][0] + (pages[0][1] - 1) * HOUR == end
+    assert pages[-1][0] == end - 24 * HOUR
+
+
+def test_plan_pages_skips_stored_complete_pages():
+    end = NOW // HOUR * HOUR
+    stored = np.arange(end - 24 * HOUR, end - 4 * HOUR, HOUR, dtype='int64')
+    pages = plan_pages('1h', 25, page_size=10, stored_timestamps=stored, now_ms=NOW)
+    # 最舊的兩頁已完整存儲，包含未收盤K線的最新一頁總是請求
+    assert pages == [(end - 4 * HOUR, 5)]
+
+
+def test_plan_pages_aligns_weekly_candles_to_monday():
+    # 2024-05-16 (週四) 12:00 UTC
+    now = 1_715_860_800_000
+    pages = plan_pages('1w', 3, page_size=10, now_ms=now)
+    monday = 1_715_558_400_000
+    assert pages == [(monday - 2 * 7 * 24 * HOUR, 3)]
+
+
+class FakeExchange:
+    def __init__(self, listed_since):
+        self.listed_since = listed_since
+        self.active = 0
+        self.max_active = 0
+        self.calls = []
+
+    async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+        self.calls.append(since)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        return [[ts, 1.0, 1.0, 1.0, 1.0, 1.0] for ts in range(since, since + limit * HOUR, HOUR)
+                if ts >= self.listed_since]
+
+
+def test_fetch_pages_limits_concurrency_and_stops_before_listing():
+    pages = plan_pages('1h', 50, page_size=10, now_ms=NOW)
+    exchange = FakeExchange(listed_since=pages[2][0])
+    rows, error = asyncio.run(fetch_pages(exchange, 'BTC/USDT', '1h', pages, workers=2))
+    assert error is None
+    assert exchange.max_active <= 2
+    assert len(rows) == sum(limit for _, limit in pages[:3])
+    # 按從新到舊的順序開始請求
+    assert exchange.calls[:2] == [pages[0][0], pages[1][0]]
+
+
+def test_fetch_pages_keeps_rows_before_failure():
+    class Failing(FakeExchange):
+        async def fetch_ohlcv(self, symbol, timeframe, since=None, limit=None):
+            if since == pages[1][0]:
+                raise RuntimeError('boom')
+            return await super().fetch_ohlcv(symbol, timeframe, since, limit)
+
+    pages = plan_pages('1h', 30, page_size=10, now_ms=NOW)
+    rows, error = asyncio.run(fetch_pages(Failing(0), 'BTC/USDT', '1h', pages, workers=3))
+    assert isinstance(error, RuntimeError)
+    assert len(rows) == pages[0][1]
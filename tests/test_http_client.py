@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+import http_client
+from deadline import deadline_scope
+
+
+class StubAdapter(BaseAdapter):
+    """按順序返回預設狀態碼的適配器，記錄每次請求的超時"""
+
+    def __init__(self, statuses):
+        super().__init__()
+        self.statuses = list(statuses)
+        self.timeouts = []
+
+    def send(self, request, timeout=None, **kwargs):
+        self.timeouts.append(timeout)
+        status = self.statuses.pop(0)
+        if isinstance(status, Exception):
+            raise status
+        response = requests.Response()
+        response.status_code = status
+        response._content = b'{}'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class StubLimiter:
+    def __init__(self):
+        self.acquired = []
+        self.throttled_urls = []
+
+    def acquire(self, url):
+        self.acquired.append(url)
+
+    def throttled(self, url, retry_after=None):
+        self.throttled_urls.append((url, retry_after))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(http_client, '_sessions', {})
+    limiter = StubLimiter()
+    monkeypatch.setattr(http_client, 'rate_limiter', limiter)
+    sleeps = []
+    # 只替換 http_client 中的退避等待，不影響其他模塊的 time.sleep
+    monkeypatch.setattr(http_client, 'time', types.SimpleNamespace(sleep=sleeps.append, time=time.time))
+    return limiter, sleeps
+
+
+def mount(url, statuses):
+    adapter = StubAdapter(statuses)
+    http_client.get_session(url, retries=False).mount('https://', adapter)
+    return adapter
+
+
+def test_deadline_retries_with_backoff(client):
+    _, sleeps = client
+    adapter = mount('https://api.stub/x', [503, requests.ConnectionError('reset'), 200])
+    with deadline_scope(30):
+        response = http_client.http_get('https://api.stub/x', timeout=10)
+    assert response.status_code == 200
+    assert len(adapter.timeouts) == 3
+    factor = http_client.HTTP_BACKOFF_FACTOR
+    assert sleeps == [factor, factor * 2]
+
+
+def test_deadline_caps_each_attempt_timeout(client):
+    adapter = mount('https://api.stub/x', [200])
+    with deadline_scope(3):
+        http_client.http_get('https://api.stub/x', timeout=15)
+    assert adapter.timeouts[0] <= 3
+
+
+def test_deadline_stops_retrying_without_budget(client):
+    _, sleeps = client
+    adapter = mount('https://api.stub/x', [503, 503, 503])
+    # 剩餘預算不足以退避後再發出一次請求
+    with deadline_scope(http_client.DEADLINE_MIN_REQUEST_SECONDS + 0.1):
+        response = http_client.http_get('https://api.stub/x', timeout=15)
+    assert response.status_code == 503
+    assert len(adapter.timeouts) == 1
+    assert sleeps == []
+
+
+def test_throttled_response_is_reported_to_limiter(client):
+    limiter, _ = client
+    session = http_client.get_session('https://api.stub/x')
+    session.mount('https://', StubAdapter([429]))
+    response = http_client.http_get('https://api.stub/x')
+    assert response.status_code == 429
+    assert limiter.acquired == ['https://api.stub/x']
+    assert limiter.throttled_urls == [('https://api.stub/x', None)]
+
+
+def test_sessions_are_pooled_per_host_and_retry_mode(client):
+    session = http_client.get_session('https://api.stub/a')
+    assert http_client.get_session('https://api.stub/b?x=1') is session
+    assert http_client.get_session('https://api.stub/a', retries=False) is not session
+    assert http_client.get_session('https://other.stub/a') is not session
+
+    retry = session.get_adapter('https://api.stub/a').max_retries
+    assert retry.total == http_client.HTTP_MAX_RETRIES
+    assert 429 not in retry.status_forcelist and 503 in retry.status_forcelist
+    assert http_client.get_session('https://api.stub/a', retries=False).get_adapter(
+        'https://api.stub/a').max_retries.total == 0
+
+
+class FlakyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    failures = 0
+
+    def do_GET(self):
+        status = 200
+        if type(self).failures > 0:
+            type(self).failures -= 1
+            status = 503
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    FlakyHandler.failures = 0
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_pooled_session_retries_5xx(client, server, monkeypatch):
+    monkeypatch.setattr(http_client, 'HTTP_BACKOFF_FACTOR', 0)
+    FlakyHandler.failures = 2
+    response = http_client.http_get(server)
+    assert response.status_code == 200
+    assert FlakyHandler.failures == 0
+
+
+def test_connection_stats_count_reused_connections(client, server):
+    for _ in range(3):
+        assert http_client.http_get(server).status_code == 200
+    stats = http_client.connection_stats()
+    host = (server.split('//')[1].rstrip('/'), True)
+    assert stats[host]['requests'] == 3
+    assert stats[host]['connections'] == 1
+    assert stats[host]['reused'] == 2
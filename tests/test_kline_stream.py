@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import threading
+import time
+
+import pandas as pd
+import pytest
+from aiohttp import web
+
+from candle_store import CandleStore
+from data_cache import OHLCVCache
+from kline_replay import create_app, load_messages
+from kline_stream import KlineStream
+
+HOUR = 3600 * 1000
+START = 1_715_558_400_000  # 2024-05-13 00:00 UTC
+
+
+def kline(open_ms, close, closed):
+    return json.dumps({'e': 'kline', 's': 'BTCUSDT', 'k': {
+        't': open_ms, 'i': '1h', 's': 'BTCUSDT', 'o': '100', 'h': str(max(100, close)), 'l': '99',
+        'c': str(close), 'v': '5', 'x': closed}})
+
+
+def cached_frame():
+    # 最後一根K線時間不在整點，如CoinGecko的價格點
+    timestamps = pd.to_datetime([START, START + HOUR, START + 2 * HOUR + 7 * 60 * 1000], unit='ms')
+    return pd.DataFrame({'timestamp': timestamps, 'open': 100.0, 'high': 101.0, 'low': 99.0,
+                         'close': 100.0, 'volume': 1.0})
+
+
+def stop_stream(stream):
+    async def cancel():
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(cancel(), stream._loop).result(5)
+    stream._loop.call_soon_threadsafe(stream._loop.stop)
+
+
+@pytest.fixture
+def replay_server(tmp_path):
+    path = tmp_path / 'klines.jsonl'
+    path.write_text('\n'.join([
+        kline(START + 2 * HOUR, 101.5, False),
+        kline(START + 2 * HOUR, 102.0, True),
+        kline(START + 3 * HOUR, 103.0, False),
+    ]) + '\n', encoding='utf-8')
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(create_app(load_messages(str(path)), interval=0.01))
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    loop.run_until_complete(site.start())
+    port = site._server.sockets[0].getsockname()[1]
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield f"ws://127.0.0.1:{port}/ws"
+    asyncio.run_coroutine_threadsafe(runner.cleanup(), loop).result(5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+
+def test_stream_updates_cache_and_store(replay_server, tmp_path):
+    cache = OHLCVCache()
+    cache.set('BTC/USDT', '1h', cached_frame())
+    store = CandleStore(str(tmp_path / 'candles'))
+    stream = KlineStream(url=replay_server, cache=cache, store=store, record_path='')
+    stream.subscribe('BTC/USDT', '1h')
+    try:
+        deadline = time.time() + 10
+        while stream.messages < 3 and time.time() < deadline:
+            time.sleep(0.05)
+        assert stream.messages == 3
+    finally:
+        stop_stream(stream)
+
+    df = cache.peek('BTC/USDT', '1h')
+    assert len(df) == 3
+    # 不在整點的最後一根K線被串流的同一根K線覆蓋，然後追加下一根
+    assert list(df['timestamp']) == list(pd.to_datetime([START + HOUR, START + 2 * HOUR, START + 3 * HOUR], unit='ms'))
+    assert list(df['close']) == [100.0, 102.0, 103.0]
+
+    stored = store.read('BTC/USDT', '1h')
+    assert list(stored['close']) == [102.0]
+    assert stream.latest('BTC/USDT', '1h')[0]['close'] == 103.0
+
+
+def test_apply_candle_replaces_entry_without_mutating_readers():
+    cache = OHLCVCache()
+    cache.set('BTC/USDT', '1h', cached_frame())
+    before = cache._entries[('BTC/USDT', '1h')][0]
+    candle = {'timestamp': START + 2 * HOUR, 'open': 100.0, 'high': 110.0, 'low': 99.0, 'close': 108.0,
+              'volume': 3.0}
+    assert cache.apply_candle('BTC/USDT', '1h', candle)
+    assert before['close'].iloc[-1] == 100.0
+    assert cache.peek('BTC/USDT', '1h')['close'].iloc[-1] == 108.0
+    # 早於最後一根K線的消息被忽略
+    assert not cache.apply_candle('BTC/USDT', '1h', dict(candle, timestamp=START))
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+import time
+
+from negative_cache import NegativeCache
+
+
+def test_blocked_until_ttl_expires():
+    cache = NegativeCache(ttl=0.05)
+    cache.add('coincap', 'BTC/USDT', '1h', reason='empty')
+    assert cache.is_blocked('coincap', 'BTC/USDT', '1h')
+    assert not cache.is_blocked('coincap', 'BTC/USDT', '4h')
+    time.sleep(0.06)
+    assert not cache.is_blocked('coincap', 'BTC/USDT', '1h')
+    assert cache.stats() == {'entries': 0, 'added': 1, 'skipped': 1}
+
+
+def test_disabled_cache_accepts_explicit_ttl():
+    cache = NegativeCache(ttl=0)
+    cache.add('coincap', 'BTC/USDT', '1h')
+    assert not cache.is_blocked('coincap', 'BTC/USDT', '1h')
+    cache.add('coincap', 'BTC/USDT', '1h', reason='outlier', ttl=10)
+    assert cache.is_blocked('coincap', 'BTC/USDT', '1h')
+    cache.discard('coincap', 'BTC/USDT', '1h')
+    assert not cache.is_blocked('coincap', 'BTC/USDT', '1h')
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+
+from ohlcv_decode import decode_candle_records, decode_price_points, loads, to_datetime
+
+
+def test_loads_accepts_bytes_and_str():
+    assert loads(b'{"a": [1, 2.5]}') == {'a': [1, 2.5]}
+    assert loads('[1]') == [1]
+
+
+def test_to_datetime_detects_seconds_and_milliseconds():
+    assert to_datetime([1715558400])[0] == pd.Timestamp('2024-05-13')
+    assert to_datetime([1715558400000])[0] == pd.Timestamp('2024-05-13')
+
+
+def test_decode_candle_records_sorts_and_drops_incomplete_rows():
+    items = [
+        {'timestamp': 1715562000, 'open': '2', 'high': '3', 'low': '1', 'close': '2.5', 'volume': {'base': 7}},
+        {'timestamp': 1715558400, 'open': 1, 'high': 2, 'low': 0.5, 'close': 1.5, 'volume': {'base': 5}},
+        {'timestamp': 1715565600, 'open': None, 'high': 2, 'low': 1, 'close': 1, 'volume': {'base': 1}},
+    ]
+    df = decode_candle_records(items, volume_key='base')
+    assert list(df['timestamp']) == list(pd.to_datetime([1715558400, 1715562000], unit='s'))
+    assert list(df['close']) == [1.5, 2.5]
+    assert list(df['volume']) == [5.0, 7.0]
+
+
+def test_decode_candle_records_rejects_missing_columns():
+    assert decode_candle_records([]) is None
+    assert decode_candle_records([{'timestamp': 1, 'close': 1}]) is None
+
+
+def test_decode_price_points():
+    timestamps, values = decode_price_points([[1, 10], [2, 20.5]])
+    assert np.array_equal(timestamps, [1.0, 2.0])
+    assert np.array_equal(values, [10.0, 20.5])
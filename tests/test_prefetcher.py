@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+import prefetcher
+from prefetcher import Prefetcher, next_candle_close
+from provider_health import HealthTracker
+from single_flight import SingleFlight
+
+
+class FakeCache:
+    def __init__(self, ttl=60, ages=None):
+        self.ttl = ttl
+        self.ages = ages or {}
+
+    def ttl_for(self, timeframe):
+        return self.ttl
+
+    def age(self, symbol, timeframe):
+        return self.ages.get((symbol, timeframe))
+
+
+class Recorder:
+    def __init__(self, expected):
+        self.calls = []
+        self.expected = expected
+        self.done = threading.Event()
+
+    def __call__(self, symbol, timeframe, limit):
+        self.calls.append((symbol, timeframe, limit))
+        if len(self.calls) >= self.expected:
+            self.done.set()
+
+
+@pytest.fixture(autouse=True)
+def fast_intervals(monkeypatch):
+    monkeypatch.setattr(prefetcher, 'PREFETCH_MIN_INTERVAL', 0)
+    monkeypatch.setattr(prefetcher, 'PREFETCH_IDLE_SECONDS', 300)
+
+
+def run_until(prefetch, event, timeout=2):
+    prefetch.start()
+    try:
+        return event.wait(timeout)
+    finally:
+        prefetch.stop()
+        prefetch._thread.join(1)
+
+
+def test_next_due_is_candle_close_or_ttl(monkeypatch):
+    monkeypatch.setattr(prefetcher, 'PREFETCH_CLOSE_DELAY', 5)
+    now = 1_715_558_400 + 600
+    assert next_candle_close('1h', now) == 1_715_558_400 + 3600
+    # 1小時K線在 54 分鐘後收盤，緩存在 48 秒後即將過期
+    prefetch = Prefetcher(['BTC/USDT'], ['1h'], None, cache=FakeCache(ttl=60), health=None)
+    assert prefetch._next_due('1h', now) == now + 48
+    # 緩存有效期較長時在收盤後 PREFETCH_CLOSE_DELAY 秒刷新
+    prefetch = Prefetcher(['BTC/USDT'], ['1h'], None, cache=FakeCache(ttl=86400), health=None)
+    assert prefetch._next_due('1h', now) == 1_715_558_400 + 3600 + 5
+
+
+def test_refreshes_each_cell_and_skips_fresh_cache():
+    refresh = Recorder(expected=3)
+    cache = FakeCache(ttl=60, ages={('ETH/USDT', '1h'): 1.0})
+    prefetch = Prefetcher(['BTC/USDT', 'ETH/USDT'], ['1h', '4h'], refresh, limit=50, cache=cache, health=None)
+    assert run_until(prefetch, refresh.done)
+    assert sorted(refresh.calls) == [('BTC/USDT', '1h', 50), ('BTC/USDT', '4h', 50), ('ETH/USDT', '4h', 50)]
+    assert prefetch.stats()['skipped'] == 1
+    assert prefetch.stats()['refreshed'] == 3
+
+
+def test_pauses_when_idle_until_touched(monkeypatch):
+    monkeypatch.setattr(prefetcher, 'PREFETCH_IDLE_SECONDS', 0.5)
+    refresh = Recorder(expected=1)
+    prefetch = Prefetcher(['BTC/USDT'], ['1h'], refresh, cache=FakeCache(), health=None)
+    prefetch._last_active = time.time() - 10
+    prefetch.start()
+    try:
+        assert not refresh.done.wait(0.2)
+        assert prefetch.stats()['paused']
+        prefetch.touch()
+        assert refresh.done.wait(1)
+    finally:
+        prefetch.stop()
+        prefetch._thread.join(1)
+
+
+def test_pauses_while_all_providers_are_open():
+    health = HealthTracker(failure_threshold=1, cooldown=60)
+    health.record_failure('coincap')
+    refresh = Recorder(expected=1)
+    prefetch = Prefetcher(['BTC/USDT'], ['1h'], refresh, cache=FakeCache(), health=health)
+    assert not run_until(prefetch, refresh.done, timeout=0.2)
+    assert refresh.calls == []
+
+
+def test_refresh_shares_in_flight_session_fetch():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    fetches = []
+
+    def fetch():
+        fetches.append(1)
+        started.set()
+        release.wait(1)
+        return 'df'
+
+    session = threading.Thread(target=flight.do, args=(('BTC/USDT', '1h', 100), fetch))
+    session.start()
+    started.wait(1)
+
+    # 預取的刷新與會話使用同一個鍵，會話仍在獲取時直接等待其結果
+    refresh = Recorder(expected=1)
+
+    def refresh_through_flight(symbol, timeframe, limit):
+        flight.do((symbol, timeframe, limit), fetch)
+        refresh(symbol, timeframe, limit)
+
+    prefetch = Prefetcher(['BTC/USDT'], ['1h'], refresh_through_flight, limit=100, cache=FakeCache(), health=None)
+    prefetch.start()
+    time.sleep(0.1)
+    release.set()
+    try:
+        assert refresh.done.wait(1)
+    finally:
+        prefetch.stop()
+        prefetch._thread.join(1)
+        session.join(1)
+
+    assert len(fetches) == 1
+    assert flight.stats()['coalesced'] == 1
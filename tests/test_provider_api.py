@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import provider_api
+from negative_cache import KnownMiss
+from provider_api import (
+    parse_coingecko_markets_daily, check_miss, smithery_request, parse_smithery_candles,
+    coincap_request, parse_coincap_history, coingecko_request, parse_coingecko_market_chart
+)
+
+
+def markets_item(last_updated='2024-05-20T10:30:00Z', hours=168):
+    prices = list(np.linspace(100.0, 120.0, hours))
+    return {'id': 'bitcoin', 'symbol': 'btc', 'last_updated': last_updated, 'current_price': 121.0,
+            'total_volume': 5e9, 'sparkline_in_7d': {'price': prices}}
+
+
+def test_markets_daily_drops_partial_first_day():
+    df = parse_coingecko_markets_daily([markets_item()], limit=10)['BTC']
+    # 走勢從 2024-05-13 11:00 開始，不完整的5月13日被丟棄
+    assert df['timestamp'].iloc[0] == pd.Timestamp('2024-05-14')
+    assert df['timestamp'].iloc[-1] == pd.Timestamp('2024-05-20')
+    assert len(df) == 7
+    assert df['close'].iloc[-1] == 121.0
+
+
+def test_markets_daily_has_no_volume_and_is_approximate():
+    df = parse_coingecko_markets_daily([markets_item()], limit=7)['BTC']
+    assert df['volume'].isna().all()
+    assert df.attrs['approximate']
+    assert df.attrs['volume_24h'] == 5e9
+
+
+def test_markets_daily_keeps_first_day_starting_at_midnight():
+    df = parse_coingecko_markets_daily([markets_item('2024-05-20T23:10:00Z')], limit=10)['BTC']
+    assert df['timestamp'].iloc[0] == pd.Timestamp('2024-05-14')
+    assert len(df) == 7
+
+
+def test_unsupported_timeframe_is_known_miss():
+    with pytest.raises(KnownMiss):
+        coincap_request('BTC/USDT', '3m')
+    with pytest.raises(KnownMiss):
+        smithery_request('BTC/USDT', '3m')
+
+
+def test_check_miss_only_flags_deterministic_responses():
+    with pytest.raises(KnownMiss):
+        check_miss('CoinCap', 404)
+    with pytest.raises(KnownMiss):
+        check_miss('CoinCap', 200, None)
+    # 暫時性錯誤和增量請求沒有新K線都不是確定性的缺失
+    check_miss('CoinCap', 429)
+    check_miss('CoinCap', 503)
+    check_miss('CoinCap', 200, None, since=1715558400000)
+
+
+HOUR_MS = 3600 * 1000
+# 2024-05-20 12:30 UTC
+NOW_MS = 1_716_208_200_000
+
+
+@pytest.fixture
+def frozen_now(monkeypatch):
+    monkeypatch.setattr(provider_api, 'time', types.SimpleNamespace(time=lambda: NOW_MS / 1000))
+
+
+def hourly_opens(count):
+    last = NOW_MS // HOUR_MS * HOUR_MS
+    return [last - (count - 1 - index) * HOUR_MS for index in range(count)]
+
+
+def test_smithery_since_sets_start_time_and_limit(frozen_now):
+    _, params, _ = smithery_request('BTC/USDT', '1h', limit=100)
+    assert 'startTime' not in params and params['limit'] == 100
+
+    since = NOW_MS // HOUR_MS * HOUR_MS - 2 * HOUR_MS
+    _, params, _ = smithery_request('BTC/USDT', '1h', limit=100, since=since)
+    assert params['startTime'] == since
+    # since 所在的K線到當前K線共3根
+    assert params['limit'] == 3
+
+
+def test_coincap_since_narrows_start(frozen_now):
+    _, params, _ = coincap_request('BTC/USDT', '1h')
+    assert params['end'] == NOW_MS
+    assert params['start'] == NOW_MS - 7 * 24 * HOUR_MS
+
+    since = NOW_MS - 5 * HOUR_MS
+    _, params, _ = coincap_request('BTC/USDT', '1h', since=since)
+    assert params['start'] == since
+    # 早於默認時間範圍的since不會擴大請求範圍
+    _, params, _ = coincap_request('BTC/USDT', '1h', since=NOW_MS - 30 * 24 * HOUR_MS)
+    assert params['start'] == NOW_MS - 7 * 24 * HOUR_MS
+
+
+def test_coingecko_since_reduces_days(frozen_now):
+    assert coingecko_request('BTC/USDT', '1h')[1]['days'] == 7
+    assert coingecko_request('BTC/USDT', '1h', since=NOW_MS - 30 * HOUR_MS)[1]['days'] == 2
+    assert coingecko_request('BTC/USDT', '1h', since=NOW_MS - 60 * 1000)[1]['days'] == 1
+    assert coingecko_request('BTC/USDT', '1h', since=NOW_MS - 30 * 24 * HOUR_MS)[1]['days'] == 7
+
+
+def test_parsers_filter_candles_before_since():
+    opens = hourly_opens(5)
+    since = opens[3]
+
+    smithery = [{'timestamp': ts, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1.0} for ts in opens]
+    df = parse_smithery_candles(smithery, limit=100, since=since)
+    assert list(df['timestamp']) == list(pd.to_datetime(opens[3:], unit='ms'))
+
+    coincap = {'data': [{'time': ts, 'priceUsd': '100.0'} for ts in opens]}
+    df = parse_coincap_history(coincap, limit=100, since=since, timeframe='1h')
+    assert list(df['timestamp']) == list(pd.to_datetime(opens[3:], unit='ms'))
+
+    coingecko = {'prices': [[ts, 100.0] for ts in opens]}
+    df = parse_coingecko_market_chart(coingecko, '1h', limit=100, since=since)
+    assert list(df['timestamp']) == list(pd.to_datetime(opens[3:], unit='ms'))
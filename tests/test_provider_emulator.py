@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from provider_api import smithery_request, parse_smithery_candles
+from provider_emulator import create_app
+
+
+def run_with_client(config, scenario):
+    async def main():
+        async with TestClient(TestServer(create_app(config, seed=1))) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+
+def test_smithery_accepts_post_json_body():
+    _, params, headers = smithery_request('BTC/USDT', '1h', 20)
+
+    async def scenario(client):
+        response = await client.post('/smithery/get_crypto_price', json=params, headers=headers)
+        assert response.status == 200
+        return await response.json()
+
+    df = parse_smithery_candles(run_with_client(None, scenario), 20)
+    assert len(df) == 20
+    assert (df['high'] >= df['low']).all()
+
+
+def test_fault_injection_returns_configured_errors():
+    config = {'default': {'latency': {'distribution': 'fixed', 'ms': 0}}, 'coincap': {'error_rate': 1.0}}
+
+    async def scenario(client):
+        failed = await client.get('/coincap/assets/bitcoin/history', params={'interval': 'h1'})
+        healthy = await client.get('/coingecko/coins/markets', params={'ids': 'bitcoin'})
+        return failed.status, healthy.status
+
+    failed, healthy = run_with_client(config, scenario)
+    assert failed >= 500
+    assert healthy == 200
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+import time
+
+from provider_health import CLOSED, HALF_OPEN, OPEN, HealthTracker
+
+
+def test_circuit_opens_and_allows_one_probe():
+    tracker = HealthTracker(failure_threshold=2, cooldown=0.05)
+    tracker.record_failure('coincap', 1.0)
+    assert tracker.allow('coincap')
+    tracker.record_failure('coincap', 1.0)
+    assert tracker.stats()['coincap']['state'] == OPEN
+    assert not tracker.allow('coincap')
+
+    time.sleep(0.06)
+    assert tracker.allow('coincap')
+    assert tracker.stats()['coincap']['state'] == HALF_OPEN
+    assert not tracker.allow('coincap')
+
+    tracker.record_success('coincap', 0.5)
+    assert tracker.stats()['coincap']['state'] == CLOSED
+
+
+def test_released_probe_can_be_sent_again():
+    tracker = HealthTracker(failure_threshold=1, cooldown=0.0)
+    tracker.record_failure('smithery')
+    assert tracker.allow('smithery')
+    tracker.release('smithery')
+    assert tracker.allow('smithery')
+
+
+def test_order_prefers_healthy_and_fast_providers():
+    tracker = HealthTracker()
+    tracker.record_success('slow', 5.0)
+    tracker.record_success('fast', 0.2)
+    tracker.record_failure('broken', 0.2)
+    assert tracker.order(['broken', 'slow', 'fast']) == ['fast', 'broken', 'slow']
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pandas as pd
+
+from negative_cache import KnownMiss, NegativeCache
+from provider_health import HealthTracker, CLOSED, HALF_OPEN, OPEN
+from provider_race import race_providers, race_providers_async, gather_providers
+
+
+def frame(close=100.0):
+    return pd.DataFrame({
+        'timestamp': pd.date_range('2024-05-13', periods=3, freq='h'),
+        'open': close, 'high': close, 'low': close, 'close': close, 'volume': 1.0
+    })
+
+
+def half_open_tracker(*names):
+    tracker = HealthTracker(failure_threshold=1, cooldown=0)
+    for name in names:
+        tracker.record_failure(name)
+    return tracker
+
+
+def valid(df):
+    return True
+
+
+def test_circuit_opens_and_recovers_through_probe():
+    tracker = HealthTracker(failure_threshold=2, cooldown=0.05)
+    tracker.record_failure('a')
+    assert tracker.allow('a')
+    tracker.record_failure('a')
+    assert tracker.stats()['a']['state'] == OPEN
+    assert not tracker.allow('a')
+
+    time.sleep(0.06)
+    assert tracker.allow('a')
+    # 半開狀態只放行一個探測請求
+    assert not tracker.allow('a')
+    tracker.record_success('a', 0.1)
+    assert tracker.stats()['a']['state'] == CLOSED
+
+
+def test_serial_mode_releases_unattempted_probes():
+    tracker = half_open_tracker('b')
+    providers = [('a', frame), ('b', frame)]
+    name, df = race_providers(providers, valid, mode='serial', health=tracker, negative=NegativeCache())
+    assert name == 'a'
+    # b 的探測名額已釋放，下一次請求可以再次探測
+    assert tracker._get('b').state == HALF_OPEN
+    assert tracker.allow('b')
+
+
+def test_async_serial_mode_releases_unattempted_probes():
+    tracker = half_open_tracker('b')
+
+    async def fetch():
+        return frame()
+
+    name, _ = asyncio.run(race_providers_async([('a', fetch), ('b', fetch)], valid, mode='serial',
+                                               health=tracker, negative=NegativeCache()))
+    assert name == 'a'
+    assert tracker.allow('b')
+
+
+def test_hedged_race_promotes_next_provider_on_failure():
+    def failing():
+        raise ConnectionError('down')
+
+    tracker = HealthTracker()
+    start = time.time()
+    name, _ = race_providers([('a', failing), ('b', frame)], valid, mode='hedged', stagger={'a': 0, 'b': 5},
+                             health=tracker, negative=NegativeCache())
+    assert name == 'b'
+    assert time.time() - start < 2
+    assert tracker.stats()['a']['failures'] == 1
+
+
+def test_transient_failure_is_left_to_circuit_breaker():
+    def timeout():
+        raise TimeoutError('read timeout')
+
+    negative = NegativeCache()
+    tracker = HealthTracker(failure_threshold=1, cooldown=60)
+    name, _ = race_providers([('a', timeout)], valid, mode='serial', health=tracker,
+                             key=('BTC/USDT', '1h'), negative=negative)
+    assert name is None
+    assert not negative.is_blocked('a', 'BTC/USDT', '1h')
+    assert tracker.stats()['a']['state'] == OPEN
+
+
+def test_known_miss_goes_to_negative_cache():
+    def miss():
+        raise KnownMiss('no pair')
+
+    negative = NegativeCache()
+    tracker = half_open_tracker('a')
+    name, _ = race_providers([('a', miss)], valid, mode='serial', health=tracker,
+                             key=('BTC/USDT', '1h'), negative=negative)
+    assert name is None
+    assert negative.is_blocked('a', 'BTC/USDT', '1h')
+    # 確定性的缺失不計入健康狀態，半開探測名額被歸還
+    assert tracker.stats()['a']['state'] == HALF_OPEN
+    assert tracker.allow('a')
+
+
+def test_async_known_miss_goes_to_negative_cache():
+    async def miss():
+        raise KnownMiss('unsupported interval')
+
+    negative = NegativeCache()
+    name, _ = asyncio.run(race_providers_async([('a', miss)], valid, mode='serial', health=None,
+                                               key=('BTC/USDT', '1h'), negative=negative))
+    assert name is None
+    assert negative.is_blocked('a', 'BTC/USDT', '1h')
+
+
+def test_gather_collects_several_results():
+    results = gather_providers([('a', frame), ('b', frame), ('c', lambda: None)], valid, 2, health=None,
+                               negative=NegativeCache())
+    assert sorted(name for name, _ in results) == ['a', 'b']
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+import time
+
+import pytest
+
+import http_client
+
+from rate_limiter import (BACKGROUND, INTERACTIVE, RateLimitCancelled, RateLimitScheduler, RateLimitTimeout,
+                          current_priority, request_priority)
+
+
+def test_unlimited_hosts_pass_through():
+    scheduler = RateLimitScheduler(limits={})
+    assert scheduler.acquire('https://example.com/api') == 0.0
+
+
+def test_priority_context():
+    assert current_priority() == INTERACTIVE
+    with request_priority(BACKGROUND):
+        assert current_priority() == BACKGROUND
+    assert current_priority() == INTERACTIVE
+
+
+def test_interactive_requests_overtake_queued_background():
+    scheduler = RateLimitScheduler(limits={'api.test': (10.0, 1)})
+    scheduler.acquire('https://api.test/x')
+    order = []
+
+    def request(priority, label):
+        scheduler.acquire('https://api.test/x', priority=priority)
+        order.append(label)
+
+    threads = [threading.Thread(target=request, args=(BACKGROUND, f'background-{index}')) for index in range(3)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.02)
+    interactive = threading.Thread(target=request, args=(INTERACTIVE, 'interactive'))
+    interactive.start()
+    for thread in threads + [interactive]:
+        thread.join()
+    assert order[0] == 'interactive'
+
+
+def test_queue_timeout_and_throttle():
+    scheduler = RateLimitScheduler(limits={'api.test': (0.5, 1)})
+    scheduler.acquire('https://api.test/x')
+    with pytest.raises(RateLimitTimeout):
+        scheduler.acquire('https://api.test/x', max_wait=0.1)
+    scheduler.throttled('https://api.test/x', retry_after='5')
+    stats = scheduler.stats()['api.test']
+    assert stats['timeouts'] == 1
+    assert stats['throttled'] == 1
+
+
+def test_cancelled_request_leaves_queue():
+    scheduler = RateLimitScheduler(limits={'api.test': (0.2, 1)})
+    scheduler.acquire('https://api.test/x')
+    cancelled = threading.Event()
+    errors = []
+
+    def request():
+        try:
+            scheduler.acquire('https://api.test/x', cancelled=cancelled)
+        except RateLimitCancelled as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=request)
+    thread.start()
+    time.sleep(0.05)
+    assert scheduler.stats()['api.test']['depth'] == 1
+    start = time.monotonic()
+    scheduler.cancel(cancelled)
+    thread.join(1)
+    assert time.monotonic() - start < 0.5
+    assert len(errors) == 1
+    stats = scheduler.stats()['api.test']
+    assert stats['depth'] == 0
+    assert stats['cancelled'] == 1
+
+
+def test_cancelled_async_request_withdraws_from_queue(monkeypatch):
+    scheduler = RateLimitScheduler(limits={'api.test': (0.2, 1)})
+    scheduler.acquire('https://api.test/x')
+    monkeypatch.setattr(http_client, 'rate_limiter', scheduler)
+
+    async def run():
+        task = asyncio.ensure_future(http_client.async_http_request(None, 'GET', 'https://api.test/x'))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    time.sleep(0.05)
+    stats = scheduler.stats()['api.test']
+    assert stats['depth'] == 0
+    assert stats['cancelled'] == 1
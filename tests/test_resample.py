@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+from provider_api import parse_coingecko_market_chart
+from resample import can_resample, resample_ohlcv
+
+
+def hourly(hours, start='2024-05-13 00:00'):
+    timestamps = pd.date_range(start, periods=hours, freq='h')
+    close = [float(index) for index in range(hours)]
+    return pd.DataFrame({
+        'timestamp': timestamps, 'open': close, 'high': [value + 0.5 for value in close],
+        'low': [value - 0.5 for value in close], 'close': close, 'volume': 1.0
+    })
+
+
+def test_resample_keeps_bucket_extremes_and_sums_volume():
+    df = resample_ohlcv(hourly(8), '1h', '4h')
+    assert list(df['timestamp']) == [pd.Timestamp('2024-05-13 00:00'), pd.Timestamp('2024-05-13 04:00')]
+    first = df.iloc[0]
+    assert (first['open'], first['high'], first['low'], first['close'], first['volume']) == (0.0, 3.5, -0.5, 3.0, 4.0)
+
+
+def test_resample_drops_partial_first_bucket():
+    df = resample_ohlcv(hourly(6, start='2024-05-13 02:00'), '1h', '4h')
+    assert list(df['timestamp']) == [pd.Timestamp('2024-05-13 04:00')]
+
+
+def test_weekly_resample_starts_on_monday():
+    daily = hourly(24 * 14, start='2024-05-09')
+    df = resample_ohlcv(resample_ohlcv(daily, '1h', '1d'), '1d', '1w')
+    assert all(timestamp.dayofweek == 0 for timestamp in df['timestamp'])
+
+
+def test_can_resample():
+    assert can_resample('1h', '4h')
+    assert not can_resample('4h', '1h')
+    assert not can_resample('1h', '1h')
+
+
+def test_coingecko_hourly_points_are_aggregated_not_sampled():
+    start_ms = int(pd.Timestamp('2024-05-13').value // 10**6)
+    data = {'prices': [[start_ms + index * 3600000, 100.0 + index] for index in range(12)]}
+    df = parse_coingecko_market_chart(data, '4h', limit=10)
+    assert len(df) == 3
+    assert list(df['close']) == [103.0, 107.0, 111.0]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from response_archive import ResponseArchive
+
+
+def test_record_then_replay_in_order(tmp_path):
+    path = str(tmp_path / 'archive.bin')
+    recorder = ResponseArchive(path=path, mode='record', exclude=['api.deepseek.com'])
+    url = 'https://api.coincap.io/v2/candles'
+    assert recorder.recording(url)
+    assert not recorder.recording('https://api.deepseek.com/v1/chat')
+    recorder.record('GET', url, {'id': 'bitcoin'}, None, 200, b'{"n": 1}', {'Content-Type': 'application/json'}, 0.3)
+    recorder.record('GET', url, {'id': 'bitcoin'}, None, 503, b'busy', {}, 1.2)
+
+    player = ResponseArchive(path=path, mode='replay', exclude=[])
+    assert player.replay('GET', url, {'id': 'bitcoin'}) == (200, b'{"n": 1}', {'Content-Type': 'application/json'}, 0.3)
+    assert player.replay('GET', url, {'id': 'bitcoin'})[:2] == (503, b'busy')
+    # 錄製的響應用完後從頭循環
+    assert player.replay('GET', url, {'id': 'bitcoin'})[0] == 200
+    # 參數不同時使用只含方法和路徑的寬鬆鍵
+    assert player.replay('GET', url, {'id': 'bitcoin', 'start': 1})[0] == 200
+    with pytest.raises(ConnectionError):
+        player.replay('GET', 'https://api.coincap.io/v2/assets')
+    assert player.stats()['missed'] == 1
+
+
+def test_truncated_archive_is_ignored(tmp_path):
+    path = tmp_path / 'archive.bin'
+    recorder = ResponseArchive(path=str(path), mode='record', exclude=[])
+    recorder.record('GET', 'https://x.test/a', None, None, 200, b'ok', {}, 0.1)
+    path.write_bytes(path.read_bytes()[:-3])
+    player = ResponseArchive(path=str(path), mode='replay', exclude=[])
+    with pytest.raises(ConnectionError):
+        player.replay('GET', 'https://x.test/a')
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from rate_limiter import BACKGROUND, current_priority, request_priority
+from single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    executions = []
+    results = []
+
+    def fetch():
+        executions.append(1)
+        time.sleep(0.05)
+        return 42
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', fetch))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(executions) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+
+
+def test_background_refresh_keeps_caller_priority():
+    flight = SingleFlight()
+    seen = []
+    done = threading.Event()
+
+    def refresh():
+        seen.append(current_priority())
+        done.set()
+
+    with request_priority(BACKGROUND):
+        assert flight.do_background('key', refresh)
+    done.wait(1)
+    assert seen == [BACKGROUND]
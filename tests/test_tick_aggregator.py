@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import pandas as pd
+
+from candle_store import floor_timestamp
+from tick_aggregator import CandleRing, TickAggregator
+
+
+def ms(value):
+    return int(pd.Timestamp(value).value // 10**6)
+
+
+def test_weekly_bucket_starts_on_monday():
+    # 2024-05-16 是週四，所屬週K線從 2024-05-13(週一)開始
+    assert floor_timestamp(ms('2024-05-16 15:30'), '1w') == ms('2024-05-13')
+    assert floor_timestamp(ms('2024-05-13'), '1w') == ms('2024-05-13')
+    assert floor_timestamp(ms('2024-05-12 23:59'), '1w') == ms('2024-05-06')
+
+
+def test_ring_aggregates_ticks_into_buckets():
+    ring = CandleRing('1h', capacity=3)
+    for minute, price in [(0, 10.0), (20, 12.0), (40, 9.0), (59, 11.0)]:
+        ring.update(ms(f'2024-05-13 00:{minute:02d}'), price)
+    records = ring.records()
+    assert len(records) == 1
+    assert tuple(records[0])[1:5] == (10.0, 12.0, 9.0, 11.0)
+
+
+def test_ring_overwrites_oldest_when_full():
+    ring = CandleRing('1h', capacity=2)
+    for hour in range(3):
+        ring.update(ms(f'2024-05-13 {hour:02d}:00'), 100.0 + hour)
+    assert list(ring.records()['close']) == [101.0, 102.0]
+
+
+def test_late_tick_is_dropped():
+    aggregator = TickAggregator(timeframes=('1h',))
+    aggregator.add_tick('BTC/USDT', 100.0, timestamp_ms=ms('2024-05-13 02:00'))
+    aggregator.add_tick('BTC/USDT', 90.0, timestamp_ms=ms('2024-05-13 01:00'))
+    assert aggregator.stats()['dropped'] == 1
+    assert len(aggregator.candles('BTC/USDT', '1h')) == 1
+
+
+def test_closed_only_excludes_current_bucket():
+    aggregator = TickAggregator(timeframes=('1h',))
+    for hour in range(3):
+        aggregator.add_tick('BTC/USDT', 100.0 + hour, timestamp_ms=ms(f'2024-05-13 {hour:02d}:10'))
+    closed = aggregator.candles('BTC/USDT', '1h', closed_only=True, now_ms=ms('2024-05-13 02:30'))
+    assert list(closed['close']) == [100.0, 101.0]
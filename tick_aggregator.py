@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+成交/報價聚合K線
+只提供成交或即時報價的數據源(如Crypto APIs匯率)無法直接返回歷史K線，
+此模組將收到的每個價格點同時聚合到所有支持的時間框架，
+每個交易對和時間框架使用固定容量的環形緩衝區，內存佔用不隨運行時間增長。
+"""
+
+import os
+import threading
+import time
+
+import numpy as np
+
+from candle_store import CANDLE_DTYPE, TIMEFRAME_SECONDS, filter_since, floor_timestamp, records_to_dataframe
+
+# 每個交易對和時間框架保留的K線數量，可通過環境變數 TICK_RING_SIZE 設置
+TICK_RING_SIZE = int(os.getenv('TICK_RING_SIZE', '500'))
+
+# 同時聚合的時間框架
+AGGREGATION_TIMEFRAMES = ('15m', '1h', '4h', '1d', '1w')
+
+
+class CandleRing:
+    """
+    固定容量的K線環形緩衝區，寫滿後覆蓋最早的K線
+    """
+
+    def __init__(self, timeframe, capacity=TICK_RING_SIZE):
+        self.timeframe = timeframe
+        self.step = TIMEFRAME_SECONDS[timeframe] * 1000
+        self.capacity = capacity
+        self._records = np.zeros(capacity, dtype=CANDLE_DTYPE)
+        self._head = 0
+        self._count = 0
+
+    def update(self, timestamp_ms, price, volume=0.0):
+        """
+        將一個價格點計入所屬的K線
+
+        返回:
+        bool: 是否已計入；早於當前K線的價格點會被丟棄
+        """
+        bucket = floor_timestamp(timestamp_ms, self.timeframe)
+        if self._count > 0:
+            last = (self._head - 1) % self.capacity
+            records = self._records
+            if bucket == records['timestamp'][last]:
+                records['high'][last] = max(records['high'][last], price)
+                records['low'][last] = min(records['low'][last], price)
+                records['close'][last] = price
+                records['volume'][last] += volume
+                return True
+            if bucket < records['timestamp'][last]:
+                return False
+
+        self._records[self._head] = (bucket, price, price, price, price, volume)
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+        return True
+
+    def records(self):
+        """返回按時間排序的記錄數組副本"""
+        if self._count < self.capacity:
+            return self._records[:self._count].copy()
+        return np.concatenate([self._records[self._head:], self._records[:self._head]])
+
+    def __len__(self):
+        return self._count
+
+
+class TickAggregator:
+    """
+    線程安全的多時間框架K線聚合器，以交易對為鍵
+    """
+
+    def __init__(self, timeframes=AGGREGATION_TIMEFRAMES, capacity=TICK_RING_SIZE):
+        self.timeframes = tuple(timeframes)
+        self.capacity = capacity
+        self._rings = {}
+        self._lock = threading.Lock()
+        self.ticks = 0
+        self.dropped = 0
+
+    def add_tick(self, symbol, price, volume=0.0, timestamp_ms=None):
+        """
+        記錄一個成交或報價，同時更新所有時間框架的當前K線
+
+        參數:
+        symbol (str): 交易對符號，如 'BTC/USDT'
+        price (float): 成交價或報價
+        volume (float): 成交量，報價沒有成交量時為0
+        timestamp_ms (int): 毫秒時間戳，默認使用當前時間
+        """
+        if price is None or price <= 0:
+            return
+        timestamp_ms = int(time.time() * 1000) if timestamp_ms is None else int(timestamp_ms)
+        with self._lock:
+            rings = self._rings.get(symbol)
+            if rings is None:
+                rings = {timeframe: CandleRing(timeframe, self.capacity) for timeframe in self.timeframes}
+                self._rings[symbol] = rings
+            accepted = [ring.update(timestamp_ms, float(price), float(volume)) for ring in rings.values()]
+            self.ticks += 1
+            if not all(accepted):
+                self.dropped += 1
+
+    def candles(self, symbol, timeframe, limit=None, since=None, closed_only=False, now_ms=None):
+        """
+        返回聚合出的K線
+
+        參數:
+        symbol (str): 交易對符號
+        timeframe (str): 時間框架，需在 AGGREGATION_TIMEFRAMES 中
+        limit (int): 只返回最近的limit根K線
+        since (int): 毫秒時間戳，只返回不早於此時間的K線
+        closed_only (bool): 只返回已經收盤的K線，不包含當前正在聚合的K線
+        now_ms (int): 判斷是否收盤使用的毫秒時間戳，默認使用當前時間
+
+        返回:
+        pandas.DataFrame: OHLCV數據，沒有數據時返回None
+        """
+        with self._lock:
+            ring = self._rings.get(symbol, {}).get(timeframe)
+            if ring is None or len(ring) == 0:
+                return None
+            records = ring.records()
+            step = ring.step
+        if closed_only:
+            now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+            records = records[records['timestamp'] + step <= now_ms]
+        if len(records) == 0:
+            return None
+        if limit is not None and len(records) > limit:
+            records = records[-limit:]
+        return filter_since(records_to_dataframe(records), since)
+
+    def stats(self):
+        """返回聚合統計"""
+        with self._lock:
+            return {'symbols': len(self._rings), 'ticks': self.ticks, 'dropped': self.dropped}
+
+
+# 進程級共享實例
+tick_aggregator = TickAggregator()